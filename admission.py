@@ -0,0 +1,136 @@
+import collections
+import math
+import threading
+import time
+
+# Admission control for the CPU-bound face routes: a concurrency limiter with a bounded wait queue, and
+# token buckets per user and per client IP. Both answer "no" straight away with a Retry-After estimate
+# instead of letting requests pile up behind TensorFlow until the client times out.
+#
+# Everything here is per process — with N gunicorn workers the effective limits are N times these.
+
+
+# raised when a request can't be admitted — retry_after is whole seconds for the Retry-After header
+class Rejected(Exception):
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason      = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+# at most `limit` face requests run at once, at most `queue_size` more wait (up to queue_timeout seconds)
+# for a slot, and everything past that is rejected. With a latency target the limit adapts AIMD-style:
+# halved-ish when the smoothed service time goes over the target, +1 while it's under and all slots are busy
+class ConcurrencyLimiter:
+
+    def __init__(self, limit, queue_size=0, queue_timeout=5.0, latency_target=0.0, min_limit=1):
+        self.max_limit      = max(1, int(limit))
+        self.min_limit      = max(1, min(int(min_limit), self.max_limit))
+        self.limit          = self.max_limit
+        self.queue_size     = max(0, int(queue_size))
+        self.queue_timeout  = queue_timeout
+        self.latency_target = latency_target
+        self.running        = 0
+        self.waiting        = 0
+        self.service_time   = None  # EWMA of the run time of admitted requests, seconds
+        self.rejected       = collections.Counter()
+        self._cond          = threading.Condition()
+        self._adjusted_at   = 0.0
+
+    # cheap pre-check for the event loop: True when a new request would be turned away immediately
+    def saturated(self):
+        return self.running >= self.limit and self.waiting >= self.queue_size
+
+    # seconds until a request arriving now would probably get a slot
+    def _retry_after(self):
+        per_slot = self.service_time or 1.0
+        return per_slot * (self.waiting + 1) / self.limit
+
+    # takes a slot, waiting in the bounded queue if needed — raises Rejected when full or timed out
+    def acquire(self):
+        with self._cond:
+            if self.running < self.limit and self.waiting == 0:
+                self.running += 1
+                return time.perf_counter()
+            if self.waiting >= self.queue_size:
+                self.rejected["queue_full"] += 1
+                raise Rejected("queue_full", self._retry_after())
+            self.waiting += 1
+            try:
+                if not self._cond.wait_for(lambda: self.running < self.limit, self.queue_timeout):
+                    self.rejected["queue_timeout"] += 1
+                    raise Rejected("queue_timeout", self._retry_after())
+            finally:
+                self.waiting -= 1
+            self.running += 1
+            return time.perf_counter()
+
+    # gives the slot back; `started` is what acquire returned, used to learn the service time
+    def release(self, started):
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            saturated         = self.running >= self.limit
+            self.running     -= 1
+            self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+            if self.latency_target:
+                self._adapt(saturated)
+            self._cond.notify()
+
+    # AIMD step, at most once a second so one slow request doesn't collapse the limit
+    def _adapt(self, saturated):
+        now = time.monotonic()
+        if now - self._adjusted_at < 1.0:
+            return
+        if self.service_time > self.latency_target:
+            self.limit = max(self.min_limit, int(self.limit * 0.75))
+        elif saturated and self.limit < self.max_limit:
+            self.limit += 1
+        else:
+            return
+        self._adjusted_at = now
+        self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "limit":           self.limit,
+            "max_limit":       self.max_limit,
+            "running":         self.running,
+            "waiting":         self.waiting,
+            "queue_size":      self.queue_size,
+            "service_time_ms": round(self.service_time * 1000, 1) if self.service_time else None,
+            "rejected":        dict(self.rejected),
+        }
+
+
+# token buckets keyed by user or client IP: `rate` tokens per second up to `burst`, one per request.
+# Buckets refill lazily on use; the least recently used ones are dropped past max_keys
+class RateLimiter:
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate     = rate
+        self.burst    = max(1.0, float(burst))
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._buckets = collections.OrderedDict()
+        self._lock    = threading.Lock()
+
+    # spends one token of key's bucket — raises Rejected with the time until the next token
+    def hit(self, key):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens       = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1.0:
+                self._buckets[key] = (tokens, now)
+                self.rejected     += 1
+                raise Rejected("rate_limited", (1.0 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1.0, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def stats(self):
+        return {"rate_per_min": self.rate * 60, "burst": self.burst,
+                "tracked_keys": len(self._buckets), "rejected": self.rejected}
@@ -1,70 +1,225 @@
 from flask import Flask, render_template, request, redirect, session, url_for, Response, jsonify
-import cv2
 import numpy as np
-import sqlite3
 import os
-from flask_mail import Mail, Message
 import secrets
 from dotenv import load_dotenv
 from flask_cors import CORS
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from werkzeug.middleware.proxy_fix import ProxyFix
 import time
-from deepface import DeepFace
-
-ANTISPOOF_MODEL = None
-IMG_SIZE        = 224
-
-# tries to load the anti-spoof model from disk, silently skips if not found
-def load_antispoof_model():
-    global ANTISPOOF_MODEL
-    for fname in ['antispoof.keras', 'antispoof.h5']:
-        path = os.path.join(os.path.dirname(__file__), fname)
-        if os.path.exists(path):
+import atexit
+import threading
+from face_models import models, FACE_CROP, FACE_CROPS, embedding_model_name
+from inference_batcher import MicroBatcher
+from inference_service import InferenceClient
+from embedding_cache import EmbeddingCache
+from frame_cache import FrameResultCache
+import embedding_format
+from face_index import FaceIndex
+from face_burst import aggregate_burst, pick_templates
+from db import transaction, query_one, query_all, execute, close_db
+from migrations import migrate, check_query_plans, UPDATE_PASSWORD_SQL
+from domains import registrable_domain, lookup_keys, split_service
+from ephemeral_store import create_store
+import vault_sync
+import telemetry
+from telemetry import log, span
+from mailer import MailDispatcher, MailQueueFull
+from admission import ConcurrencyLimiter, RateLimiter, Rejected
+from otp_email import otp_mime
+
+
+# decodes every frame of the upload ('image', repeated up to FACE_BURST_FRAMES times for a burst) and
+# prepares the faces found in them — frames without a face or failing the quality gate are skipped,
+# ImageRejected propagates. If every face found was unusable, that reason is raised instead.
+# Browsers send face crops with a 'crop' metadata field per frame; full camera frames come without one
+def read_faces(pipeline):
+    files = request.files.getlist('image')
+    crops = request.form.getlist('crop')
+    if crops and len(crops) != len(files):
+        raise pipeline.ImageRejected("Crop metadata doesn't match the uploaded frames.")
+
+    faces, unusable = [], None
+    for i, file in enumerate(files[:app.config['FACE_BURST_FRAMES']]):
+        with span("decode"):
+            frame = pipeline.decode_upload(file, app.config['MAX_UPLOAD_BYTES'], crop=crops[i] if crops else None)
             try:
-                import keras
-                ANTISPOOF_MODEL = keras.models.load_model(path)
-                print(f"✅ Anti-spoof model loaded from {fname}")
-                return
-            except Exception as e:
-                print(f"⚠️  Failed to load {fname}: {e}")
-    print("⚠️  No antispoof model found — running WITHOUT spoof detection.")
-
-# runs the frame through the anti-spoof model and returns True if it looks like a real face
-def is_real_face(frame_bgr):
-    if ANTISPOOF_MODEL is None:
-        return True
-    try:
-        img = cv2.resize(frame_bgr, (IMG_SIZE, IMG_SIZE))
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = img.astype(np.float32) / 255.0
-        img = np.expand_dims(img, axis=0)
-        prob    = float(ANTISPOOF_MODEL.predict(img, verbose=0)[0][0])
-        is_real = prob > 0.5
-        print(f"  Anti-spoof score: {prob:.4f} → {'REAL ✅' if is_real else 'SPOOF ❌'}")
-        return is_real
-    except Exception as e:
-        print(f"  Anti-spoof error: {e} — allowing through")
-        return True
-
-# extracts a 128-d face embedding from a BGR frame using DeepFace + Facenet
-def get_face_embedding(frame):
-    try:
-        rgb    = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        result = DeepFace.represent(
-            img_path         = rgb,
-            model_name       = "Facenet",
-            enforce_detection= True,
-            detector_backend = "opencv"
-        )
-        embedding = np.array(result[0]["embedding"], dtype=np.float32)
-        return embedding
-    except Exception as e:
-        print(f"  Face detection error: {e}")
+                face = pipeline.prepare_face(frame)
+            except pipeline.FrameUnusable as e:
+                telemetry.registry.inc("realid_frame_unusable_total", reason=e.reason)
+                unusable, face = e, None
+        if face is not None:
+            faces.append(face)
+    if not faces and unusable is not None:
+        raise unusable
+    return faces
+
+# hands every prepared crop of one request to the micro-batcher (or the inference service) in one go,
+# waits for their spoof verdicts + embeddings and folds them into one verdict (see face_burst)
+# Crops the frame cache has already seen within FRAME_CACHE_TTL reuse their earlier result and aren't sent
+def analyze_faces(faces):
+    min_frames = burst_min_frames()
+    # too few faces for the liveness check — not worth running the models for
+    if len(faces) < min_frames:
+        return aggregate_burst(faces, [], min_frames=min_frames)
+    results = [frame_cache.get(face) for face in faces] if frame_cache else [None] * len(faces)
+    missing = [i for i, result in enumerate(results) if result is None]
+    telemetry.registry.inc("realid_frame_cache_total", len(faces) - len(missing), result="hit")
+    telemetry.registry.inc("realid_frame_cache_total", len(missing), result="miss")
+    if missing:
+        try:
+            with span("inference"):
+                if inference_client is not None:
+                    fresh = inference_client.analyze([faces[i] for i in missing])
+                else:
+                    fresh = face_batcher.submit_many([faces[i] for i in missing], timeout=app.config['INFERENCE_TIMEOUT'])
+        except Exception as e:
+            log.warning(f"  Inference error: {e}")
+            return {"real": True, "score": None, "embedding": None, "error": str(e)}
+        for i, result in zip(missing, fresh):
+            results[i] = result
+            if frame_cache:
+                frame_cache.put(faces[i], result)
+
+    # embeddings go into the metric's space (unit vectors for cosine) before the burst's spread check,
+    # and so does its centroid — the face index and the stored blobs only ever see prepared vectors
+    results = [result if result["embedding"] is None else {**result, "embedding": face_metric.prepare(result["embedding"])}
+               for result in results]
+    burst   = aggregate_burst(faces, results, max_spread=face_metric.to_l2(app.config['FACE_BURST_MAX_SPREAD']),
+                              min_motion=app.config['FACE_BURST_MIN_MOTION'],
+                              min_frames=min_frames)
+    if burst["embedding"] is not None:
+        burst["embedding"] = face_metric.prepare(burst["embedding"])
+    if len(faces) > 1:
+        log.debug(f"  Burst: {burst['used']}/{burst['frames']} frames used, motion {burst['motion']:.4f}"
+                  f"{' — ' + burst['reason'] if burst['reason'] else ''}")
+    return burst
+
+# fewest faces this request's scan must keep: a client that sent a burst needs two, so frames dropped
+# for having no face can't leave one and skip the motion check. Single-frame uploads (the extension)
+# pass with one unless FACE_BURST_MIN_FRAMES opts the server into requiring bursts
+def burst_min_frames():
+    sent = min(len(request.files.getlist('image')), app.config['FACE_BURST_FRAMES'])
+    return max(app.config['FACE_BURST_MIN_FRAMES'], 2 if sent > 1 else 1)
+
+# runs a micro-batch through face_pipeline.analyze_faces — imported on first use like the rest of the face stack
+def run_face_batch(faces):
+    import face_pipeline
+    return face_pipeline.analyze_faces(faces)
+
+# the face pipeline module, with this worker's models loaded — cv2 and (for a local backend) TF are only
+# imported here, by the first face request, unless MODEL_PRELOAD already did it at boot.
+# None on a slim worker (INFERENCE_BACKEND=none), which never loads the biometric stack at all
+def face_stack():
+    if app.config['INFERENCE_BACKEND'] == 'none':
+        return None
+    import face_pipeline
+    if not models.warmed:
+        with _face_stack_lock:
+            models.load(detectors_only=app.config['INFERENCE_BACKEND'] == 'remote')
+            models.warm_up()
+    return face_pipeline
+
+_face_stack_lock = threading.Lock()
+
+# stored blob -> vector ready for face_metric, or None when it was made by another embedding model
+# (those users re-enrol after their next OTP login, or reembed.py maps them across)
+def usable_embedding(blob):
+    stored = embedding_format.decode(blob)
+    if stored.model != app.config['EMBEDDING_MODEL']:
         return None
+    return face_metric.prepare(stored.vector)
 
-# compares two embeddings by euclidean distance, returns True if they're close enough to be the same person
-def compare_embeddings(emb1, emb2, threshold=10.0):
-    distance = float(np.linalg.norm(emb1 - emb2))
-    print(f"  Face distance: {distance:.4f} (must be < {threshold} to pass)")
+# an embedding in the configured storage format (model, dtype, normalized for cosine)
+def encode_embedding(vector):
+    return embedding_format.encode(vector, app.config['EMBEDDING_MODEL'], dtype=app.config['EMBEDDING_DTYPE'],
+                                   normalized=face_metric.cosine)
+
+# reads a user's stored embedding straight from the DB — only hit on an embedding cache miss
+def load_stored_embedding(email):
+    row = query_one("SELECT face_embedding FROM users WHERE email = ?", (email,))
+    if row is None or row[0] is None:
+        return None
+    return usable_embedding(row[0])
+
+# a user's extra enrolment templates (FACE_TEMPLATES > 0) — only read when the centroid didn't match
+def load_face_templates(email):
+    rows      = query_all("SELECT embedding FROM face_templates WHERE email = ?", (email,))
+    templates = (usable_embedding(row[0]) for row in rows)
+    return [template for template in templates if template is not None]
+
+# True when the user has a face enrolled, but by an embedding model this server no longer runs
+def face_needs_reenroll(email):
+    row = query_one("SELECT face_embedding FROM users WHERE email = ?", (email,))
+    return row is not None and row[0] is not None and usable_embedding(row[0]) is None
+
+# checks a probe against the user's stored centroid, then against their templates — None if no face is registered
+def match_face(email, embedding):
+    with span("db_lookup"):
+        # the row id is the cache version: re-enrolling or deleting on another worker changes or removes it
+        version    = query_one("SELECT id FROM users WHERE email = ?", (email,))
+        stored_emb = embedding_cache.get(email, load_stored_embedding, version[0]) if version else None
+    if stored_emb is None:
+        return None
+    if compare_embeddings(embedding, stored_emb):
+        return True
+    if app.config['FACE_TEMPLATES']:
+        with span("db_lookup"):
+            templates = load_face_templates(email)
+        return any(compare_embeddings(embedding, template) for template in templates)
+    return False
+
+# cheap fingerprint of the enrolled users so each worker notices enrolments/deletions made by other workers
+def users_signature():
+    return tuple(query_one("SELECT COUNT(face_embedding), COALESCE(MAX(id), 0) FROM users"))
+
+# keeps this worker's 1:N face index in step with the users table — full load the first time,
+# afterwards only new rows (id > last loaded) are added and rows deleted by other workers are dropped.
+# Rows whose embedding can't be used (another model) are remembered in face_index_skipped, so the
+# index plus the skipped rows still add up to the table's count when nothing was deleted.
+# The signature is only ever set here: local adds/removes leave it alone, so rows other workers wrote
+# in the meantime are still picked up by the next sync
+def sync_face_index():
+    signature = users_signature()
+    if face_index.signature == signature:
+        return
+    if face_index.signature is None:
+        rows  = query_all("SELECT email, face_embedding FROM users WHERE face_embedding IS NOT NULL")
+        items = []
+        face_index_skipped.clear()
+        for email, blob in rows:
+            vector = usable_embedding(blob)
+            if vector is None:
+                face_index_skipped.add(email)
+            else:
+                items.append((email, vector))
+        face_index.rebuild(items, signature=signature)
+        log.info(f"✓ Face index loaded: {face_index.size} users ({face_index.stats()['mode']})")
+        return
+
+    rows = query_all("SELECT email, face_embedding FROM users WHERE id > ? AND face_embedding IS NOT NULL",
+                     (face_index.signature[1],))
+    for email, blob in rows:
+        vector = usable_embedding(blob)
+        if vector is None:
+            face_index.remove(email)
+            face_index_skipped.add(email)
+        else:
+            face_index.add(email, vector)
+            face_index_skipped.discard(email)
+    if face_index.size + len(face_index_skipped) != signature[0]:
+        current = {row[0] for row in query_all("SELECT email FROM users WHERE face_embedding IS NOT NULL")}
+        for email in [e for e in face_index.rows if e not in current]:
+            face_index.remove(email)
+        face_index_skipped.intersection_update(current)
+    face_index.signature = signature
+
+# compares two embeddings with FACE_METRIC, returns True if they're close enough to be the same person
+def compare_embeddings(emb1, emb2):
+    threshold = app.config['FACE_MATCH_THRESHOLD']
+    with span("compare"):
+        distance = face_metric.distance(emb1, emb2)
+    log.debug(f"  Face distance ({face_metric.name}): {distance:.4f} (must be < {threshold} to pass)")
     return distance < threshold
 
 
@@ -78,6 +233,19 @@ for var in required_vars:
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
 
+app.config['LOG_LEVEL']           = os.getenv('LOG_LEVEL', 'INFO')
+app.config['METRICS_DIR']         = os.getenv('METRICS_DIR')
+app.config['SERVER_TIMING']       = os.getenv('SERVER_TIMING', 'False') == 'True'
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+app.config['PROFILE_TOKEN']       = os.getenv('PROFILE_TOKEN')
+app.config['PROFILE_DIR']         = os.getenv('PROFILE_DIR', '/tmp/realid-profiles')
+app.config['PROFILE_INTERVAL_MS'] = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+
+telemetry.setup_logging(app.config['LOG_LEVEL'])
+if app.config['METRICS_DIR']:
+    os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+    telemetry.registry.metrics_dir = app.config['METRICS_DIR']
+
 CORS(app, origins=['chrome-extension://*'], supports_credentials=True)
 
 app.config['SESSION_COOKIE_SAMESITE']    = 'None'
@@ -85,86 +253,245 @@ app.config['SESSION_COOKIE_SECURE']      = True
 app.config['SESSION_COOKIE_HTTPONLY']    = True
 app.config['PERMANENT_SESSION_LIFETIME'] = 300
 
+app.config['MAX_UPLOAD_BYTES']   = int(os.getenv('MAX_UPLOAD_BYTES', 4 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = app.config['MAX_UPLOAD_BYTES'] + 64 * 1024
+
 app.config['MAIL_SERVER']   = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT']     = int(os.getenv('MAIL_PORT', 587))
 app.config['MAIL_USE_TLS']  = os.getenv('MAIL_USE_TLS', 'True') == 'True'
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 
-mail      = Mail(app)
-otp_store = {}
+app.config['EPHEMERAL_BACKEND']     = os.getenv('EPHEMERAL_BACKEND', 'sqlite')
+app.config['EPHEMERAL_MAX_ENTRIES'] = int(os.getenv('EPHEMERAL_MAX_ENTRIES', 100000))
+app.config['OTP_TTL']               = int(os.getenv('OTP_TTL', 600))
+app.config['OTP_MAX_ATTEMPTS']      = int(os.getenv('OTP_MAX_ATTEMPTS', 5))
+
+app.config['MAIL_USE_SSL']       = os.getenv('MAIL_USE_SSL', 'False') == 'True'
+app.config['MAIL_WORKERS']       = int(os.getenv('MAIL_WORKERS', 1))
+app.config['MAIL_QUEUE_SIZE']    = int(os.getenv('MAIL_QUEUE_SIZE', 200))
+app.config['MAIL_MAX_RETRIES']   = int(os.getenv('MAIL_MAX_RETRIES', 3))
+app.config['MAIL_RETRY_BACKOFF'] = float(os.getenv('MAIL_RETRY_BACKOFF', 1.0))
+
+otp_store = create_store(app.config['EPHEMERAL_BACKEND'], app.config['EPHEMERAL_MAX_ENTRIES'])
 camera    = None
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-)
-
-load_antispoof_model()
-
-
-# builds the HTML body for OTP emails, wording changes slightly depending on whether it's login, registration, or deletion
-def create_otp_email_html(otp, purpose="login"):
-    if purpose == "login":
-        title   = "Login Verification"
-        message = "Use this code to access your vault:"
-        accent  = "#4f8cff"
-    elif purpose == "deletion":
-        title   = "⚠️ Account Deletion Request"
-        message = ("Use this code to permanently delete your REAL ID account and all saved passwords. "
-                   "If you did NOT request this, ignore this email — your account remains safe.")
-        accent  = "#ff4040"
-    else:
-        title   = "Registration Verification"
-        message = "Use this code to complete your registration:"
-        accent  = "#4f8cff"
-
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    </head>
-    <body style="margin:0;padding:0;background-color:#050810;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',sans-serif;">
-        <table width="100%" cellpadding="0" cellspacing="0" style="background-color:#050810;padding:40px 20px;">
-            <tr><td align="center">
-                <table width="600" cellpadding="0" cellspacing="0" style="background:linear-gradient(135deg,#0d1530 0%,#080d1a 100%);border-radius:20px;border:1px solid rgba(79,140,255,0.2);overflow:hidden;box-shadow:0 20px 60px rgba(0,0,0,0.6);">
-                    <tr><td style="background:linear-gradient(135deg,#1a3aff,{accent});padding:40px;text-align:center;">
-                        <h1 style="margin:0;color:#fff;font-size:32px;font-weight:800;letter-spacing:4px;font-family:'Courier New',monospace;">REAL ID</h1>
-                        <p style="margin:8px 0 0;color:rgba(255,255,255,0.7);font-size:12px;letter-spacing:3px;text-transform:uppercase;">Biometric Password Vault</p>
-                    </td></tr>
-                    <tr><td style="padding:50px 40px;">
-                        <h2 style="color:{accent};margin:0 0 20px 0;font-size:22px;font-weight:700;">{title}</h2>
-                        <p style="color:rgba(255,255,255,0.75);font-size:15px;line-height:1.7;margin:0 0 30px 0;">{message}</p>
-                        <table width="100%" cellpadding="0" cellspacing="0"><tr>
-                            <td align="center" style="padding:30px;background:rgba(79,140,255,0.08);border:2px solid rgba(79,140,255,0.25);border-radius:15px;">
-                                <p style="margin:0 0 10px 0;color:rgba(255,255,255,0.5);font-size:12px;text-transform:uppercase;letter-spacing:2px;">Your OTP Code</p>
-                                <p style="margin:0;color:{accent};font-size:48px;font-weight:800;letter-spacing:12px;font-family:'Courier New',monospace;">{otp}</p>
-                            </td>
-                        </tr></table>
-                        <table width="100%" cellpadding="0" cellspacing="0" style="margin-top:28px;"><tr>
-                            <td style="padding:18px 20px;background:rgba(255,60,60,0.07);border:1px solid rgba(255,60,60,0.2);border-radius:10px;">
-                                <p style="margin:0;color:#ff8080;font-size:13px;line-height:1.65;">
-                                    <strong>⚠️ Security Notice:</strong><br>
-                                    This code expires in <strong>10 minutes</strong>. Never share it with anyone. REAL ID will never ask for your OTP via call or chat.
-                                </p>
-                            </td>
-                        </tr></table>
-                        <p style="color:rgba(255,255,255,0.4);font-size:13px;margin:28px 0 0 0;line-height:1.65;">
-                            If you didn't request this code, please ignore this email.
-                        </p>
-                    </td></tr>
-                    <tr><td style="padding:28px 40px;background:rgba(0,0,0,0.35);border-top:1px solid rgba(255,255,255,0.07);">
-                        <p style="margin:0;color:rgba(255,255,255,0.4);font-size:11px;text-align:center;line-height:1.7;">
-                            © 2024 REAL ID — Biometric Password Manager<br>
-                            Secured with advanced face recognition technology
-                        </p>
-                    </td></tr>
-                </table>
-            </td></tr>
-        </table>
-    </body>
-    </html>
-    """
+
+# SQLite connections are closed at exit — registered before anything that might still write on the way out
+# (the mailer's delivery status), since atexit runs hooks last-in first-out
+atexit.register(close_db)
+
+# OTP mail goes out on background threads over a persistent SMTP connection (bodies come precompiled
+# from otp_email), and delivery state lands in otp_store so any worker can report it. Mail still queued
+# when the worker exits gets up to 10 s to go out
+mailer = MailDispatcher(app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+                        use_tls=app.config['MAIL_USE_TLS'],
+                        use_ssl=app.config['MAIL_USE_SSL'],
+                        username=app.config['MAIL_USERNAME'],
+                        password=app.config['MAIL_PASSWORD'],
+                        status_store=otp_store,
+                        workers=app.config['MAIL_WORKERS'],
+                        queue_size=app.config['MAIL_QUEUE_SIZE'],
+                        max_retries=app.config['MAIL_MAX_RETRIES'],
+                        backoff=app.config['MAIL_RETRY_BACKOFF'])
+atexit.register(mailer.close)
+
+app.config['VAULT_PAGE_SIZE']              = int(os.getenv('VAULT_PAGE_SIZE', 50))
+app.config['VAULT_CHANGES_RETENTION_DAYS'] = int(os.getenv('VAULT_CHANGES_RETENTION_DAYS', 30))
+
+# schema is brought up to date at boot (once, in the master under gunicorn --preload)
+migrate()
+for name, detail in check_query_plans():
+    log.warning(f"⚠️  Hot query '{name}' is not using an index: {detail}")
+pruned = vault_sync.prune_changes(app.config['VAULT_CHANGES_RETENTION_DAYS'])
+if pruned:
+    log.info(f"✓ Pruned {pruned} vault change-log entries")
+
+app.config['REQUIRE_ANTISPOOF'] = os.getenv('REQUIRE_ANTISPOOF', 'False') == 'True'
+app.config['INFERENCE_BACKEND'] = os.getenv('INFERENCE_BACKEND', 'local')
+app.config['INFERENCE_SOCKET']  = os.getenv('INFERENCE_SOCKET', '/tmp/realid-inference.sock')
+app.config['MODEL_PRELOAD']     = os.getenv('MODEL_PRELOAD', 'True') == 'True'
+
+# models load at import so gunicorn --preload shares the weights copy-on-write across workers;
+# warm-up is deferred to post_fork in that case (see gunicorn.conf.py) so TF's thread pools aren't forked.
+# With INFERENCE_BACKEND=remote the web tier only keeps the OpenCV cascades and TF lives in inference_service.py;
+# with MODEL_PRELOAD=False nothing is loaded until the first face request (see face_stack), and
+# INFERENCE_BACKEND=none never loads it — a slim worker for the landing page, vault, OTP and extension routes
+if app.config['INFERENCE_BACKEND'] != 'none' and app.config['MODEL_PRELOAD']:
+    models.load(detectors_only=app.config['INFERENCE_BACKEND'] == 'remote')
+    if os.getenv('REALID_DEFER_WARMUP') != '1':
+        models.warm_up()
+
+app.config['INFERENCE_BATCH_WINDOW_MS'] = float(os.getenv('INFERENCE_BATCH_WINDOW_MS', 10))
+app.config['INFERENCE_MAX_BATCH']       = int(os.getenv('INFERENCE_MAX_BATCH', 8))
+app.config['INFERENCE_TIMEOUT']         = float(os.getenv('INFERENCE_TIMEOUT', 30))
+
+face_batcher     = None
+inference_client = None
+if app.config['INFERENCE_BACKEND'] == 'remote':
+    inference_client = InferenceClient(app.config['INFERENCE_SOCKET'], timeout=app.config['INFERENCE_TIMEOUT'])
+    atexit.register(inference_client.close)
+else:
+    face_batcher = MicroBatcher(run_face_batch,
+                                window_ms=app.config['INFERENCE_BATCH_WINDOW_MS'],
+                                max_batch=app.config['INFERENCE_MAX_BATCH'],
+                                name="face")
+
+app.config['EMBEDDING_CACHE_SIZE'] = int(os.getenv('EMBEDDING_CACHE_SIZE', 10000))
+app.config['EMBEDDING_CACHE_TTL']  = float(os.getenv('EMBEDDING_CACHE_TTL', 600))
+
+app.config['FACE_METRIC']          = os.getenv('FACE_METRIC', 'cosine')
+app.config['FACE_MATCH_THRESHOLD'] = float(os.getenv('FACE_MATCH_THRESHOLD',
+                                                     0.40 if app.config['FACE_METRIC'] == 'cosine' else 10.0))
+app.config['FACE_CROP']            = FACE_CROP
+if FACE_CROP not in FACE_CROPS:
+    raise RuntimeError(f"FACE_CROP must be one of {', '.join(FACE_CROPS)}, not {FACE_CROP!r}")
+app.config['EMBEDDING_MODEL']      = os.getenv('EMBEDDING_MODEL', embedding_model_name(FACE_CROP))
+app.config['EMBEDDING_DTYPE']      = os.getenv('EMBEDDING_DTYPE', 'float32')
+
+face_metric = embedding_format.Metric(app.config['FACE_METRIC'])
+
+# the cache holds vectors already prepared for the metric; with a quantized store there's no point in
+# keeping float32 copies, so rows are float16 there
+embedding_cache = EmbeddingCache(capacity=app.config['EMBEDDING_CACHE_SIZE'],
+                                 ttl=app.config['EMBEDDING_CACHE_TTL'],
+                                 dtype=np.float32 if app.config['EMBEDDING_DTYPE'] == 'float32' else np.float16)
+
+app.config['FRAME_CACHE_SIZE']     = int(os.getenv('FRAME_CACHE_SIZE', 1024))
+app.config['FRAME_CACHE_TTL']      = float(os.getenv('FRAME_CACHE_TTL', 30))
+app.config['FRAME_CACHE_MAX_DIFF'] = float(os.getenv('FRAME_CACHE_MAX_DIFF', 2.0))
+
+frame_cache = None
+if app.config['FRAME_CACHE_SIZE'] > 0:
+    frame_cache = FrameResultCache(capacity=app.config['FRAME_CACHE_SIZE'], ttl=app.config['FRAME_CACHE_TTL'],
+                                   max_diff=app.config['FRAME_CACHE_MAX_DIFF'])
+
+app.config['FACE_IDENTIFY_ENABLED']    = os.getenv('FACE_IDENTIFY_ENABLED', 'False') == 'True'
+app.config['FACE_IDENTIFY_MARGIN']     = float(os.getenv('FACE_IDENTIFY_MARGIN', 0.05 if face_metric.cosine else 1.0))
+app.config['FACE_INDEX_ANN_THRESHOLD'] = int(os.getenv('FACE_INDEX_ANN_THRESHOLD', 50000))
+app.config['FACE_INDEX_NPROBE']        = int(os.getenv('FACE_INDEX_NPROBE', 8))
+
+face_index = FaceIndex(ann_threshold=app.config['FACE_INDEX_ANN_THRESHOLD'],
+                       nprobe=app.config['FACE_INDEX_NPROBE'])
+face_index_skipped = set()
+
+app.config['FACE_BURST_FRAMES']     = max(1, int(os.getenv('FACE_BURST_FRAMES', 3)))
+app.config['FACE_BURST_MAX_SPREAD'] = float(os.getenv('FACE_BURST_MAX_SPREAD', 0.25 if face_metric.cosine else 6.0))
+app.config['FACE_BURST_MIN_MOTION'] = float(os.getenv('FACE_BURST_MIN_MOTION', 0.001))
+# 2 makes every scan a burst (a single frame can't be checked for a replayed still); bursts need two
+# faces whatever this says, see burst_min_frames
+app.config['FACE_BURST_MIN_FRAMES'] = max(1, int(os.getenv('FACE_BURST_MIN_FRAMES', 1)))
+app.config['FACE_TEMPLATES']        = int(os.getenv('FACE_TEMPLATES', 0))
+
+# thresholds are in FACE_METRIC units: values carried over from the old euclidean defaults (10.0, 6.0)
+# fall outside cosine's 0..2 and are refused outright; a cosine threshold from 1 up only gets a warning
+for var in ('FACE_MATCH_THRESHOLD', 'FACE_IDENTIFY_MARGIN', 'FACE_BURST_MAX_SPREAD'):
+    if not face_metric.in_range(app.config[var]):
+        raise RuntimeError(f"{var}={app.config[var]} is outside 0..{face_metric.max_distance:g} "
+                           f"for FACE_METRIC={face_metric.name} — is it a value for the other metric?")
+if face_metric.cosine and app.config['FACE_MATCH_THRESHOLD'] >= 1.0:
+    log.warning(f"⚠️  FACE_MATCH_THRESHOLD={app.config['FACE_MATCH_THRESHOLD']} accepts faces whose embeddings "
+                f"are unrelated (cosine distance 1) — the cosine default is 0.40")
+elif not face_metric.cosine and app.config['FACE_MATCH_THRESHOLD'] < 1.0:
+    log.warning(f"⚠️  FACE_MATCH_THRESHOLD={app.config['FACE_MATCH_THRESHOLD']} looks like a cosine value; "
+                f"raw euclidean Facenet distances run far higher and almost every login will be rejected")
+
+app.config['EXTENSION_TOKEN_TTL']     = int(os.getenv('EXTENSION_TOKEN_TTL', 300))
+app.config['EXTENSION_TOKEN_MAX_AGE'] = int(os.getenv('EXTENSION_TOKEN_MAX_AGE', 3600))
+
+# the limiter can only run or queue requests the worker has threads for: by default half of them (at
+# most one per CPU) run, and the rest but one may wait, leaving a thread for the OTP / vault routes.
+# Under a sync worker (one request in flight) it never engages — only the token buckets do
+worker_threads = int(os.getenv('REALID_WORKER_THREADS', 0)) or (os.cpu_count() or 2)
+app.config['FACE_CONCURRENCY']       = int(os.getenv('FACE_CONCURRENCY', max(1, min(os.cpu_count() or 2, worker_threads // 2))))
+app.config['FACE_QUEUE_SIZE']        = int(os.getenv('FACE_QUEUE_SIZE', max(0, worker_threads - app.config['FACE_CONCURRENCY'] - 1)))
+app.config['FACE_QUEUE_TIMEOUT']     = float(os.getenv('FACE_QUEUE_TIMEOUT', 5))
+app.config['FACE_LATENCY_TARGET_MS'] = float(os.getenv('FACE_LATENCY_TARGET_MS', 0))
+app.config['FACE_USER_RATE']         = float(os.getenv('FACE_USER_RATE', 12))
+app.config['FACE_USER_BURST']        = float(os.getenv('FACE_USER_BURST', 5))
+app.config['FACE_IP_RATE']           = float(os.getenv('FACE_IP_RATE', 60))
+app.config['FACE_IP_BURST']          = float(os.getenv('FACE_IP_BURST', 20))
+app.config['PROXY_FIX_HOPS']         = int(os.getenv('PROXY_FIX_HOPS', 0))
+
+# the face routes share one limiter per worker; the cheap routes (OTP fallback, vault) are never gated
+FACE_ENDPOINTS = {'start_face_scan', 'capture_face', 'identify_face', 'verify_face_extension'}
+
+face_limiter = ConcurrencyLimiter(app.config['FACE_CONCURRENCY'],
+                                  queue_size=app.config['FACE_QUEUE_SIZE'],
+                                  queue_timeout=app.config['FACE_QUEUE_TIMEOUT'],
+                                  latency_target=app.config['FACE_LATENCY_TARGET_MS'] / 1000.0)
+face_user_limiter = RateLimiter(app.config['FACE_USER_RATE'] / 60.0, app.config['FACE_USER_BURST'])
+face_ip_limiter   = RateLimiter(app.config['FACE_IP_RATE'] / 60.0, app.config['FACE_IP_BURST'])
+
+# per-IP limits need the real client address — trust that many X-Forwarded-For hops from a reverse proxy
+if app.config['PROXY_FIX_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'], x_proto=app.config['PROXY_FIX_HOPS'])
+
+# scrape-time gauges — per worker, unlike the histograms and counters which METRICS_DIR merges
+telemetry.registry.gauge("realid_embedding_cache_size", lambda: embedding_cache.stats()["size"],
+                         "Embeddings held in this worker's cache")
+telemetry.registry.gauge("realid_batcher_queue_depth", lambda: face_batcher.stats()["queue_depth"] if face_batcher else 0,
+                         "Face crops waiting for this worker's micro-batcher")
+telemetry.registry.gauge("realid_face_running", lambda: face_limiter.running,
+                         "Face requests holding a limiter slot in this worker")
+telemetry.registry.gauge("realid_face_waiting", lambda: face_limiter.waiting,
+                         "Face requests queued for a limiter slot in this worker")
+telemetry.registry.gauge("realid_face_limit", lambda: face_limiter.limit,
+                         "Current (adaptive) face concurrency limit of this worker")
+telemetry.registry.gauge("realid_mail_queue_depth", lambda: mailer.stats()["queued"],
+                         "OTP mails waiting in this worker's outbound queue")
+
+extension_tokens = URLSafeTimedSerializer(app.secret_key, salt='extension-token')
+
+
+# OTP lifetime as the emails state it, rounded up to whole minutes
+def otp_ttl_minutes():
+    return max(1, (app.config['OTP_TTL'] + 59) // 60)
+
+# makes a fresh 6-digit OTP, stores it under key for OTP_TTL seconds and resets its attempt counter
+def issue_otp(key):
+    otp = ''.join(str(secrets.randbelow(10)) for _ in range(6))
+    otp_store.set(key, otp, app.config['OTP_TTL'])
+    otp_store.delete(f"attempts:{key}")
+    return otp
+
+# redeems an OTP with an atomic check-and-delete — returns "ok", "missing" (never sent or expired),
+# "locked" (too many wrong guesses, the code is burned) or "invalid"
+def redeem_otp(key, user_input):
+    if otp_store.get(key) is None:
+        return "missing"
+    if otp_store.pop_if_match(key, user_input):
+        otp_store.delete(f"attempts:{key}")
+        return "ok"
+    if otp_store.incr(f"attempts:{key}", app.config['OTP_TTL']) >= app.config['OTP_MAX_ATTEMPTS']:
+        otp_store.delete(key)
+        return "locked"
+    return "invalid"
+
+
+# signs a short-lived bearer token for the extension — the email plus when the face was actually verified;
+# itsdangerous adds the issue time, so checking it later needs neither the DB nor the cookie session
+def issue_extension_token(email, verified_at):
+    return extension_tokens.dumps({"e": email, "v": verified_at})
+
+# validates the extension's Authorization: Bearer token — None when the request didn't send one (cookie
+# session fallback), (None, None) when it's forged or expired, else (email, token). The token slides:
+# one older than half its TTL is swapped for a fresh one, until the face verification behind it is
+# EXTENSION_TOKEN_MAX_AGE old and only a new scan will do
+def check_extension_token():
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    ttl = app.config['EXTENSION_TOKEN_TTL']
+    try:
+        claims, issued = extension_tokens.loads(header[7:].strip(), max_age=ttl, return_timestamp=True)
+    except BadSignature:
+        return None, None
+
+    now   = time.time()
+    token = None
+    if now - issued.timestamp() > ttl / 2 and now - claims["v"] < app.config['EXTENSION_TOKEN_MAX_AGE']:
+        token = issue_extension_token(claims["e"], claims["v"])
+    return claims["e"], token
 
 
 # redirects logged-in users straight to the vault, otherwise shows the landing page
@@ -177,62 +504,84 @@ def root():
 # just renders the login page
 @app.route('/login')
 def login():
-    return render_template('login.html')
+    return render_template('login.html', identify_enabled=app.config['FACE_IDENTIFY_ENABLED'])
 
 # checks if the email exists in the DB and saves it to session so the face scan knows whose face to match against
 @app.route('/check_email', methods=['POST'])
 def check_email():
     email = request.json.get('email')
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = c.fetchone()
+    user  = query_one("SELECT 1 FROM users WHERE email = ?", (email,))
     if user:
         session['email'] = email
         return jsonify({"success": True})
     return jsonify({"success": False, "error": "Email not found. Please register."})
 
-# shows the auth method picker (face or OTP), requires a valid session email
+# shows the auth method picker (face or OTP), requires a valid session email unless it's a face-first login
 @app.route('/auth_method')
 def auth_method():
     if 'email' not in session:
+        if request.args.get('identify') and app.config['FACE_IDENTIFY_ENABLED']:
+            return render_template('auth_method.html', email=None, identify=True,
+                                   burst_frames=app.config['FACE_BURST_FRAMES'])
         return redirect('/login')
-    return render_template('auth_method.html', email=session['email'])
+    return render_template('auth_method.html', email=session['email'],
+                           burst_frames=app.config['FACE_BURST_FRAMES'])
 
-# generates a 6-digit OTP, stores it in memory, and emails it to the session user
+# generates a 6-digit OTP, stores it in the TTL store, and emails it to the session user
 @app.route('/send_otp', methods=['POST'])
 def send_otp():
     email = session.get('email')
     if not email:
         return jsonify({"success": False, "error": "Session expired"})
-    otp = ''.join(str(secrets.randbelow(10)) for _ in range(6))
-    otp_store[email] = otp
+    otp = issue_otp(f"login:{email}")
     try:
-        msg      = Message('Your REAL ID OTP',
-                           sender=app.config['MAIL_USERNAME'], recipients=[email])
-        msg.html = create_otp_email_html(otp, purpose="login")
-        mail.send(msg)
-        print(f"✓ OTP sent to {email}")
-        return jsonify({"success": True})
+        data    = otp_mime(otp, "login", app.config['MAIL_USERNAME'], email, otp_ttl_minutes())
+        mail_id = mailer.send_raw(app.config['MAIL_USERNAME'], [email], data)
+        log.info(f"✓ OTP queued for {email}")
+        return jsonify({"success": True, "mail_id": mail_id})
+    except MailQueueFull:
+        return jsonify({"success": False, "error": "Mail service is busy — please try again in a moment."})
     except Exception as e:
-        print(f"✗ Email error: {e}")
+        log.error(f"✗ Email error: {e}")
         return jsonify({"success": False, "error": f"Failed to send email: {e}"})
 
-# verifies the OTP the user typed against what was stored in memory
+# delivery state of an OTP email — only visible to the address it was sent to
+@app.route('/mail_status/<mail_id>')
+def mail_status(mail_id):
+    status = mailer.status(mail_id)
+    owners = {session.get('email'), session.get('pending_email')} - {None}
+    if status is None or not owners.intersection(status["recipients"]):
+        return jsonify({"success": False, "error": "Unknown mail id"}), 404
+    return jsonify({"success": True, "state": status["state"],
+                    "attempts": status["attempts"], "error": status["error"]})
+
+# verifies the OTP the user typed against what was stored
 @app.route('/verify_otp', methods=['POST'])
 def verify_otp():
     email = session.get('email')
     if not email:
         return jsonify({"success": False, "error": "Session expired"})
-    user_input = request.json.get('otp')
-    if otp_store.get(email) == user_input:
-        otp_store.pop(email, None)
+    status = redeem_otp(f"login:{email}", request.json.get('otp'))
+    if status == "ok":
+        # enrolled under an embedding model this server no longer runs — take them through face capture again
+        if face_needs_reenroll(email):
+            row = query_one("SELECT name FROM users WHERE email = ?", (email,))
+            session['pending_email'] = email
+            session['pending_name']  = row[0]
+            session['reenroll']      = True
+            log.info(f"⚠️ Stale face embedding, re-enrolling: {email}")
+            return jsonify({"success": True, "redirect": "/register_face"})
         return jsonify({"success": True})
+    if status == "locked":
+        return jsonify({"success": False, "error": "Too many attempts — please request a new code."})
+    if status == "missing":
+        return jsonify({"success": False, "error": "Code expired — please request a new one."})
     return jsonify({"success": False, "error": "Invalid OTP"})
 
 # returns a blank placeholder frame — not really used anymore since we switched to browser camera
 @app.route('/video_feed')
 def video_feed():
+    import cv2
     blank = np.zeros((480, 640, 3), dtype=np.uint8)
     cv2.putText(blank, "Using Browser Camera", (150, 240),
                 cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
@@ -245,47 +594,105 @@ def start_face_scan():
     if 'image' not in request.files:
         return jsonify({"success": False, "error": "No image provided."})
 
-    file  = request.files['image']
-    npimg = np.frombuffer(file.read(), np.uint8)
-    frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+    pipeline = face_stack()
+    if pipeline is None:
+        return jsonify({"success": False, "error": "Face scan isn't available on this server."}), 503
+    try:
+        faces = read_faces(pipeline)
+    except pipeline.ImageRejected as e:
+        return jsonify({"success": False, "error": str(e)})
+
+    if not faces:
+        return jsonify({"success": False,
+                        "error": "No face detected — please ensure your face is clearly visible."})
 
-    if frame is None:
-        return jsonify({"success": False, "error": "Failed to read image"})
+    result = analyze_faces(faces)
+    if "error" in result:
+        return jsonify({"success": False, "error": "Face scan failed — please try again."})
 
-    if not is_real_face(frame):
-        print("✗ Spoof blocked — login")
+    if not result["real"]:
+        log.info(f"✗ Spoof blocked — login ({result['reason']})")
         return jsonify({"success": False,
                         "error": "Spoof detected — please use your real face, not a photo or screen."})
-
-    embedding = get_face_embedding(frame)
-    if embedding is None:
+    if result["embedding"] is None:
         return jsonify({"success": False,
-                        "error": "No face detected — please ensure your face is clearly visible."})
+                        "error": "Couldn't get a steady look at your face — please hold still and try again."})
+
+    embedding = result["embedding"]
 
     email = session.get('email')
     if not email:
         return jsonify({"success": False,
                         "error": "Session expired — please enter your email again."})
 
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT face_embedding FROM users WHERE email = ?", (email,))
-        row = c.fetchone()
-
-    if row is None:
+    matched = match_face(email, embedding)
+    if matched is None:
+        if face_needs_reenroll(email):
+            return jsonify({"success": False,
+                            "error": "Your face scan needs refreshing — sign in with the email code to redo it."})
         return jsonify({"success": False, "error": "No face registered for this account."})
 
-    stored_emb = np.frombuffer(row[0], dtype=np.float32)
-
-    if compare_embeddings(embedding, stored_emb):
-        print(f"✓ Face matched: {email}")
+    if matched:
+        log.info(f"✓ Face matched: {email}")
         return jsonify({"success": True})
 
-    print(f"✗ Face mismatch for: {email}")
+    log.info(f"✗ Face mismatch for: {email}")
     return jsonify({"success": False,
                     "error": "Face does not match the account owner — try again or use OTP."})
 
 
+# face-first login: no email up front, the probe is searched against every enrolled user
+@app.route('/identify_face', methods=['POST'])
+def identify_face():
+    if not app.config['FACE_IDENTIFY_ENABLED']:
+        return jsonify({"success": False, "error": "Face-first login is not enabled."}), 404
+    if 'image' not in request.files:
+        return jsonify({"success": False, "error": "No image provided."})
+
+    pipeline = face_stack()
+    if pipeline is None:
+        return jsonify({"success": False, "error": "Face scan isn't available on this server."}), 503
+    try:
+        faces = read_faces(pipeline)
+    except pipeline.ImageRejected as e:
+        return jsonify({"success": False, "error": str(e)})
+
+    if not faces:
+        return jsonify({"success": False,
+                        "error": "No face detected — please ensure your face is clearly visible."})
+
+    result = analyze_faces(faces)
+    if "error" in result:
+        return jsonify({"success": False, "error": "Face scan failed — please try again."})
+
+    if not result["real"]:
+        log.info(f"✗ Spoof blocked — identify ({result['reason']})")
+        return jsonify({"success": False,
+                        "error": "Spoof detected — please use your real face, not a photo or screen."})
+    if result["embedding"] is None:
+        return jsonify({"success": False,
+                        "error": "Couldn't get a steady look at your face — please hold still and try again."})
+
+    with span("index_search"):
+        sync_face_index()
+        matches = face_index.search(result["embedding"], k=2)
+    matches = [(email, face_metric.from_l2(distance)) for email, distance in matches]
+    if not matches or matches[0][1] >= app.config['FACE_MATCH_THRESHOLD']:
+        log.info("✗ Face not identified")
+        return jsonify({"success": False,
+                        "error": "Face not recognized — please sign in with your email."})
+
+    # two users almost equally close is too ambiguous to log anyone in
+    if len(matches) > 1 and matches[1][1] - matches[0][1] < app.config['FACE_IDENTIFY_MARGIN']:
+        log.info(f"✗ Ambiguous identification ({matches[0][1]:.3f} vs {matches[1][1]:.3f})")
+        return jsonify({"success": False,
+                        "error": "Face not recognized — please sign in with your email."})
+
+    session['email'] = matches[0][0]
+    log.info(f"✓ Face identified: {matches[0][0]}")
+    return jsonify({"success": True})
+
+
 # GET renders the register form, POST validates the email, sends an OTP, and stashes pending details in session
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -293,24 +700,20 @@ def register():
         data  = request.json
         name  = data.get('name')
         email = data.get('email')
-        with sqlite3.connect('database.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT * FROM users WHERE email = ?", (email,))
-            if c.fetchone():
-                return jsonify({"success": False, "error": "Email already registered"})
+        if query_one("SELECT 1 FROM users WHERE email = ?", (email,)):
+            return jsonify({"success": False, "error": "Email already registered"})
         session['pending_email'] = email
         session['pending_name']  = name
-        otp = ''.join(str(secrets.randbelow(10)) for _ in range(6))
-        otp_store[email] = otp
+        otp = issue_otp(f"register:{email}")
         try:
-            msg      = Message('Your REAL ID Registration OTP',
-                               sender=app.config['MAIL_USERNAME'], recipients=[email])
-            msg.html = create_otp_email_html(otp, purpose="registration")
-            mail.send(msg)
-            print(f"✓ Registration OTP sent to {email}")
-            return jsonify({"success": True})
+            data    = otp_mime(otp, "registration", app.config['MAIL_USERNAME'], email, otp_ttl_minutes())
+            mail_id = mailer.send_raw(app.config['MAIL_USERNAME'], [email], data)
+            log.info(f"✓ Registration OTP queued for {email}")
+            return jsonify({"success": True, "mail_id": mail_id})
+        except MailQueueFull:
+            return jsonify({"success": False, "error": "Mail service is busy — please try again in a moment."})
         except Exception as e:
-            print(f"✗ Email error: {e}")
+            log.error(f"✗ Email error: {e}")
             return jsonify({"success": False, "error": f"Failed to send email: {e}"})
     return render_template('register.html')
 
@@ -320,10 +723,13 @@ def verify_register_otp():
     email = session.get('pending_email')
     if not email:
         return jsonify({"success": False, "error": "Session expired"})
-    user_input = request.json.get('otp')
-    if otp_store.get(email) == user_input:
-        otp_store.pop(email, None)
+    status = redeem_otp(f"register:{email}", request.json.get('otp'))
+    if status == "ok":
         return jsonify({"success": True})
+    if status == "locked":
+        return jsonify({"success": False, "error": "Too many attempts — please request a new code."})
+    if status == "missing":
+        return jsonify({"success": False, "error": "Code expired — please request a new one."})
     return jsonify({"success": False, "error": "Invalid OTP"})
 
 # renders the face capture page — bounces back to register if the session lost the pending user details
@@ -331,7 +737,7 @@ def verify_register_otp():
 def register_face():
     if 'pending_email' not in session or 'pending_name' not in session:
         return redirect('/register')
-    return render_template('register_face.html')
+    return render_template('register_face.html', burst_frames=app.config['FACE_BURST_FRAMES'])
 
 # receives the registration photo, runs anti-spoof + embedding extraction, then saves the user to the DB
 @app.route('/capture_face', methods=['POST'])
@@ -343,52 +749,123 @@ def capture_face():
     if 'image' not in request.files:
         return jsonify({"success": False, "error": "No image provided."})
 
-    file  = request.files['image']
-    npimg = np.frombuffer(file.read(), np.uint8)
-    frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+    pipeline = face_stack()
+    if pipeline is None:
+        return jsonify({"success": False, "error": "Face scan isn't available on this server."}), 503
+    try:
+        faces = read_faces(pipeline)
+    except pipeline.ImageRejected as e:
+        return jsonify({"success": False, "error": str(e)})
 
-    if frame is None:
-        return jsonify({"success": False, "error": "Failed to read image"})
+    if not faces:
+        return jsonify({"success": False,
+                        "error": "No face detected — please ensure your face is clearly visible."})
+
+    result = analyze_faces(faces)
+    if "error" in result:
+        return jsonify({"success": False, "error": "Face scan failed — please try again."})
 
-    if not is_real_face(frame):
-        print("✗ Spoof blocked — registration")
+    if not result["real"]:
+        log.info(f"✗ Spoof blocked — registration ({result['reason']})")
         return jsonify({"success": False,
                         "error": "Spoof detected — please use your real face, not a photo or screen."})
-
-    embedding = get_face_embedding(frame)
-    if embedding is None:
+    if result["embedding"] is None:
         return jsonify({"success": False,
-                        "error": "No face detected — please ensure your face is clearly visible."})
+                        "error": "Couldn't get a steady look at your face — please hold still and try again."})
 
-    with sqlite3.connect('database.db') as conn:
+    # the centroid of the burst is the user's embedding; FACE_TEMPLATES of the frames are kept as well
+    embedding = result["embedding"].astype(np.float32)
+    templates = pick_templates(result["embeddings"], embedding, app.config['FACE_TEMPLATES'])
+    reenroll  = session.get('reenroll', False)
+
+    with transaction() as conn:
         c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE email = ?", (email,))
+        c.execute("SELECT 1 FROM users WHERE email = ?", (email,))
         if c.fetchone():
-            return jsonify({"success": False, "error": "Email already registered"})
+            if not reenroll:
+                return jsonify({"success": False, "error": "Email already registered"})
+            # re-enrolment re-inserts the row so its new id reaches the other workers' face indexes
+            c.execute("DELETE FROM users WHERE email = ?", (email,))
+            c.execute("DELETE FROM face_templates WHERE email = ?", (email,))
         c.execute("INSERT INTO users (email, name, face_embedding) VALUES (?, ?, ?)",
-                  (email, name, embedding.tobytes()))
-        conn.commit()
+                  (email, name, encode_embedding(embedding)))
+        c.executemany("INSERT INTO face_templates (email, embedding) VALUES (?, ?)",
+                      [(email, encode_embedding(template)) for template in templates])
+    if face_index.signature is not None:
+        face_index.add(email, embedding)
+        face_index_skipped.discard(email)
+    embedding_cache.invalidate(email)
 
     session.pop('pending_email', None)
     session.pop('pending_name',  None)
+    session.pop('reenroll',      None)
     session['email'] = email
-    print(f"✓ Face registered: {email}")
-    return jsonify({"success": True})
+    log.info(f"✓ Face {'re-enrolled' if reenroll else 'registered'}: {email} "
+             f"({result['used']} frames, {len(templates)} templates)")
+    return jsonify({"success": True, "frames_used": result["used"]})
 
-# fetches all saved passwords for the logged-in user and renders the vault
+# renders the vault with just its first page of entries — the page pulls the rest, search results
+# and later edits through the JSON API below
 @app.route('/vault')
 def vault():
     if 'email' not in session:
         return redirect('/login')
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT id, service, secret FROM passwords WHERE email = ?", (session['email'],))
-        passwords = c.fetchall()
-        c.execute("SELECT name FROM users WHERE email = ?", (session['email'],))
-        user = c.fetchone()
-    return render_template('vault.html', passwords=passwords,
+    email                 = session['email']
+    cursor                = vault_sync.current_cursor()
+    passwords, next_after = vault_sync.page(email, limit=app.config['VAULT_PAGE_SIZE'])
+    user                  = query_one("SELECT name FROM users WHERE email = ?", (email,))
+    return render_template('vault.html', passwords=passwords, password_count=vault_sync.count(email),
+                           next_after=next_after, cursor=cursor,
                            user_name=user[0] if user else 'User')
 
+# whose vault an API call reads: the extension's bearer token if it sent one, else the logged-in session.
+# Returns (email or None, renewed token or None)
+def vault_owner():
+    bearer = check_extension_token()
+    if bearer is not None:
+        return bearer
+    return session.get('email'), None
+
+# one keyset page of the vault as JSON: ?after=<last id seen>&limit=&q=<search>. The first page also
+# carries the total and the change cursor to sync from
+@app.route('/api/vault')
+def vault_api():
+    email, renewed = vault_owner()
+    if not email:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    try:
+        after = max(0, int(request.args.get('after', 0)))
+        limit = min(max(1, int(request.args.get('limit', app.config['VAULT_PAGE_SIZE']))), 500)
+    except ValueError:
+        return jsonify({"success": False, "error": "after and limit must be integers"}), 400
+
+    cursor            = vault_sync.current_cursor() if not after else None
+    items, next_after = vault_sync.page(email, after, limit, request.args.get('q', '').strip() or None)
+    response = {"success": True, "items": items, "next": next_after}
+    if not after:
+        response["total"]  = vault_sync.count(email)
+        response["cursor"] = cursor
+    if renewed:
+        response["token"] = renewed
+    return jsonify(response)
+
+# what changed in the vault since a cursor: ?since=<cursor>. Upserted rows come back whole, deleted ones
+# as ids; reset=true means the cursor is older than the change log and the listing must be reloaded
+@app.route('/api/vault/changes')
+def vault_changes_api():
+    email, renewed = vault_owner()
+    if not email:
+        return jsonify({"success": False, "error": "Not authenticated"}), 401
+    try:
+        since = max(0, int(request.args.get('since', 0)))
+    except ValueError:
+        return jsonify({"success": False, "error": "since must be an integer"}), 400
+
+    response = {"success": True, **vault_sync.changes(email, since), "total": vault_sync.count(email)}
+    if renewed:
+        response["token"] = renewed
+    return jsonify(response)
+
 # saves a new password entry for the logged-in user
 @app.route('/add_password', methods=['POST'])
 def add_password():
@@ -399,12 +876,9 @@ def add_password():
     username = data.get('username', '')
     secret   = data.get('secret')
     combined = f"{service}|{username}" if username else service
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO passwords (email, service, secret) VALUES (?, ?, ?)",
-                  (session['email'], combined, secret))
-        conn.commit()
-        password_id = c.lastrowid
+    c = execute("INSERT INTO passwords (email, service, secret, domain, username) VALUES (?, ?, ?, ?, ?)",
+                (session['email'], combined, secret, registrable_domain(service), username or None))
+    password_id = c.lastrowid
     return jsonify({"success": True, "id": password_id})
 
 # updates an existing password entry — only works if the row belongs to the session user
@@ -417,11 +891,8 @@ def update_password(password_id):
     username = data.get('username', '')
     secret   = data.get('secret')
     combined = f"{service}|{username}" if username else service
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("UPDATE passwords SET service = ?, secret = ? WHERE id = ? AND email = ?",
-                  (combined, secret, password_id, session['email']))
-        conn.commit()
+    execute(UPDATE_PASSWORD_SQL,
+            (combined, secret, registrable_domain(service), username or None, password_id, session['email']))
     return jsonify({"success": True})
 
 # deletes a single password entry — the email check makes sure users can't delete each other's passwords
@@ -429,36 +900,29 @@ def update_password(password_id):
 def delete_password(password_id):
     if 'email' not in session:
         return jsonify({"success": False, "error": "Not authenticated"})
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("DELETE FROM passwords WHERE id = ? AND email = ?",
-                  (password_id, session['email']))
-        conn.commit()
+    execute("DELETE FROM passwords WHERE id = ? AND email = ?",
+            (password_id, session['email']))
     return jsonify({"success": True})
 
 
-# sends a separate OTP for account deletion — stored under a different key so it can't be reused for login
+# sends a separate OTP for account deletion — stored under its own delete: key so it can't be reused for login
 @app.route('/send_delete_otp', methods=['POST'])
 def send_delete_otp():
     if 'email' not in session:
         return jsonify({"success": False, "error": "Not authenticated"})
 
     email = session['email']
-    otp   = str(secrets.randbelow(900000) + 100000)
-    otp_store[f"delete_{email}"] = {
-        "otp":     otp,
-        "expires": time.time() + 600
-    }
+    otp   = issue_otp(f"delete:{email}")
 
     try:
-        msg      = Message("REAL ID — Account Deletion Verification",
-                           sender=app.config['MAIL_USERNAME'], recipients=[email])
-        msg.html = create_otp_email_html(otp, purpose="deletion")
-        mail.send(msg)
-        print(f"✓ Deletion OTP sent to {email}")
-        return jsonify({"success": True})
+        data    = otp_mime(otp, "deletion", app.config['MAIL_USERNAME'], email, otp_ttl_minutes())
+        mail_id = mailer.send_raw(app.config['MAIL_USERNAME'], [email], data)
+        log.info(f"✓ Deletion OTP queued for {email}")
+        return jsonify({"success": True, "mail_id": mail_id})
+    except MailQueueFull:
+        return jsonify({"success": False, "error": "Mail service is busy — please try again in a moment."})
     except Exception as e:
-        print(f"✗ Mail error (delete OTP): {e}")
+        log.error(f"✗ Mail error (delete OTP): {e}")
         return jsonify({"success": False, "error": "Failed to send OTP email. Please try again."})
 
 # verifies the deletion OTP then wipes the user's passwords and account row before clearing the session
@@ -469,33 +933,32 @@ def delete_account():
 
     email      = session['email']
     user_input = request.json.get('otp', '').strip()
-    store_key  = f"delete_{email}"
-
-    if store_key not in otp_store:
-        return jsonify({"success": False, "error": "No OTP found. Please request a new one."})
-
-    record = otp_store[store_key]
 
-    if time.time() > record['expires']:
-        del otp_store[store_key]
-        return jsonify({"success": False, "error": "OTP has expired. Please start over."})
-
-    if user_input != record['otp']:
+    status = redeem_otp(f"delete:{email}", user_input)
+    if status == "missing":
+        return jsonify({"success": False, "error": "No OTP found or it has expired. Please request a new one."})
+    if status == "locked":
+        return jsonify({"success": False, "error": "Too many attempts. Please start over."})
+    if status == "invalid":
         return jsonify({"success": False, "error": "Invalid OTP. Please try again."})
 
-    del otp_store[store_key]
-
     try:
-        with sqlite3.connect('database.db') as conn:
+        with transaction() as conn:
             c = conn.cursor()
             c.execute("DELETE FROM passwords WHERE email = ?", (email,))
+            c.execute("DELETE FROM face_templates WHERE email = ?", (email,))
+            c.execute("DELETE FROM password_changes WHERE email = ?", (email,))
+            c.execute("DELETE FROM password_changes_pruned WHERE email = ?", (email,))
             c.execute("DELETE FROM users WHERE email = ?", (email,))
-            conn.commit()
+        if face_index.signature is not None:
+            face_index.remove(email)
+            face_index_skipped.discard(email)
+        embedding_cache.invalidate(email)
         session.clear()
-        print(f"✓ Account deleted: {email}")
+        log.info(f"✓ Account deleted: {email}")
         return jsonify({"success": True})
     except Exception as e:
-        print(f"✗ Delete account error: {e}")
+        log.error(f"✗ Delete account error: {e}")
         return jsonify({"success": False, "error": "Failed to delete account. Please try again."})
 
 
@@ -512,101 +975,134 @@ def verify_face_extension():
     if 'image' not in request.files:
         return jsonify({"success": False, "error": "No image provided"}), 400
 
-    file  = request.files['image']
-    npimg = np.frombuffer(file.read(), np.uint8)
-    frame = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+    pipeline = face_stack()
+    if pipeline is None:
+        return jsonify({"success": False, "error": "Face scan isn't available on this server."}), 503
+    try:
+        faces = read_faces(pipeline)
+    except pipeline.ImageRejected as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    if not faces:
+        return jsonify({"success": False, "error": "No face detected"}), 400
 
-    if frame is None:
-        return jsonify({"success": False, "error": "Failed to read image"}), 400
+    result = analyze_faces(faces)
+    if "error" in result:
+        return jsonify({"success": False, "error": "Face scan failed — please try again."}), 500
 
-    if not is_real_face(frame):
-        print("✗ [Extension] Spoof blocked")
+    if not result["real"]:
+        log.info(f"✗ [Extension] Spoof blocked ({result['reason']})")
         return jsonify({"success": False,
                         "error": "Spoof detected — use your real face"}), 401
+    if result["embedding"] is None:
+        return jsonify({"success": False,
+                        "error": "Couldn't get a steady look at your face — hold still and try again"}), 400
 
-    embedding = get_face_embedding(frame)
-    if embedding is None:
-        return jsonify({"success": False, "error": "No face detected"}), 400
+    embedding = result["embedding"]
 
     email = session.get('email')
     if not email:
         return jsonify({"success": False,
                         "error": "Session expired — please log in first"}), 401
 
-    with sqlite3.connect('database.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT face_embedding FROM users WHERE email = ?", (email,))
-        row = c.fetchone()
-
-    if row is None:
+    matched = match_face(email, embedding)
+    if matched is None:
+        if face_needs_reenroll(email):
+            return jsonify({"success": False,
+                            "error": "Face scan needs refreshing — sign in on the website with the email code"}), 404
         return jsonify({"success": False,
                         "error": "No face registered for this account"}), 404
 
-    stored_emb = np.frombuffer(row[0], dtype=np.float32)
-
-    if compare_embeddings(embedding, stored_emb):
+    if matched:
         session['verified_at'] = time.time()
-        print(f"✓ [Extension] Face verified: {email}")
-        return jsonify({"success": True, "email": email})
+        log.info(f"✓ [Extension] Face verified: {email}")
+        return jsonify({"success": True, "email": email,
+                        "token": issue_extension_token(email, session['verified_at']),
+                        "expires_in": app.config['EXTENSION_TOKEN_TTL']})
 
-    print(f"✗ [Extension] Face mismatch: {email}")
+    log.info(f"✗ [Extension] Face mismatch: {email}")
     return jsonify({"success": False,
                     "error": "Face does not match the account owner"}), 401
 
-# looks up saved credentials matching the domain the extension is currently on
+# looks up saved credentials matching the domain the extension is currently on — newest first,
+# or every match when the extension sends all=true. Authenticated by the bearer token from verify_face,
+# or by the older cookie session for extension builds that don't send one
 @app.route('/extension/get_credentials', methods=['POST'])
 def get_credentials_for_extension():
-    if 'email' not in session:
-        return jsonify({"success": False,
-                        "error": "Not authenticated. Please verify your face first."}), 401
-    if time.time() - session.get('verified_at', 0) > 300:
-        session.clear()
-        return jsonify({"success": False,
-                        "error": "Session expired. Please verify your face again."}), 401
+    bearer = check_extension_token()
+    if bearer is not None:
+        user_email, renewed = bearer
+        if user_email is None:
+            return jsonify({"success": False,
+                            "error": "Session expired. Please verify your face again."}), 401
+    else:
+        renewed = None
+        if 'email' not in session:
+            return jsonify({"success": False,
+                            "error": "Not authenticated. Please verify your face first."}), 401
+        if time.time() - session.get('verified_at', 0) > 300:
+            session.clear()
+            return jsonify({"success": False,
+                            "error": "Session expired. Please verify your face again."}), 401
+        user_email = session['email']
 
-    user_email = session['email']
     data       = request.json
     domain     = data.get('domain', '').lower().strip()
+    return_all = bool(data.get('all'))
 
     if not domain:
         return jsonify({"success": False, "error": "Domain is required"}), 400
 
+    keys = lookup_keys(domain)
+    if not keys:
+        return jsonify({"success": False, "error": "Domain is required"}), 400
+
     try:
-        with sqlite3.connect('database.db') as conn:
-            c = conn.cursor()
-            c.execute("""
-                SELECT id, service, secret
-                FROM passwords
-                WHERE email = ?
-                AND (service LIKE ? OR service LIKE ? OR service = ?)
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (user_email, f"%{domain}%", f"{domain}|%", domain))
-            result = c.fetchone()
-
-        if not result:
-            print(f"✗ [Extension] No credentials for {domain}")
+        sql = f"""
+            SELECT id, service, username, secret
+            FROM passwords
+            WHERE email = ? AND domain IN ({",".join("?" * len(keys))})
+            ORDER BY created_at DESC
+        """
+        rows = query_all(sql if return_all else sql + " LIMIT 1", (user_email, *keys))
+
+        if not rows:
+            log.info(f"✗ [Extension] No credentials for {domain}")
             return jsonify({"success": False,
                             "error": f"No credentials found for {domain}"}), 404
 
-        _, service, encrypted_secret = result
-        if '|' in service:
-            stored_domain, username = service.split('|', 1)
-        else:
-            stored_domain = service
-            username      = user_email
+        credentials = []
+        for _, service, username, encrypted_secret in rows:
+            stored_domain, _ = split_service(service)
+            credentials.append({"email": username or user_email,
+                                "password": encrypted_secret, "domain": stored_domain})
 
-        print(f"✓ [Extension] Credentials sent for {domain}")
-        return jsonify({"success": True, "email": username,
-                        "password": encrypted_secret, "domain": stored_domain})
+        log.info(f"✓ [Extension] Credentials sent for {domain} ({len(credentials)})")
+        response = {"success": True, **credentials[0]}
+        if return_all:
+            response["credentials"] = credentials
+        if renewed:
+            response["token"] = renewed
+        return jsonify(response)
 
     except Exception as e:
-        print(f"✗ [Extension] Error: {e}")
+        log.error(f"✗ [Extension] Error: {e}")
         return jsonify({"success": False, "error": "Failed to fetch credentials"}), 500
 
-# lets the extension check whether the current session is still valid before doing anything
+# lets the extension check whether its token (or cookie session) is still valid before doing anything —
+# a token past half its TTL comes back renewed
 @app.route('/extension/check_session', methods=['GET'])
 def check_extension_session():
+    bearer = check_extension_token()
+    if bearer is not None:
+        email, renewed = bearer
+        if email is None:
+            return jsonify({"authenticated": False}), 401
+        response = {"authenticated": True, "email": email}
+        if renewed:
+            response["token"] = renewed
+        return jsonify(response)
+
     if 'email' in session:
         if time.time() - session.get('verified_at', 0) <= 300:
             return jsonify({"authenticated": True, "email": session['email']})
@@ -614,5 +1110,117 @@ def check_extension_session():
     return jsonify({"authenticated": False}), 401
 
 
+# opens the request's span trace and, for the requests picked for profiling, starts the stack sampler:
+# a random PROFILE_SAMPLE_RATE share, plus any request carrying X-Profile: <PROFILE_TOKEN>
+@app.before_request
+def start_request_telemetry():
+    request.telemetry_start = time.perf_counter()
+    telemetry.start_trace()
+    token   = app.config['PROFILE_TOKEN']
+    profile = (token and secrets.compare_digest(request.headers.get('X-Profile', '').encode(), token.encode())) \
+              or secrets.randbelow(1_000_000) < app.config['PROFILE_SAMPLE_RATE'] * 1_000_000
+    if profile:
+        request.profiler = telemetry.StackSampler(threading.get_ident(),
+                                                  interval=app.config['PROFILE_INTERVAL_MS'] / 1000.0).start()
+
+# request latency by endpoint + status, Server-Timing (SERVER_TIMING=True) and the profile, if one ran
+@app.after_request
+def finish_request_telemetry(response):
+    start = getattr(request, 'telemetry_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    spans   = telemetry.finish_trace()
+    telemetry.registry.observe("realid_request_seconds", elapsed, endpoint=request.endpoint or "unmatched",
+                               method=request.method, status=str(response.status_code))
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = telemetry.server_timing(spans + [("total", elapsed)])
+
+    profiler = getattr(request, 'profiler', None)
+    if profiler is not None:
+        request.profiler = None
+        path = telemetry.write_profile(profiler.stop(), app.config['PROFILE_DIR'], request.endpoint or request.path)
+        log.info(f"✓ Profile written: {path} ({elapsed * 1000:.1f} ms, "
+                 f"{' '.join(f'{stage}={t * 1000:.1f}' for stage, t in spans)})")
+    return response
+
+# admission for the face routes: per-IP and per-user token buckets first, then a slot in the concurrency
+# limiter (waiting at most FACE_QUEUE_TIMEOUT in its bounded queue). Anything turned away gets an
+# immediate 429 + Retry-After rather than a timeout, and the page keeps offering the email code
+@app.before_request
+def admit_face_request():
+    if request.endpoint not in FACE_ENDPOINTS:
+        return None
+    try:
+        face_ip_limiter.hit(request.remote_addr)
+        user = session.get('email') or session.get('pending_email')
+        if user:
+            face_user_limiter.hit(user)
+        request.face_slot = face_limiter.acquire()
+    except Rejected as e:
+        telemetry.registry.inc("realid_face_rejected_total", reason=e.reason)
+        log.info(f"✗ Face request shed ({e.reason}, retry in {e.retry_after}s)")
+        response = jsonify({"success": False, "retry_after": e.retry_after,
+                            "error": f"Face scan is busy — try again in {e.retry_after}s or use the email code."})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    return None
+
+# frees the face slot however the request ended
+@app.teardown_request
+def release_face_slot(error=None):
+    started = getattr(request, 'face_slot', None)
+    if started is not None:
+        request.face_slot = None
+        face_limiter.release(started)
+
+# a request that died with an unhandled error skips after_request — don't leave its sampler running
+@app.teardown_request
+def stop_request_profiler(error=None):
+    profiler = getattr(request, 'profiler', None)
+    if profiler is not None:
+        request.profiler = None
+        profiler.stop()
+
+# Prometheus scrape endpoint — stage/request/SQLite latency histograms, counters and queue gauges
+@app.route('/metrics')
+def metrics():
+    return Response(telemetry.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# liveness probe — the process is up and serving requests
+@app.route('/healthz')
+def healthz():
+    return jsonify({"ok": True})
+
+# readiness probe — only 200 once the models are loaded and warmed, so the load balancer skips cold workers
+@app.route('/readyz')
+def readyz():
+    # slim workers (and lazy ones that haven't had a face request yet) don't hold models, so don't gate on them
+    if app.config['INFERENCE_BACKEND'] == 'none' or not (app.config['MODEL_PRELOAD'] or models.loaded):
+        return jsonify({"ready": True, "backend": app.config['INFERENCE_BACKEND'], "models_loaded": False})
+    ready  = models.is_ready(require_antispoof=app.config['REQUIRE_ANTISPOOF'])
+    status = models.status()
+    if inference_client is not None:
+        service = inference_client.status()
+        ready   = ready and service.get("ready", False)
+        if app.config['REQUIRE_ANTISPOOF'] and not service.get("antispoof"):
+            ready = False
+        status["inference_service"] = service
+    status["ready"] = ready
+    return jsonify(status), (200 if ready else 503)
+
+# admission limiter state, micro-batcher numbers (batch size distribution, queue wait) plus embedding / frame cache hit/miss counters
+@app.route('/inference/stats')
+def inference_stats():
+    return jsonify({"admission":       {"concurrency": face_limiter.stats(),
+                                        "per_user":    face_user_limiter.stats(),
+                                        "per_ip":      face_ip_limiter.stats()},
+                    "batcher":         face_batcher.stats() if face_batcher else None,
+                    "service":         inference_client.stats() if inference_client else None,
+                    "embedding_cache": embedding_cache.stats(),
+                    "frame_cache":     frame_cache.stats() if frame_cache else None,
+                    "face_index":      face_index.stats()})
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, ssl_context=("cert.pem", "key.pem"))
\ No newline at end of file
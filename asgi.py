@@ -0,0 +1,91 @@
+import json
+import os
+
+from a2wsgi import WSGIMiddleware
+
+import telemetry
+from app import app, face_limiter
+
+# ASGI entry point — the event loop owns the sockets, and each request runs the Flask app on one of two
+# thread pools:
+#
+#   uvicorn asgi:application
+#   GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:application
+#
+# Face routes do decoding, detection and inference, which is CPU-bound work. They get a small pool of
+# their own. Every other route (OTP, vault CRUD, extension session checks) mostly waits on SQLite or
+# SMTP, so those get a wide pool that a burst of face scans can't drain.
+
+INFERENCE_PATHS = {'/start_face_scan', '/capture_face', '/extension/verify_face', '/identify_face'}
+
+app.config['ASGI_IO_THREADS']        = int(os.getenv('ASGI_IO_THREADS', 32))
+app.config['ASGI_INFERENCE_THREADS'] = int(os.getenv('ASGI_INFERENCE_THREADS', os.cpu_count() or 2))
+
+io_app        = WSGIMiddleware(app, workers=app.config['ASGI_IO_THREADS'])
+inference_app = WSGIMiddleware(app, workers=app.config['ASGI_INFERENCE_THREADS'])
+
+
+# sends a bare response straight from the event loop
+async def _reply(send, status, text, content_type=b"text/plain; charset=utf-8", headers=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", content_type), *headers]})
+    await send({"type": "http.response.body", "body": text.encode()})
+
+# the same 429 the Flask admission hook gives, sent before the upload is read or a thread is taken,
+# when the face limiter's queue is already full
+async def _shed(send):
+    retry_after = max(1, int(face_limiter.service_time or 1))
+    telemetry.registry.inc("realid_face_rejected_total", reason="queue_full")
+    body = json.dumps({"success": False, "retry_after": retry_after,
+                       "error": f"Face scan is busy — try again in {retry_after}s or use the email code."})
+    await _reply(send, 429, body, b"application/json", [(b"retry-after", str(retry_after).encode())])
+
+# reads the whole upload on the event loop before a thread is picked, so a slow client never holds one
+# of the few inference threads — returns None if the client went away or the body is over the limit
+async def _read_body(receive, limit):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if limit and size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+# hands the buffered body to the WSGI side in one piece, then falls through to the real receive so
+# disconnects are still noticed
+def _replay(body, receive):
+    pending = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def replay():
+        if pending:
+            return pending.pop()
+        return await receive()
+    return replay
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http" or scope["path"] not in INFERENCE_PATHS:
+        return await io_app(scope, receive, send)
+
+    if scope["method"] == "GET":
+        return await inference_app(scope, receive, send)
+    if face_limiter.saturated():
+        return await _shed(send)
+    body = await _read_body(receive, app.config['MAX_CONTENT_LENGTH'])
+    if body is None:
+        return await _reply(send, 413, "Upload too large or incomplete")
+    return await inference_app(scope, _replay(body, receive), send)
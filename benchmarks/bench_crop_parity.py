@@ -0,0 +1,108 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Match parity of face_pipeline's Facenet inputs against the DeepFace path enrolments were made with
+# before it (DeepFace.extract_faces, opencv backend, align=True, resized to Facenet's input).
+#
+#   python benchmarks/bench_crop_parity.py --people faces/      # faces/<person>/<photo>.jpg, 2+ photos each
+#
+# For every FACE_CROP (aligned, tight) it embeds the same photos both ways and, with FACE_METRIC and
+# FACE_MATCH_THRESHOLD, reports:
+#   - drift: distance between the old-path and new-path embedding of the same photo
+#   - frr / far: false reject / accept rates over genuine / impostor pairs for old vs old, new vs new,
+#     and old enrolment vs new probe (what users enrolled before the switch would see)
+# Prints one JSON line per crop; exits 1 when a crop's cross-path FRR is more than --max-frr-increase
+# above the old path's own. FACE_CROP defaults to tight; only switch to aligned once it passes here, and
+# expect every existing user to re-enrol when you do.
+
+
+# {person: [BGR frames]} from a folder with one sub-folder per person
+def load_people(folder):
+    import cv2
+    people = {}
+    for person in sorted(os.listdir(folder)):
+        paths  = sorted(glob.glob(os.path.join(folder, person, '*')))
+        frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+        if len(frames) >= 2:
+            people[person] = frames
+    if len(people) < 2:
+        raise SystemExit(f"need at least two people with two photos each in {folder}")
+    return people
+
+# the pre-face_pipeline input: DeepFace's own detection, alignment and crop
+def old_input(frame, size):
+    import cv2
+    from deepface import DeepFace
+    try:
+        faces = DeepFace.extract_faces(img_path=frame, detector_backend="opencv", enforce_detection=True, align=True)
+    except Exception:
+        return None
+    return cv2.resize(faces[0]["face"], size).astype(np.float32)
+
+def rates(embeddings, labels, metric, threshold, probes=None):
+    probes = embeddings if probes is None else probes
+    genuine, impostor = [], []
+    for i, j in itertools.combinations(range(len(labels)), 2):
+        distance = metric.distance(embeddings[i], probes[j])
+        (genuine if labels[i] == labels[j] else impostor).append(distance >= threshold)
+    return {"frr": round(float(np.mean(genuine)), 4), "far": round(float(1 - np.mean(impostor)), 4),
+            "genuine_pairs": len(genuine), "impostor_pairs": len(impostor)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--people',    required=True, help="folder with one sub-folder of photos per person")
+    parser.add_argument('--metric',    default=os.getenv('FACE_METRIC', 'cosine'), choices=("cosine", "euclidean"))
+    parser.add_argument('--threshold', type=float, default=None, help="FACE_MATCH_THRESHOLD (default per metric)")
+    parser.add_argument('--max-frr-increase', type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    from embedding_format import Metric
+    from face_models import FACE_CROPS, models
+    from face_pipeline import prepare_face
+
+    metric    = Metric(args.metric)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = float(os.getenv('FACE_MATCH_THRESHOLD', 0.40 if metric.cosine else 10.0))
+
+    models.load()
+    h, w   = models.facenet_input_size()
+    people = load_people(args.people)
+
+    failed = False
+    for crop in FACE_CROPS:
+        labels, old, new = [], [], []
+        for person, frames in people.items():
+            for frame in frames:
+                before = old_input(frame, (w, h))
+                face   = prepare_face(frame, crop=crop)
+                if before is None or face is None:
+                    continue
+                labels.append(person)
+                old.append(before)
+                new.append(face["facenet"])
+        old, new = models.embed(np.stack(old)), models.embed(np.stack(new))
+
+        drift  = [metric.distance(a, b) for a, b in zip(old, new)]
+        before = rates(old, labels, metric, threshold)
+        cross  = rates(old, labels, metric, threshold, probes=new)
+        failed = failed or cross["frr"] - before["frr"] > args.max_frr_increase
+        print(json.dumps({
+            "crop": crop, "metric": metric.name, "threshold": threshold, "photos": len(labels),
+            "drift_mean": round(float(np.mean(drift)), 4), "drift_p95": round(float(np.percentile(drift, 95)), 4),
+            "old_vs_old": before, "new_vs_new": rates(new, labels, metric, threshold), "old_vs_new": cross,
+        }))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
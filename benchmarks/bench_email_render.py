@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from flask import Flask
+
+try:
+    from flask_mail import Mail, Message
+except ImportError:  # the app dropped Flask-Mail; install it to get the fstring_message baseline
+    Mail = Message = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from otp_email import PURPOSES, _html, compile_mime, render_otp_email, otp_mime
+
+# Per-send cost of building an OTP email, before and after template precompilation.
+#
+#   python benchmarks/bench_email_render.py --iterations 20000
+#
+# "fstring" rebuilds the whole HTML document per send the way create_otp_email_html used to;
+# "cached" fills the OTP into the precompiled template. The *_message rows are everything a request
+# does before handing off to the mailer: the old path builds a flask_mail Message and serialises it
+# through the email package, the new one joins the OTP into the precompiled MIME body. The app no
+# longer depends on Flask-Mail, so fstring_message is only measured when it's installed.
+# Prints one JSON line per purpose.
+
+
+# the pre-change path: full f-string render, html-only Message
+def fstring_render(otp, purpose):
+    _, title, message, accent = PURPOSES[purpose]
+    return _html(otp, title, message, accent, 10)
+
+def fstring_message(otp, purpose):
+    msg      = Message(PURPOSES[purpose][0], sender="noreply@example.com", recipients=["user@example.com"])
+    msg.html = fstring_render(otp, purpose)
+    return msg.as_bytes()
+
+def cached_render(otp, purpose):
+    return render_otp_email(otp, purpose)
+
+def cached_message(otp, purpose):
+    return otp_mime(otp, purpose, "noreply@example.com", "user@example.com")
+
+# mean µs per call, peak traced bytes for a single call, and what a 1000-call pass leaves allocated
+def measure(fn, purpose, iterations):
+    otps = [f"{i % 1000000:06d}" for i in range(iterations)]
+    for otp in otps[:100]:
+        fn(otp, purpose)
+
+    start = time.perf_counter()
+    for otp in otps:
+        fn(otp, purpose)
+    elapsed = time.perf_counter() - start
+
+    sample = otps[:min(iterations, 1000)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for otp in sample:
+        fn(otp, purpose)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats  = after.compare_to(before, 'filename')
+    size   = sum(s.size_diff for s in stats if s.size_diff > 0)
+    blocks = sum(s.count_diff for s in stats if s.count_diff > 0)
+    tracemalloc.start()
+    fn(sample[0], purpose)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "us_per_call":         round(elapsed / iterations * 1e6, 2),
+        "peak_bytes_per_call": peak,
+        "retained_bytes":      size,
+        "retained_blocks":     blocks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--purposes',   nargs='+', default=list(PURPOSES))
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    if Mail is not None:
+        Mail(app)
+    with app.app_context():
+        for purpose in args.purposes:
+            compile_mime(purpose)
+            row = {
+                "purpose":        purpose,
+                "fstring_render": measure(fstring_render, purpose, args.iterations),
+                "cached_render":  measure(cached_render, purpose, args.iterations),
+            }
+            if Message is not None:
+                row["fstring_message"] = measure(fstring_message, purpose, max(1, args.iterations // 10))
+            row["cached_message"] = measure(cached_message, purpose, max(1, args.iterations // 10))
+            print(json.dumps(row), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_index import FaceIndex
+
+# Recall@1 and search latency of the 1:N face index on synthetic users.
+#
+#   python benchmarks/bench_face_index.py --sizes 10000 100000 1000000
+#
+# Each synthetic user is a random 128-d "identity"; probes are the identity plus noise, which is
+# roughly how two Facenet embeddings of the same person relate. Prints one JSON line per size.
+
+
+# random identities spread like raw Facenet embeddings (per-dim std ~ 1.5)
+def synthetic_users(n, dim, rng):
+    return rng.standard_normal((n, dim), dtype=np.float32) * 1.5
+
+# latency percentiles (ms) and recall@1 for a batch of probes against one index
+def run_queries(index, probes, truth, exact):
+    times, hits = [], 0
+    for probe, want in zip(probes, truth):
+        start = time.perf_counter()
+        best  = index.search(probe, k=1, exact=exact)
+        times.append((time.perf_counter() - start) * 1000)
+        hits += bool(best) and best[0][0] == want
+    times = np.array(times)
+    return {
+        "recall_at_1": hits / len(truth),
+        "p50_ms":      float(np.percentile(times, 50)),
+        "p95_ms":      float(np.percentile(times, 95)),
+        "p99_ms":      float(np.percentile(times, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',   type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise',   type=float, default=0.35, help="per-dim std of probe noise")
+    parser.add_argument('--nprobe',  type=int, default=8)
+    parser.add_argument('--dim',     type=int, default=128)
+    parser.add_argument('--seed',    type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for n in args.sizes:
+        users  = synthetic_users(n, args.dim, rng)
+        emails = [f"user{i}@example.com" for i in range(n)]
+        picks  = rng.choice(n, min(args.queries, n), replace=False)
+        probes = users[picks] + rng.standard_normal((len(picks), args.dim), dtype=np.float32) * args.noise
+        truth  = [emails[i] for i in picks]
+
+        index = FaceIndex(dim=args.dim, ann_threshold=0, nprobe=args.nprobe)
+        start = time.perf_counter()
+        index.rebuild(zip(emails, users))
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.add("late@example.com", users[0])
+        index.remove("late@example.com")
+        update_ms = (time.perf_counter() - start) * 1000
+
+        print(json.dumps({
+            "users":     n,
+            "build_s":   round(build_s, 3),
+            "nlist":     index.ivf.nlist,
+            "nprobe":    args.nprobe,
+            "update_ms": round(update_ms, 3),
+            "exact":     run_queries(index, probes, truth, exact=True),
+            "ivf":       run_queries(index, probes, truth, exact=False),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
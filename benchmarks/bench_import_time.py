@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+# Startup cost of `import app` per worker mode, from python -X importtime.
+#
+#   python benchmarks/bench_import_time.py
+#   python benchmarks/bench_import_time.py --modes slim --max-ms 800 --forbid tensorflow deepface cv2
+#
+# Each mode imports app in a fresh interpreter against a throwaway database:
+#   slim    INFERENCE_BACKEND=none       — landing page / vault / OTP / extension only
+#   lazy    MODEL_PRELOAD=False          — face stack imported by the first face request
+#   remote  INFERENCE_BACKEND=remote     — OpenCV cascades only, TF lives in inference_service.py
+#   full    the default, models loaded at import
+# Prints one JSON line per mode: total import time, peak RSS, the slowest imports app makes, and which
+# heavy packages got pulled in. With --max-ms / --forbid it exits 1 when a mode breaks the budget, so it
+# can run as a CI check.
+
+ROOT  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['tensorflow', 'keras', 'deepface', 'cv2', 'onnxruntime']
+
+MODES = {
+    "slim":   {"INFERENCE_BACKEND": "none"},
+    "lazy":   {"MODEL_PRELOAD": "False"},
+    "remote": {"INFERENCE_BACKEND": "remote"},
+    "full":   {},
+}
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# prints peak RSS from inside the child so it only counts the import itself
+_PROBE = ("import resource, sys; import app; "
+          "print('RSS', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)")
+
+
+# imports app once under -X importtime and summarises the trace
+def measure(mode, top):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, **MODES[mode])
+        env.setdefault('MAIL_USERNAME', 'bench@example.com')
+        env.setdefault('MAIL_PASSWORD', 'bench')
+        env.setdefault('SECRET_KEY', 'bench')
+        env['DATABASE_PATH'] = os.path.join(tmp, 'bench.db')
+        env['PYTHONPATH']    = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE],
+                              cwd=tmp, env=env, capture_output=True, text=True)
+
+    if proc.returncode != 0:
+        return {"mode": mode, "error": proc.stderr.strip().splitlines()[-1:]}
+
+    rss_kb, top_level, direct, seen = 0, [], [], set()
+    for line in proc.stderr.splitlines():
+        if line.startswith('RSS '):
+            rss_kb = int(line.split()[1])
+            continue
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, depth, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        seen.add(name.split('.')[0])
+        if depth == 1:
+            top_level.append((cumulative, name))
+        elif depth == 3:
+            direct.append((cumulative, name))
+
+    direct.sort(reverse=True)
+    return {
+        "mode":        mode,
+        "total_ms":    round(sum(c for c, _ in top_level) / 1000, 1),
+        "max_rss_mb":  round(rss_kb / 1024, 1),
+        "heavy":       [name for name in HEAVY if name in seen],
+        "slowest":     [{"module": name, "ms": round(c / 1000, 1)} for c, name in direct[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes',  nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--top',    type=int, default=8)
+    parser.add_argument('--max-ms', type=float, help="fail if a mode's import takes longer than this")
+    parser.add_argument('--forbid', nargs='*', default=[], help="fail if a mode imports any of these packages")
+    args = parser.parse_args()
+
+    failed = False
+    for mode in args.modes:
+        result = measure(mode, args.top)
+        print(json.dumps(result), flush=True)
+        if "error" in result:
+            failed = True
+            continue
+        if args.max_ms is not None and result["total_ms"] > args.max_ms:
+            print(f"✗ {mode}: import took {result['total_ms']}ms (budget {args.max_ms}ms)", file=sys.stderr)
+            failed = True
+        for name in args.forbid:
+            if name in result["heavy"]:
+                print(f"✗ {mode}: imported {name}", file=sys.stderr)
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
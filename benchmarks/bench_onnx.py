@@ -0,0 +1,203 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Accuracy parity and latency/RSS of the ONNX Runtime backends against the TensorFlow one.
+#
+#   python onnx_export.py --int8
+#   python benchmarks/bench_onnx.py --images faces/ --runtimes tf onnx onnx-int8
+#
+# Each runtime runs in its own subprocess, so import time, load time and peak RSS aren't polluted by
+# the others. All of them see the same face crops (--images run through face_pipeline, otherwise
+# synthetic noise crops plus slightly perturbed copies). Parity is measured against the first runtime
+# listed (tf by default):
+#   - per-face embedding drift: FACE_METRIC distance between the two runtimes' embeddings of the same crop
+#   - pair distance error: |d_ref(a, b) - d_rt(a, b)| over all pairs, the number the match threshold sees
+#   - decision agreement: same match/no-match verdict at FACE_MATCH_THRESHOLD, and same spoof verdict
+# Prints one JSON line per runtime. With --min-agreement / --max-drift it exits 1 when a runtime falls
+# short (or fails to run), so it can gate a switch of INFERENCE_RUNTIME in CI.
+
+
+# prepared crops from a folder of photos, or synthetic ones when there's no folder
+def load_faces(folder, count, seed):
+    if folder:
+        import cv2
+        from face_pipeline import prepare_face
+        faces = []
+        for path in sorted(glob.glob(os.path.join(folder, '*'))):
+            frame = cv2.imread(path)
+            face  = prepare_face(frame) if frame is not None else None
+            if face is not None:
+                faces.append(face)
+            if len(faces) >= count:
+                break
+        if not faces:
+            raise SystemExit(f"no faces found in {folder}")
+        return np.stack([f["spoof"] for f in faces]), np.stack([f["facenet"] for f in faces])
+
+    rng     = np.random.default_rng(seed)
+    half    = max(1, count // 2)
+    spoof   = rng.random((half, 224, 224, 3), dtype=np.float32)
+    facenet = rng.random((half, 160, 160, 3), dtype=np.float32)
+    # perturbed copies give near pairs, so both sides of the threshold get exercised
+    spoof   = np.concatenate([spoof, np.clip(spoof + rng.normal(0, 0.02, spoof.shape), 0, 1)]).astype(np.float32)
+    facenet = np.concatenate([facenet, np.clip(facenet + rng.normal(0, 0.02, facenet.shape), 0, 1)]).astype(np.float32)
+    return spoof, facenet
+
+def percentiles(times):
+    times = np.array(times) * 1000
+    return {"p50_ms": round(float(np.percentile(times, 50)), 2),
+            "p95_ms": round(float(np.percentile(times, 95)), 2),
+            "p99_ms": round(float(np.percentile(times, 99)), 2)}
+
+
+# child: loads one runtime, times it and dumps its outputs for the parent to compare
+def run_child(runtime, inputs, output, repeats, batch):
+    start = time.perf_counter()
+    from face_models import models
+    import_s = time.perf_counter() - start
+
+    models.load(runtime=runtime)
+    models.warm_up()
+    if not models.loaded or models.runtime != runtime:
+        raise SystemExit(f"runtime {runtime} not available (got {models.runtime}): {models.error}")
+
+    data    = np.load(inputs)
+    spoof   = data["spoof"]
+    facenet = data["facenet"]
+
+    embeddings = models.embed(facenet)
+    scores     = models.predict_spoof(spoof)
+
+    single, batched = [], []
+    for i in range(repeats):
+        j = i % len(facenet)
+        t = time.perf_counter()
+        models.embed(facenet[j:j + 1])
+        models.predict_spoof(spoof[j:j + 1])
+        single.append(time.perf_counter() - t)
+    for i in range(max(1, repeats // batch)):
+        idx = np.arange(i * batch, (i + 1) * batch) % len(facenet)
+        t   = time.perf_counter()
+        models.embed(facenet[idx])
+        models.predict_spoof(spoof[idx])
+        batched.append((time.perf_counter() - t) / batch)
+
+    np.savez(output, embeddings=embeddings, scores=scores if scores is not None else np.zeros(0))
+    print(json.dumps({
+        "import_s":       round(import_s, 3),
+        "load_s":         round(models.load_seconds or 0, 3),
+        "warmup_s":       round(models.warmup_seconds or 0, 3),
+        "max_rss_mb":     round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "single":         percentiles(single),
+        f"batch{batch}_per_face": percentiles(batched),
+    }))
+
+# every pairwise distance of a set of prepared embeddings, in the metric's units
+def pair_distances(embeddings, metric):
+    iu = np.triu_indices(len(embeddings), k=1)
+    return metric.from_l2(np.linalg.norm(embeddings[:, None] - embeddings[None], axis=2)[iu])
+
+# parent: parity of one runtime's outputs against the reference runtime's, measured the way the app
+# compares embeddings (embedding_format.Metric, so normalized vectors under cosine)
+def parity(ref, other, metric, threshold):
+    e_ref = np.stack([metric.prepare(e) for e in ref["embeddings"]])
+    e_rt  = np.stack([metric.prepare(e) for e in other["embeddings"]])
+    drift = metric.from_l2(np.linalg.norm(e_ref - e_rt, axis=1))
+    d_ref = pair_distances(e_ref, metric)
+    d_rt  = pair_distances(e_rt, metric)
+    out = {
+        "embedding_drift_mean": round(float(drift.mean()), 4),
+        "embedding_drift_max":  round(float(drift.max()), 4),
+        "pair_dist_err_mean":   round(float(np.abs(d_ref - d_rt).mean()), 4),
+        "pair_dist_err_max":    round(float(np.abs(d_ref - d_rt).max()), 4),
+        "match_agreement":      round(float(np.mean((d_ref < threshold) == (d_rt < threshold))), 4) if len(d_ref) else None,
+        "pairs":                int(len(d_ref)),
+    }
+    if len(ref["scores"]) and len(other["scores"]):
+        out["spoof_score_err_max"] = round(float(np.abs(ref["scores"] - other["scores"]).max()), 4)
+        out["spoof_agreement"]     = round(float(np.mean((ref["scores"] > 0.5) == (other["scores"] > 0.5))), 4)
+    return out
+
+# checks one runtime's parity numbers against the --min-agreement / --max-drift budget
+def parity_ok(runtime, check, min_agreement, max_drift):
+    ok = True
+    if min_agreement is not None:
+        for key in ("match_agreement", "spoof_agreement"):
+            if check.get(key) is not None and check[key] < min_agreement:
+                print(f"✗ {runtime}: {key} {check[key]} (minimum {min_agreement})", file=sys.stderr)
+                ok = False
+    if max_drift is not None and check["embedding_drift_max"] > max_drift:
+        print(f"✗ {runtime}: embedding drift {check['embedding_drift_max']} (maximum {max_drift})", file=sys.stderr)
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runtimes',  nargs='+', default=['tf', 'onnx', 'onnx-int8'])
+    parser.add_argument('--images',    help="folder of face photos (default: synthetic crops)")
+    parser.add_argument('--count',     type=int, default=64)
+    parser.add_argument('--repeats',   type=int, default=200)
+    parser.add_argument('--batch',     type=int, default=8)
+    parser.add_argument('--metric',    default=os.getenv('FACE_METRIC', 'cosine'), choices=("cosine", "euclidean"))
+    parser.add_argument('--threshold', type=float, default=None, help="FACE_MATCH_THRESHOLD (default per metric)")
+    parser.add_argument('--min-agreement', type=float, help="fail if match or spoof agreement drops below this")
+    parser.add_argument('--max-drift', type=float, help="fail if a face's embedding drifts further than this")
+    parser.add_argument('--seed',      type=int, default=0)
+    parser.add_argument('--child',     help=argparse.SUPPRESS)
+    parser.add_argument('--inputs',    help=argparse.SUPPRESS)
+    parser.add_argument('--output',    help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.inputs, args.output, args.repeats, args.batch)
+        return 0
+
+    from embedding_format import Metric
+    metric    = Metric(args.metric)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = float(os.getenv('FACE_MATCH_THRESHOLD', 0.40 if metric.cosine else 10.0))
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = os.path.join(tmp, "inputs.npz")
+        spoof, facenet = load_faces(args.images, args.count, args.seed)
+        np.savez(inputs, spoof=spoof, facenet=facenet)
+
+        outputs = {}
+        for runtime in args.runtimes:
+            output = os.path.join(tmp, f"{runtime}.npz")
+            proc   = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', runtime,
+                                     '--inputs', inputs, '--output', output,
+                                     '--repeats', str(args.repeats), '--batch', str(args.batch)],
+                                    capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(json.dumps({"runtime": runtime, "error": (proc.stderr or proc.stdout).strip()[-500:]}), flush=True)
+                failed = True
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            outputs[runtime] = np.load(output)
+            reference        = args.runtimes[0]
+            if runtime != reference and reference in outputs:
+                check = parity(outputs[reference], outputs[runtime], metric, threshold)
+                result[f"parity_vs_{reference}"] = check
+                failed = not parity_ok(runtime, check, args.min_agreement, args.max_drift) or failed
+            print(json.dumps({"runtime": runtime, "faces": len(facenet), "metric": metric.name,
+                              "threshold": threshold, **result}), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import types
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_pipeline import decode_upload, prepare_face
+from face_models import models
+
+# Upload size, transfer time and server decode cost of a full camera frame vs the client-side face crop.
+#
+#   python benchmarks/bench_upload_crop.py --image me.jpg
+#   python benchmarks/bench_upload_crop.py --kbps 400 1600 10000
+#
+# "full" is the old upload: the whole canvas as JPEG quality 0.95. The crop rows mirror captureBurst()
+# in static/shared.js: the centre square of the frame, scaled to the profile's side, at the highest
+# quality (0.85 stepping down to 0.55) that fits its byte budget. Transfer time is bytes over the given
+# link speeds; decode is decode_upload (+ prepare_face when the OpenCV cascades load).
+# Prints one JSON line per upload variant.
+
+PROFILES = {"crop_4g": (384, 48000), "crop_3g": (288, 28000), "crop_2g": (224, 16000)}
+
+
+# a camera-sized frame: the --image photo, or a synthetic one with sensor-like noise
+def load_frame(path, width, height, seed):
+    if path:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise SystemExit(f"can't read {path}")
+        return frame
+    rng   = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base  = np.stack([(xx * 255 / width), (yy * 255 / height), np.full_like(xx, 128.0)], axis=-1)
+    cv2.ellipse(base, (width // 2, height // 2), (width // 8, height // 5), 0, 0, 360, (90, 140, 200), -1)
+    return np.clip(base + rng.normal(0, 6, base.shape), 0, 255).astype(np.uint8)
+
+def encode(image, quality):
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality * 100)])
+    return buf.tobytes()
+
+# same steps as captureBurst(): centre square, scaled down, quality stepped until it fits the budget
+def client_crop(frame, side, budget):
+    h, w   = frame.shape[:2]
+    region = min(w, h)
+    x, y   = (w - region) // 2, (h - region) // 2
+    crop   = cv2.resize(frame[y:y + region, x:x + region], (min(side, region),) * 2, interpolation=cv2.INTER_AREA)
+    quality = 0.85
+    data    = encode(crop, quality)
+    while len(data) > budget and quality > 0.6:
+        quality -= 0.1
+        data     = encode(crop, quality)
+    meta = {"box": [x, y, region, region], "source": [w, h], "detector": "guide"}
+    return data, meta, round(quality, 2)
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    return {"p50_ms": round(float(np.percentile(times, 50)), 3), "p95_ms": round(float(np.percentile(times, 95)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--image',   help="camera-sized photo (default: synthetic 640x480 frame)")
+    parser.add_argument('--width',   type=int, default=640)
+    parser.add_argument('--height',  type=int, default=480)
+    parser.add_argument('--kbps',    type=int, nargs='+', default=[400, 1600, 10000], help="uplink speeds")
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--seed',    type=int, default=0)
+    args = parser.parse_args()
+
+    models.load(detectors_only=True)
+    frame    = load_frame(args.image, args.width, args.height, args.seed)
+    variants = [("full", encode(frame, 0.95), None, 0.95)]
+    for name, (side, budget) in PROFILES.items():
+        variants.append((name, *client_crop(frame, side, budget)))
+
+    for name, data, meta, quality in variants:
+        decode = lambda: decode_upload(types.SimpleNamespace(stream=io.BytesIO(data)), len(data), crop=meta)
+        result = {
+            "upload":    name,
+            "bytes":     len(data),
+            "quality":   quality,
+            "upload_ms": {str(kbps): round(len(data) * 8 / kbps, 1) for kbps in args.kbps},
+            "decode":    timed(decode, args.repeats),
+        }
+        if models.face_cascade is not None:
+            decoded = decode()
+            result["prepare_face"] = timed(lambda: prepare_face(decoded), args.repeats)
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
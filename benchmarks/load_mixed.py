@@ -0,0 +1,167 @@
+import argparse
+import http.cookiejar
+import json
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+
+# Mixed-workload load test: face scans and I/O routes hitting one deployment at the same time.
+#
+#   python benchmarks/load_mixed.py --url http://127.0.0.1:5000 --email you@example.com
+#
+# Run it once against each serving mode with the same flags and compare the JSON:
+#
+#   gunicorn -c gunicorn.conf.py app:app                                                    (sync workers)
+#   GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:application
+#
+# Scan clients POST a frame to /start_face_scan in a loop (--image, or a synthetic noise JPEG).
+# I/O clients cycle through check_email, send_otp, extension/check_session and vault. --email has to be
+# a registered user. Point MAIL_SERVER at a local sink so send_otp doesn't mail anyone.
+# Prints one JSON line with latency percentiles per request class.
+
+IO_STEPS = [
+    ("check_email",   "POST", "/check_email"),
+    ("send_otp",      "POST", "/send_otp"),
+    ("check_session", "GET",  "/extension/check_session"),
+    ("vault",         "GET",  "/vault"),
+]
+
+
+# a 640x480 noise JPEG — exercises decode and detection even though no face is found
+def synthetic_frame():
+    import cv2
+    rng   = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', frame)[1].tobytes()
+
+# one urllib opener per simulated user, with its own cookie jar (the session cookie)
+def make_client(insecure):
+    handlers = [urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())]
+    if insecure:
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode    = ssl.CERT_NONE
+        handlers.append(urllib.request.HTTPSHandler(context=ctx))
+    return urllib.request.build_opener(*handlers)
+
+def request(client, method, url, body=None, headers=None, timeout=60):
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    with client.open(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+def multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+class Recorder:
+
+    def __init__(self):
+        self.samples  = {}
+        self.errors   = {}
+        self.statuses = {}
+        self._lock    = threading.Lock()
+
+    def record(self, name, ms, ok, status=None):
+        with self._lock:
+            self.samples.setdefault(name, []).append(ms)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            if status is not None:
+                counts         = self.statuses.setdefault(name, {})
+                counts[status] = counts.get(status, 0) + 1
+
+    def summary(self, elapsed):
+        out = {}
+        for name, values in sorted(self.samples.items()):
+            values    = np.array(values)
+            out[name] = {
+                "requests": len(values),
+                "errors":   self.errors.get(name, 0),
+                "rps":      round(len(values) / elapsed, 1),
+                "p50_ms":   round(float(np.percentile(values, 50)), 1),
+                "p95_ms":   round(float(np.percentile(values, 95)), 1),
+                "p99_ms":   round(float(np.percentile(values, 99)), 1),
+            }
+            if name in self.statuses:
+                out[name]["statuses"] = dict(sorted(self.statuses[name].items()))
+        return out
+
+# times one request; a 5xx or a network error counts as an error (a 401 from check_session is an answer)
+def timed(recorder, name, fn):
+    start = time.perf_counter()
+    try:
+        ok = fn() < 500
+    except urllib.error.HTTPError as e:
+        ok = e.code < 500
+    except Exception:
+        ok = False
+    recorder.record(name, (time.perf_counter() - start) * 1000, ok)
+
+
+def scan_client(args, frame, recorder, deadline):
+    client = make_client(args.insecure)
+    login  = json.dumps({"email": args.email}).encode()
+    request(client, "POST", args.url + "/check_email", login, {"Content-Type": "application/json"})
+    body, headers = multipart("image", "frame.jpg", frame)
+    while time.time() < deadline:
+        timed(recorder, "face_scan",
+              lambda: request(client, "POST", args.url + "/start_face_scan", body, headers))
+
+def io_client(args, recorder, deadline):
+    client = make_client(args.insecure)
+    login  = json.dumps({"email": args.email}).encode()
+    while time.time() < deadline:
+        for name, method, path in IO_STEPS:
+            body    = login if name == "check_email" else (b"" if method == "POST" else None)
+            headers = {"Content-Type": "application/json"} if method == "POST" else {}
+            timed(recorder, name, lambda: request(client, method, args.url + path, body, headers))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url',          default='http://127.0.0.1:5000')
+    parser.add_argument('--email',        required=True)
+    parser.add_argument('--image',        help="JPEG to scan (default: synthetic noise frame)")
+    parser.add_argument('--scan-clients', type=int, default=8)
+    parser.add_argument('--io-clients',   type=int, default=16)
+    parser.add_argument('--duration',     type=float, default=30)
+    parser.add_argument('--insecure',     action='store_true', help="skip TLS verification (self-signed cert)")
+    parser.add_argument('--label',        default='', help="tag copied into the output, e.g. sync / asgi")
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    frame = open(args.image, 'rb').read() if args.image else synthetic_frame()
+
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads  = [threading.Thread(target=scan_client, args=(args, frame, recorder, deadline))
+                for _ in range(args.scan_clients)]
+    threads += [threading.Thread(target=io_client, args=(args, recorder, deadline))
+                for _ in range(args.io_clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(json.dumps({
+        "label":        args.label,
+        "url":          args.url,
+        "scan_clients": args.scan_clients,
+        "io_clients":   args.io_clients,
+        "duration_s":   round(time.time() - start, 1),
+        "results":      recorder.summary(time.time() - start),
+    }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
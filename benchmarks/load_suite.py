@@ -0,0 +1,582 @@
+import argparse
+import contextlib
+import email
+import http.client
+import json
+import os
+import re
+import shlex
+import socket
+import socketserver
+import sqlite3
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_mixed import Recorder
+from domains import registrable_domain
+from embedding_format import encode as encode_embedding
+from face_models import embedding_model_name
+from telemetry import FLUSH_INTERVAL
+
+# Reproducible end-to-end benchmark of the auth and vault routes at several database sizes.
+#
+#   python benchmarks/load_suite.py --sizes 1000 10000 100000 > results.jsonl
+#   python benchmarks/load_suite.py --sizes 1000 --env GUNICORN_WORKERS=4 INFERENCE_RUNTIME=onnx
+#   python benchmarks/load_suite.py --compare baseline.jsonl results.jsonl --max-regression 0.2
+#
+# For every size it seeds a fresh SQLite file (synthetic users with random embeddings, or with --enroll the
+# embeddings of the synthetic faces themselves so scans match, plus --passwords vault entries each), starts
+# the app under gunicorn against it with a local SMTP sink as MAIL_SERVER, and runs three kinds of client:
+#
+#   face   check_email, /start_face_scan and /extension/verify_face with synthetic face frames
+#   otp    check_email, /send_otp, waits for the mail in the sink (otp_delivery), /verify_otp
+#   vault  logs in by OTP once, then /vault, /api/vault and /extension/get_credentials (bearer token)
+#
+# Same --seed, same users, faces and request mix. After a warm-up it measures for --duration seconds and
+# prints one JSON line per size: throughput, p50/p95/p99 and status codes per route, plus mean time per
+# pipeline stage and per SQLite statement type read from the server's /metrics over the same window.
+# --compare diffs two such files and exits 1 when a route's p95 got worse by more than --max-regression.
+
+DOMAINS = [f"site{i}.com" for i in range(500)]
+
+
+# ---- synthetic data ----
+
+# a drawn frontal face (skin ellipse, eyes, brows, nose, mouth) that the Haar cascade usually detects;
+# `frame` only changes the sensor noise so a burst of the same face passes the motion check
+def synthetic_face(seed, frame=0, width=640, height=480):
+    rng    = np.random.default_rng(seed)
+    image  = np.full((height, width, 3), rng.integers(60, 200, 3), np.float32)
+    cx, cy = width // 2 + int(rng.integers(-20, 20)), height // 2 + int(rng.integers(-10, 10))
+    fw, fh = int(width * 0.16), int(height * 0.3)
+    skin   = tuple(int(v) for v in rng.integers([120, 140, 170], [170, 190, 230]))
+    cv2.ellipse(image, (cx, cy), (fw, fh), 0, 0, 360, skin, -1)
+    ey, ex = cy - fh // 4, fw // 2
+    for side in (-1, 1):
+        cv2.ellipse(image, (cx + side * ex, ey), (fw // 5, fh // 12), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(image, (cx + side * ex, ey), fh // 16, (40, 30, 20), -1)
+        cv2.line(image, (cx + side * ex - fw // 4, ey - fh // 7), (cx + side * ex + fw // 4, ey - fh // 7), (40, 30, 30), 6)
+    cv2.line(image, (cx, ey + 10), (cx - 8, cy + fh // 6), tuple(int(c * 0.7) for c in skin), 4)
+    cv2.ellipse(image, (cx, cy + fh // 3), (fw // 3, fh // 14), 0, 0, 180, (60, 60, 150), -1)
+    image  = cv2.GaussianBlur(image, (0, 0), 2)
+    noise  = np.random.default_rng((seed, frame)).normal(0, 4, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+# a burst of `frames` JPEGs of one face — --image photos get per-frame noise added the same way
+def face_burst(seed, frames, photo=None):
+    burst = []
+    for i in range(frames):
+        if photo is None:
+            image = synthetic_face(seed, i)
+        else:
+            noise = np.random.default_rng((seed, i)).normal(0, 2, photo.shape)
+            image = np.clip(photo + noise, 0, 255).astype(np.uint8)
+        burst.append(cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return burst
+
+def has_face(jpeg):
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    if cascade.empty():
+        return True
+    gray = cv2.cvtColor(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR), cv2.COLOR_BGR2GRAY)
+    return len(cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(60, 60))) > 0
+
+# the face pool every face client draws from: --image photos, or synthetic faces the cascade finds
+def build_faces(args):
+    if args.image:
+        photos = [cv2.imread(path) for path in args.image]
+        if any(photo is None for photo in photos):
+            raise SystemExit("can't read one of the --image files")
+        return [face_burst(i, args.frames, photo) for i, photo in enumerate(photos)], len(photos)
+    pool, tried = [], 0
+    while len(pool) < args.faces and tried < args.faces * 4:
+        burst = face_burst(args.seed * 1000 + tried, args.frames)
+        tried += 1
+        if has_face(burst[0]):
+            pool.append(burst)
+    return pool, tried
+
+# embeddings of the face pool from the local face stack, so seeded users match their face (--enroll)
+def enroll_embeddings(pool):
+    import face_pipeline
+    from face_models import models
+    with contextlib.redirect_stdout(sys.stderr):
+        models.load()
+        models.warm_up()
+    faces = [face_pipeline.prepare_face(cv2.imdecode(np.frombuffer(burst[0], np.uint8), cv2.IMREAD_COLOR))
+             for burst in pool]
+    if any(face is None for face in faces):
+        raise SystemExit("--enroll: the face stack found no face in one of the frames")
+    return [result["embedding"] for result in face_pipeline.analyze_faces(faces)]
+
+def user_email(i):
+    return f"bench{i}@example.com"
+
+# fresh DB at the current schema with `users` users and `passwords` vault entries each
+def seed_database(path, users, passwords, embeddings, seed):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    from migrations import migrate
+    rng  = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    with contextlib.redirect_stdout(sys.stderr):
+        migrate(conn)
+
+    with conn:
+        for start in range(0, users, 10000):
+            batch = range(start, min(users, start + 10000))
+            conn.executemany("INSERT INTO users (email, name, face_embedding) VALUES (?, ?, ?)", [
+                (user_email(i), f"Bench {i}",
+                 encode_embedding(embeddings[i % len(embeddings)] if embeddings else rng.normal(0, 1, 128),
+                                  embedding_model_name(), normalized=os.getenv('FACE_METRIC', 'cosine') == 'cosine'))
+                for i in batch])
+            rows = []
+            for i in batch:
+                for j in range(passwords):
+                    service  = DOMAINS[(i * 7 + j) % len(DOMAINS)]
+                    username = f"user{j}"
+                    rows.append((user_email(i), f"{service}|{username}", uuid.uuid4().hex,
+                                 registrable_domain(service), username))
+            conn.executemany("INSERT INTO passwords (email, service, secret, domain, username) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+# ---- SMTP sink ----
+
+# accepts every mail on localhost and keeps the newest OTP per recipient for the otp / vault clients
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SmtpHandler)
+        self.codes = {}
+        self.mails = 0
+        self.cond  = threading.Condition()
+        threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def deliver(self, recipients, data):
+        text = ""
+        for part in email.message_from_bytes(data).walk():
+            if part.get_content_type() == "text/plain":
+                text = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8")
+        match = re.search(r"\b(\d{6})\b", text)
+        with self.cond:
+            self.mails += 1
+            for rcpt in recipients:
+                self.codes[rcpt] = match.group(1) if match else None
+            self.cond.notify_all()
+
+    # forgets the recipient's last code, so next_otp only returns one sent after this call
+    def forget(self, rcpt):
+        with self.cond:
+            self.codes.pop(rcpt, None)
+
+    def next_otp(self, rcpt, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: rcpt in self.codes, timeout)
+            return self.codes.pop(rcpt, None)
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 load-suite sink")
+        recipients, data, lines = [], False, []
+        for raw in self.rfile:
+            line = raw.rstrip(b"\r\n")
+            if data:
+                if line == b".":
+                    self.server.deliver(recipients, b"\r\n".join(lines))
+                    recipients, data, lines = [], False, []
+                    self.reply("250 queued")
+                else:
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.reply("250-sink")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == b"AUTH":
+                self.reply("235 ok")
+            elif command == b"RCPT":
+                recipients.append(line.split(b":", 1)[1].strip(b" <>").decode())
+                self.reply("250 ok")
+            elif command == b"DATA":
+                data = True
+                self.reply("354 go ahead")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+# ---- HTTP ----
+
+# one simulated browser: a keep-alive connection and its own cookies. Cookies are kept by hand because the
+# session cookie is Secure and the suite talks plain HTTP to a local gunicorn
+class Client:
+
+    def __init__(self, url, insecure=False):
+        parts        = urllib.parse.urlsplit(url)
+        self.https   = parts.scheme == "https"
+        self.host    = parts.hostname
+        self.port    = parts.port or (443 if self.https else 80)
+        self.context = ssl._create_unverified_context() if insecure else None
+        self.conn    = None
+        self.cookies = {}
+
+    def _connect(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=120, context=self.context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+    # (status, body) — one reconnect if the server closed the kept-alive connection
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = self._connect()
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+        for header in resp.headers.get_all("Set-Cookie") or []:
+            name, _, rest = header.partition("=")
+            value         = rest.split(";", 1)[0]
+            if value and "expires=thu, 01 jan 1970" not in header.lower():
+                self.cookies[name.strip()] = value
+            else:
+                self.cookies.pop(name.strip(), None)
+        return resp.status, data
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+def json_body(payload):
+    return json.dumps(payload).encode(), {"Content-Type": "application/json"}
+
+def frames_body(frames):
+    boundary = uuid.uuid4().hex
+    body     = b"".join(f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"f{i}.jpg\"\r\n"
+                        f"Content-Type: image/jpeg\r\n\r\n".encode() + frame + b"\r\n" for i, frame in enumerate(frames))
+    return body + f"--{boundary}--\r\n".encode(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+# times one request into the recorder; a 5xx or a network error is an error, 4xx answers are not
+def call(recorder, client, name, method, path, body=None, headers=None):
+    start = time.perf_counter()
+    try:
+        status, data = client.request(method, path, body, headers)
+    except Exception:
+        recorder.record(name, (time.perf_counter() - start) * 1000, False, "network")
+        return None, None
+    recorder.record(name, (time.perf_counter() - start) * 1000, status < 500, str(status))
+    try:
+        return status, json.loads(data)
+    except ValueError:
+        return status, None
+
+# check_email -> send_otp -> code from the sink -> verify_otp; True once the session is logged in
+def otp_login(ctx, client, recorder, rcpt):
+    call(recorder, client, "check_email", "POST", "/check_email", *json_body({"email": rcpt}))
+    ctx.sink.forget(rcpt)
+    sent = time.perf_counter()
+    status, reply = call(recorder, client, "send_otp", "POST", "/send_otp", b"", {"Content-Type": "application/json"})
+    if not reply or not reply.get("success"):
+        return False
+    code = ctx.sink.next_otp(rcpt, timeout=30)
+    recorder.record("otp_delivery", (time.perf_counter() - sent) * 1000, code is not None,
+                    "delivered" if code else "timeout")
+    if code is None:
+        return False
+    status, reply = call(recorder, client, "verify_otp", "POST", "/verify_otp", *json_body({"otp": code}))
+    return bool(reply and reply.get("success"))
+
+
+# ---- clients ----
+
+def face_client(ctx, k, recorder, deadline):
+    client = Client(ctx.url, ctx.args.insecure)
+    rng    = np.random.default_rng((ctx.args.seed, k))
+    while time.time() < deadline:
+        i      = ctx.pick_user(rng, k)
+        frames = ctx.faces[i % len(ctx.faces)]
+        call(recorder, client, "check_email", "POST", "/check_email", *json_body({"email": user_email(i)}))
+        call(recorder, client, "start_face_scan", "POST", "/start_face_scan", *frames_body(frames))
+        call(recorder, client, "verify_face", "POST", "/extension/verify_face", *frames_body(frames))
+    client.close()
+
+def otp_client(ctx, k, recorder, deadline):
+    client = Client(ctx.url, ctx.args.insecure)
+    rng    = np.random.default_rng((ctx.args.seed, k))
+    while time.time() < deadline:
+        otp_login(ctx, client, recorder, user_email(ctx.pick_user(rng, k)))
+    client.close()
+
+def vault_client(ctx, k, recorder, deadline):
+    client = Client(ctx.url, ctx.args.insecure)
+    rng    = np.random.default_rng((ctx.args.seed, k))
+    i      = ctx.pick_user(rng, k)
+    if not otp_login(ctx, client, recorder, user_email(i)):
+        return
+    token   = ctx.tokens.dumps({"e": user_email(i), "v": time.time()}) if ctx.tokens else None
+    bearer  = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    domains = [DOMAINS[(i * 7 + j) % len(DOMAINS)] for j in range(ctx.args.passwords)] or DOMAINS[:1]
+    after   = 0
+    while time.time() < deadline:
+        call(recorder, client, "vault", "GET", "/vault")
+        status, page = call(recorder, client, "api_vault", "GET", f"/api/vault?after={after}")
+        after        = (page or {}).get("next") or 0
+        if token:
+            # three in four lookups hit a saved domain, the rest miss
+            domain = domains[int(rng.integers(len(domains)))] if rng.random() < 0.75 else "unknown.example"
+            call(recorder, client, "get_credentials", "POST", "/extension/get_credentials",
+                 json.dumps({"domain": domain}).encode(), bearer)
+    client.close()
+
+
+# everything the client threads share for one size
+class Context:
+
+    def __init__(self, args, url, sink, faces, users):
+        self.args    = args
+        self.url     = url
+        self.sink    = sink
+        self.faces   = faces
+        self.users   = users
+        self.clients = args.face_clients + args.otp_clients + args.vault_clients
+        self.tokens  = None
+        if args.secret_key:
+            from itsdangerous import URLSafeTimedSerializer
+            self.tokens = URLSafeTimedSerializer(args.secret_key, salt='extension-token')
+
+    # client k only ever uses users k, k + clients, k + 2*clients, ... so no two clients share an OTP
+    def pick_user(self, rng, k):
+        slots = max(1, (self.users - k + self.clients - 1) // self.clients)
+        return (k + self.clients * int(rng.integers(slots))) % self.users
+
+def run_clients(ctx, seconds):
+    recorder = Recorder()
+    deadline = time.time() + seconds
+    kinds    = ([face_client] * ctx.args.face_clients + [otp_client] * ctx.args.otp_clients
+                + [vault_client] * ctx.args.vault_clients)
+    threads  = [threading.Thread(target=fn, args=(ctx, k, recorder, deadline)) for k, fn in enumerate(kinds)]
+    start    = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder, time.time() - start
+
+
+# ---- server ----
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args, db_path, sink, metrics_dir, log):
+    port = free_port()
+    env  = dict(os.environ, DATABASE_PATH=db_path, SECRET_KEY=args.secret_key,
+                MAIL_USERNAME="bench@example.com", MAIL_PASSWORD="bench",
+                MAIL_SERVER="127.0.0.1", MAIL_PORT=str(sink.port), MAIL_USE_TLS="False", MAIL_USE_SSL="False",
+                METRICS_DIR=metrics_dir, GUNICORN_BIND=f"127.0.0.1:{port}", LOG_LEVEL="WARNING")
+    env.update(pair.split("=", 1) for pair in args.env)
+    proc = subprocess.Popen(shlex.split(args.server_cmd), cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url      = f"http://127.0.0.1:{port}"
+    client   = Client(url)
+    deadline = time.time() + args.boot_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode} — see {log.name}")
+        try:
+            if client.request("GET", "/readyz")[0] == 200:
+                client.close()
+                return proc, url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    stop_server(proc)
+    raise SystemExit(f"server not ready after {args.boot_timeout}s — see {log.name}")
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+_SAMPLE = re.compile(r'^(realid_stage_seconds|realid_sqlite_seconds)_(sum|count)\{(stage|op)="([^"]+)"\} (\S+)$')
+
+# {metric: {label: [sum, count]}} from /metrics — with METRICS_DIR this covers every gunicorn worker
+def scrape(url):
+    client    = Client(url)
+    _, body   = client.request("GET", "/metrics")
+    client.close()
+    totals    = {"realid_stage_seconds": {}, "realid_sqlite_seconds": {}}
+    for line in body.decode().splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            metric, field, _, label, value = match.groups()
+            entry = totals[metric].setdefault(label, [0.0, 0])
+            entry[0 if field == "sum" else 1] += float(value)
+    return totals
+
+# mean ms per stage / statement type between two scrapes
+def metric_delta(before, after, metric):
+    out = {}
+    for label, (total, count) in sorted(after[metric].items()):
+        prev_total, prev_count = before[metric].get(label, (0.0, 0))
+        if count > prev_count:
+            out[label] = {"count": int(count - prev_count),
+                          "mean_ms": round((total - prev_total) / (count - prev_count) * 1000, 3)}
+    return out
+
+
+# ---- compare ----
+
+def load_results(path):
+    with open(path) as f:
+        return {row["users"]: row for row in map(json.loads, filter(str.strip, f))}
+
+# per size and route: p95 and error rate of NEW against BASE; exits 1 past --max-regression
+def compare(args):
+    base, new = load_results(args.compare[0]), load_results(args.compare[1])
+    failed    = False
+    for users in sorted(set(base) & set(new)):
+        for name, now in sorted(new[users]["endpoints"].items()):
+            before = base[users]["endpoints"].get(name)
+            if not before or not before["p95_ms"]:
+                continue
+            change     = now["p95_ms"] / before["p95_ms"] - 1
+            errors     = now["errors"] / max(1, now["requests"]) - before["errors"] / max(1, before["requests"])
+            regression = change > args.max_regression or errors > 0.01
+            failed     = failed or regression
+            print(json.dumps({"users": users, "endpoint": name, "base_p95_ms": before["p95_ms"],
+                              "new_p95_ms": now["p95_ms"], "change": round(change, 3),
+                              "error_rate_change": round(errors, 4), "regression": regression}), flush=True)
+    return 1 if failed else 0
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',          type=int, nargs='+', default=[1000, 10000], help="users per run")
+    parser.add_argument('--passwords',      type=int, default=20, help="vault entries per user")
+    parser.add_argument('--duration',       type=float, default=30)
+    parser.add_argument('--warmup',         type=float, default=5)
+    parser.add_argument('--face-clients',   type=int, default=4)
+    parser.add_argument('--otp-clients',    type=int, default=2)
+    parser.add_argument('--vault-clients',  type=int, default=8)
+    parser.add_argument('--frames',         type=int, default=1, help="frames per face scan (FACE_BURST_FRAMES)")
+    parser.add_argument('--faces',          type=int, default=16, help="synthetic faces in the pool")
+    parser.add_argument('--image',          nargs='+', help="face photos to scan instead of synthetic faces")
+    parser.add_argument('--enroll',         action='store_true', help="seed users with the faces' own embeddings so scans match")
+    parser.add_argument('--seed',           type=int, default=0)
+    parser.add_argument('--db-dir',         default=None, help="where the seeded databases go (default: a temp dir)")
+    parser.add_argument('--server-cmd',     default=f"{sys.executable} -m gunicorn -c gunicorn.conf.py app:app")
+    parser.add_argument('--env',            nargs='*', default=[], help="extra KEY=VALUE for the server")
+    parser.add_argument('--boot-timeout',   type=float, default=300)
+    parser.add_argument('--secret-key',     default="load-suite-secret", help="SECRET_KEY, also used to mint bearer tokens")
+    parser.add_argument('--insecure',       action='store_true')
+    parser.add_argument('--label',          default='', help="tag copied into the output, e.g. a release name")
+    parser.add_argument('--compare',        nargs=2, metavar=('BASE', 'NEW'), help="diff two result files instead")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="allowed p95 growth for --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(args)
+    # app.py loads .env with override=True, which would point the server's mail at a real SMTP account
+    if os.path.exists(os.path.join(ROOT, ".env")):
+        raise SystemExit(".env would override the suite's MAIL_SERVER / DATABASE_PATH — move it aside first")
+
+    faces, tried = build_faces(args)
+    if not faces:
+        raise SystemExit("no synthetic face was detected — pass --image")
+    embeddings = enroll_embeddings(faces) if args.enroll else None
+    db_dir     = args.db_dir or tempfile.mkdtemp(prefix="realid-bench-")
+    os.makedirs(db_dir, exist_ok=True)
+    sink       = SmtpSink()
+
+    for users in args.sizes:
+        db_path     = os.path.join(db_dir, f"bench-{users}.db")
+        metrics_dir = tempfile.mkdtemp(prefix="realid-metrics-")
+        started     = time.perf_counter()
+        seed_database(db_path, users, args.passwords, embeddings, args.seed)
+        seed_s      = time.perf_counter() - started
+
+        with open(os.path.join(db_dir, f"server-{users}.log"), "w") as log:
+            proc, url = start_server(args, db_path, sink, metrics_dir, log)
+            try:
+                ctx = Context(args, url, sink, faces, users)
+                run_clients(ctx, args.warmup)
+                # give every worker a chance to flush its METRICS_DIR snapshot around the measured window
+                time.sleep(FLUSH_INTERVAL + 0.5)
+                before            = scrape(url)
+                recorder, elapsed = run_clients(ctx, args.duration)
+                time.sleep(FLUSH_INTERVAL + 0.5)
+                after             = scrape(url)
+            finally:
+                stop_server(proc)
+
+        print(json.dumps({
+            "suite":              "load_suite",
+            "label":              args.label,
+            "commit":             git_commit(),
+            "users":              users,
+            "passwords_per_user": args.passwords,
+            "db_bytes":           os.path.getsize(db_path),
+            "seed_s":             round(seed_s, 2),
+            "faces":              {"pool": len(faces), "tried": tried, "frames": args.frames, "enrolled": args.enroll},
+            "clients":            {"face": args.face_clients, "otp": args.otp_clients, "vault": args.vault_clients},
+            "env":                args.env,
+            "duration_s":         round(elapsed, 1),
+            "endpoints":          recorder.summary(elapsed),
+            "stages":             metric_delta(before, after, "realid_stage_seconds"),
+            "sqlite":             metric_delta(before, after, "realid_sqlite_seconds"),
+        }), flush=True)
+    sink.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
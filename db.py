@@ -0,0 +1,85 @@
+import contextlib
+import os
+import sqlite3
+import threading
+
+from telemetry import span
+
+DB_PATH = os.getenv('DATABASE_PATH', 'database.db')
+
+BUSY_TIMEOUT_MS   = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+MMAP_SIZE         = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SYNCHRONOUS       = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+CACHED_STATEMENTS = 256
+
+_local       = threading.local()
+_open        = []    # (pid, connection) for every connection get_db has opened, so close_db can reach them all
+_open_lock   = threading.Lock()
+_generation  = 0     # bumped by close_db; a thread whose connection is from an older generation reopens
+
+
+# opens a connection with WAL + the tuning pragmas — NORMAL sync is durable enough under WAL
+# (a power cut can lose the last commit, never corrupt the DB). check_same_thread is off only so close_db
+# can close it from another thread — each connection is still used by the thread that opened it
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                           cached_statements=CACHED_STATEMENTS, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+# this thread's pooled connection — reused across requests so sqlite3's per-connection
+# statement cache actually gets hits; reopened after a fork so workers never share a handle
+def get_db():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid() or _local.generation != _generation:
+        conn              = _connect()
+        _local.conn       = conn
+        _local.pid        = os.getpid()
+        _local.generation = _generation
+        with _open_lock:
+            _open.append((_local.pid, conn))
+    return conn
+
+# runs the block in one transaction on the pooled connection: commit on success, rollback on error
+@contextlib.contextmanager
+def transaction():
+    conn = get_db()
+    with conn:
+        yield conn
+
+# times one statement into realid_sqlite_seconds, labelled by its leading keyword (select, insert, ...)
+def _timed(sql):
+    op = sql.split(None, 1)[0].lower() if sql.strip() else "other"
+    return span("sqlite", metric="realid_sqlite_seconds", op=op)
+
+# first row of a read query, or None
+def query_one(sql, params=()):
+    with _timed(sql):
+        return get_db().execute(sql, params).fetchone()
+
+# every row of a read query
+def query_all(sql, params=()):
+    with _timed(sql):
+        return get_db().execute(sql, params).fetchall()
+
+# single write statement in its own transaction, returns the cursor (for lastrowid / rowcount)
+def execute(sql, params=()):
+    with _timed(sql), transaction() as conn:
+        return conn.execute(sql, params)
+
+# closes every connection this process opened, whichever thread it belongs to — run when a worker exits
+# (gunicorn.conf.py worker_exit, and atexit for the dev server) so the last one out checkpoints the WAL.
+# Connections inherited across a fork belong to the parent and are only forgotten, never closed
+def close_db():
+    global _generation
+    with _open_lock:
+        conns, _open[:] = list(_open), []
+        _generation += 1
+    for pid, conn in conns:
+        if pid == os.getpid():
+            conn.close()
+    _local.conn = None
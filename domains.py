@@ -0,0 +1,59 @@
+import re
+
+try:
+    import tldextract
+    _extract = tldextract.TLDExtract(suffix_list_urls=())  # bundled snapshot, never hits the network
+except ImportError:
+    _extract = None
+
+# multi-label public suffixes common enough to matter when tldextract isn't installed
+_MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.nz", "org.nz", "co.jp", "ne.jp", "or.jp", "co.kr", "or.kr",
+    "co.in", "net.in", "org.in", "gov.in", "ac.in", "edu.in",
+    "com.br", "net.br", "org.br", "com.mx", "com.ar", "com.tr", "com.cn", "com.hk",
+    "com.sg", "com.my", "com.tw", "co.za", "co.id", "co.il", "co.th",
+    "github.io", "herokuapp.com", "vercel.app", "netlify.app", "pages.dev",
+    "blogspot.com", "appspot.com", "azurewebsites.net", "cloudfront.net",
+}
+
+_SCHEME = re.compile(r'^[a-z][a-z0-9+.-]*://')
+
+
+# lower-cased host out of whatever the user typed: full URL, host:port, www.host/path, or a bare name
+def _host(value):
+    host = _SCHEME.sub('', (value or '').strip().lower())
+    host = host.split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+    host = host.rsplit('@', 1)[-1].split(':', 1)[0].strip('.')
+    return host
+
+# eTLD+1 of a service/host ("https://accounts.google.co.uk/x" -> "google.co.uk"); bare names like
+# "GitHub" come back lower-cased as-is
+def registrable_domain(value):
+    host = _host(value)
+    if not host or '.' not in host or re.fullmatch(r'[\d.]+', host):
+        return host
+    if _extract is not None:
+        parts = _extract(host)
+        if parts.domain and parts.suffix:
+            return f"{parts.domain}.{parts.suffix}"
+        return host
+    labels = host.split('.')
+    if len(labels) >= 3 and '.'.join(labels[-2:]) in _MULTI_LABEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+# the values a stored row's domain column may hold for a lookup of this host — just its eTLD+1. A bare
+# first label ("github") is deliberately not a key: it would hand an entry saved as "github" to
+# github.evil or any other site sharing the label
+def lookup_keys(value):
+    domain = registrable_domain(value)
+    return [domain] if domain else []
+
+# splits the packed "service|username" string add_password has always stored
+def split_service(combined):
+    if combined and '|' in combined:
+        service, username = combined.split('|', 1)
+        return service, username
+    return combined, None
@@ -0,0 +1,88 @@
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+# per-process LRU of stored face embeddings — one contiguous float32 (or float16) matrix plus an email -> row index.
+# Each worker has its own, and invalidate() only reaches that one: callers pass the row's current version
+# (e.g. users.id, which re-enrolment changes) so entries another worker has made stale are never served
+class EmbeddingCache:
+
+    def __init__(self, capacity=10000, dim=128, ttl=600, dtype=np.float32):
+        self.capacity  = max(1, int(capacity))
+        self.dim       = dim
+        self.ttl       = ttl
+        self.matrix    = np.zeros((self.capacity, dim), dtype=dtype)
+        self.loaded_at = np.zeros(self.capacity, dtype=np.float64)
+        self.versions  = np.zeros(self.capacity, dtype=np.int64)
+        self.index     = collections.OrderedDict()
+        self.free      = list(range(self.capacity - 1, -1, -1))
+        self._lock     = threading.Lock()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    # returns a copy of the cached row, or falls back to loader(email) and caches what it returns. With a
+    # version, a row cached under a different one counts as a miss
+    def get(self, email, loader, version=None):
+        with self._lock:
+            row   = self.index.get(email)
+            fresh = row is not None and (version is None or self.versions[row] == version)
+            if fresh and (not self.ttl or time.monotonic() - self.loaded_at[row] < self.ttl):
+                self.index.move_to_end(email)
+                self.hits += 1
+                return self.matrix[row].astype(np.float32)
+            self.misses += 1
+
+        embedding = loader(email)
+        if embedding is not None:
+            self.put(email, embedding, version)
+        return embedding
+
+    # stores an embedding, evicting the least recently used row if the matrix is full
+    def put(self, email, embedding, version=None):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        if embedding.shape[0] != self.dim:
+            return
+        with self._lock:
+            row = self.index.get(email)
+            if row is None:
+                if not self.free:
+                    _, evicted = self.index.popitem(last=False)
+                    self.free.append(evicted)
+                    self.evictions += 1
+                row = self.free.pop()
+            self.matrix[row]    = embedding
+            self.loaded_at[row] = time.monotonic()
+            self.versions[row]  = 0 if version is None else version
+            self.index[email]   = row
+            self.index.move_to_end(email)
+
+    # drops one user so the next lookup goes back to the database
+    def invalidate(self, email):
+        with self._lock:
+            row = self.index.pop(email, None)
+            if row is not None:
+                self.free.append(row)
+
+    # empties the whole cache
+    def clear(self):
+        with self._lock:
+            self.index.clear()
+            self.free = list(range(self.capacity - 1, -1, -1))
+
+    # hit / miss counters for the stats endpoint
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size":      len(self.index),
+            "capacity":  self.capacity,
+            "dtype":     self.matrix.dtype.name,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "hit_rate":  (self.hits / lookups) if lookups else 0.0,
+        }
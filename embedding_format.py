@@ -0,0 +1,109 @@
+import collections
+import math
+import struct
+
+import numpy as np
+
+# Versioned on-disk format for face embeddings (users.face_embedding, face_templates.embedding):
+#
+#   magic "\x93RE" | version u8 | dtype u8 | flags u8 | dim u16 | model-name length u8 | model name
+#   [int8 only: scale f32] | dim values (float32, float16 or int8), little-endian
+#
+# so every stored vector says which model produced it, how long it is and whether it was L2-normalized.
+# Blobs written before this format are bare float32 arrays; they still decode, as version 0 vectors of
+# LEGACY_MODEL, and reembed.py rewrites them in place.
+
+MAGIC        = b"\x93RE"
+VERSION      = 1
+LEGACY_MODEL = "Facenet"
+
+DTYPES     = {"float32": 0, "float16": 1, "int8": 2}
+_DTYPE_IDS = {code: name for name, code in DTYPES.items()}
+_NUMPY     = {"float32": "<f4", "float16": "<f2", "int8": "i1"}
+
+FLAG_NORMALIZED = 1
+
+_HEADER = struct.Struct("<3sBBBHB")
+_SCALE  = struct.Struct("<f")
+
+# a decoded blob: the vector as float32 plus what the header recorded about it
+Stored = collections.namedtuple("Stored", "vector model dim dtype normalized version")
+
+
+class EmbeddingFormatError(ValueError):
+    pass
+
+
+def l2_normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm   = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+# packs one embedding; int8 uses one symmetric scale per vector (max |x| -> 127)
+def encode(vector, model, dtype="float32", normalized=False):
+    if dtype not in DTYPES:
+        raise EmbeddingFormatError(f"unknown embedding dtype {dtype!r}")
+    vector = l2_normalize(vector) if normalized else np.asarray(vector, dtype=np.float32).ravel()
+    name   = model.encode()
+    header = _HEADER.pack(MAGIC, VERSION, DTYPES[dtype], FLAG_NORMALIZED if normalized else 0, vector.shape[0], len(name))
+    if dtype == "int8":
+        peak  = float(np.abs(vector).max()) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        return header + name + _SCALE.pack(scale) + np.round(vector / scale).astype("i1").tobytes()
+    return header + name + vector.astype(_NUMPY[dtype]).tobytes()
+
+# unpacks a blob of either format back to float32
+def decode(blob):
+    blob = bytes(blob)
+    if len(blob) >= _HEADER.size and blob[:3] == MAGIC:
+        magic, version, dtype_id, flags, dim, name_len = _HEADER.unpack_from(blob)
+        dtype  = _DTYPE_IDS.get(dtype_id)
+        offset = _HEADER.size + name_len
+        scale  = None
+        if dtype == "int8":
+            scale,  = _SCALE.unpack_from(blob, offset) if len(blob) >= offset + _SCALE.size else (None,)
+            offset += _SCALE.size
+        width = np.dtype(_NUMPY[dtype]).itemsize if dtype else 0
+        # a legacy float32 vector could start with the magic by chance — only trust a header that adds up
+        if version == VERSION and dtype and len(blob) == offset + dim * width:
+            model  = blob[_HEADER.size:_HEADER.size + name_len].decode()
+            vector = np.frombuffer(blob, dtype=_NUMPY[dtype], count=dim, offset=offset).astype(np.float32)
+            if scale is not None:
+                vector *= scale
+            return Stored(vector, model, dim, dtype, bool(flags & FLAG_NORMALIZED), version)
+    if len(blob) % 4:
+        raise EmbeddingFormatError(f"embedding blob of {len(blob)} bytes is neither versioned nor float32")
+    vector = np.frombuffer(blob, dtype=np.float32).copy()
+    return Stored(vector, LEGACY_MODEL, vector.shape[0], "float32", False, 0)
+
+
+# how two embeddings are compared. Every vector is passed through prepare() first (L2-normalized for
+# cosine), after which a plain euclidean distance is all the index / burst code needs: on unit vectors
+# cosine distance = |a - b|^2 / 2. Thresholds are given in the metric's own units
+class Metric:
+
+    def __init__(self, name="cosine"):
+        if name not in ("cosine", "euclidean"):
+            raise EmbeddingFormatError(f"unknown face metric {name!r}")
+        self.name   = name
+        self.cosine = name == "cosine"
+        # cosine distance between unit vectors never exceeds 2; euclidean has no fixed ceiling
+        self.max_distance = 2.0 if self.cosine else math.inf
+
+    def prepare(self, vector):
+        return l2_normalize(vector) if self.cosine else np.asarray(vector, dtype=np.float32).ravel()
+
+    # euclidean distance between prepared vectors -> distance in the metric's units
+    def from_l2(self, l2):
+        return l2 * l2 / 2.0 if self.cosine else l2
+
+    # a threshold in the metric's units -> the euclidean distance between prepared vectors it stands for
+    def to_l2(self, distance):
+        return math.sqrt(2.0 * distance) if self.cosine else distance
+
+    def distance(self, a, b):
+        return self.from_l2(float(np.linalg.norm(self.prepare(a) - self.prepare(b))))
+
+    # whether `distance` can be a setting in this metric's units at all
+    def in_range(self, distance):
+        return 0.0 <= distance <= self.max_distance
@@ -0,0 +1,158 @@
+import abc
+import collections
+import heapq
+import json
+import threading
+import time
+
+from db import transaction, query_one, execute
+
+
+# short-lived state (OTPs, attempt counters) — every key expires on its own, and pop_if_match is an
+# atomic check-and-delete so an OTP can only ever be redeemed once
+class EphemeralStore(abc.ABC):
+
+    # stores value under key for ttl seconds, replacing whatever was there
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        ...
+
+    # value if the key exists and hasn't expired, else None
+    @abc.abstractmethod
+    def get(self, key):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key):
+        ...
+
+    # deletes key and returns True only if it currently holds expected
+    @abc.abstractmethod
+    def pop_if_match(self, key, expected):
+        ...
+
+    # bumps a counter that starts at 1 and lives for ttl seconds from its first increment
+    @abc.abstractmethod
+    def incr(self, key, ttl):
+        ...
+
+
+# per-process store — bounded LRU with a heap of expiry times so expired keys are swept in O(log n)
+class MemoryStore(EphemeralStore):
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._data       = collections.OrderedDict()
+        self._expiries   = []
+        self._lock       = threading.Lock()
+
+    # drops everything whose expiry has passed, oldest first; stale heap entries for re-set keys are skipped
+    def _sweep(self, now):
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiries)
+            entry = self._data.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._data[key]
+
+    # (value, expires_at) if the key is present and unexpired
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            expires_at      = now + ttl
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            heapq.heappush(self._expiries, (expires_at, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return entry[0] if entry else None
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_if_match(self, key, expected):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None or entry[0] != expected:
+                return False
+            del self._data[key]
+            return True
+
+    def incr(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is None:
+                expires_at = now + ttl
+                heapq.heappush(self._expiries, (expires_at, key))
+                count = 1
+            else:
+                count, expires_at = entry[0] + 1, entry[1]
+            self._data[key] = (count, expires_at)
+            self._data.move_to_end(key)
+            return count
+
+
+# shared across every worker via the ephemeral table (migration 4) — values are stored as JSON
+class SQLiteStore(EphemeralStore):
+
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._last_sweep = 0.0
+
+    # deletes expired rows at most once a minute per worker, piggybacking on a write
+    def _maybe_sweep(self, conn, now):
+        if now - self._last_sweep >= self.SWEEP_INTERVAL:
+            self._last_sweep = now
+            conn.execute("DELETE FROM ephemeral WHERE expires_at <= ?", (now,))
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO ephemeral (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, json.dumps(value), now + ttl))
+            self._maybe_sweep(conn, now)
+
+    def get(self, key):
+        row = query_one("SELECT value FROM ephemeral WHERE key = ? AND expires_at > ?", (key, time.time()))
+        return json.loads(row[0]) if row else None
+
+    def delete(self, key):
+        execute("DELETE FROM ephemeral WHERE key = ?", (key,))
+
+    def pop_if_match(self, key, expected):
+        c = execute("DELETE FROM ephemeral WHERE key = ? AND value = ? AND expires_at > ?",
+                    (key, json.dumps(expected), time.time()))
+        return c.rowcount == 1
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with transaction() as conn:
+            conn.execute("""
+                INSERT INTO ephemeral (key, value, expires_at) VALUES (?, '1', ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value      = CASE WHEN expires_at <= ? THEN '1' ELSE CAST(value AS INTEGER) + 1 END,
+                    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+            """, (key, now + ttl, now, now))
+            return int(conn.execute("SELECT value FROM ephemeral WHERE key = ?", (key,)).fetchone()[0])
+
+
+# picks the backend from EPHEMERAL_BACKEND — sqlite (shared by all workers) or memory (single process only)
+def create_store(backend='sqlite', max_entries=100000):
+    if backend == 'memory':
+        return MemoryStore(max_entries=max_entries)
+    if backend == 'sqlite':
+        return SQLiteStore()
+    raise ValueError(f"Unknown EPHEMERAL_BACKEND: {backend}")
@@ -0,0 +1,71 @@
+import numpy as np
+
+# A burst is a handful of webcam frames sent in one request and scored in one batched model call.
+# Nothing here touches cv2 or the models — it only combines the per-frame results of analyze_faces.
+
+
+# mean absolute pixel change between consecutive spoof crops (values in [0, 1]) — a live camera always
+# moves a little (sensor noise, micro-motion), a replayed still image repeats itself exactly
+def burst_motion(faces):
+    if len(faces) < 2:
+        return None
+    diffs = [float(np.abs(a["spoof"] - b["spoof"]).mean()) for a, b in zip(faces, faces[1:])]
+    return max(diffs)
+
+# folds the per-frame verdicts of one burst into a single one:
+#   real       — mean spoof score over the frames (or every frame real when there's no anti-spoof model),
+#                and the frames mustn't be pixel-identical
+#   embedding  — centroid of the frames that agree with each other, None if they don't
+#   reason     — None, "few_frames", "spoof", "static" or "inconsistent"
+# fewer than min_frames faces gives no embedding at all — the motion check needs two frames, so a
+# client that sends a single frame mustn't get around it. Frames further than max_spread from the
+# median embedding are dropped as outliers (blur, a head turn); if that leaves less than half of them,
+# the burst didn't show one steady face
+def aggregate_burst(faces, results, max_spread=6.0, min_motion=0.001, min_frames=1):
+    scores = [r["score"] for r in results if r["score"] is not None]
+    score  = float(np.mean(scores)) if scores else None
+    motion = burst_motion(faces)
+    burst  = {"real": True, "score": score, "embedding": None, "embeddings": [],
+              "frames": len(faces), "used": 0, "motion": motion, "reason": None}
+    if len(faces) < min_frames:
+        burst["reason"] = "few_frames"
+        return burst
+
+    real = score > 0.5 if score is not None else all(r["real"] for r in results)
+    if not real:
+        burst.update(real=False, reason="spoof")
+        return burst
+    if motion is not None and motion < min_motion:
+        burst.update(real=False, reason="static")
+        return burst
+
+    embeddings = [r["embedding"] for r in results if r["embedding"] is not None]
+    if not embeddings:
+        burst["reason"] = "inconsistent"
+        return burst
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    spread = np.linalg.norm(matrix - np.median(matrix, axis=0), axis=1)
+    kept   = matrix[spread <= max_spread]
+    if len(kept) * 2 < len(matrix):
+        burst["reason"] = "inconsistent"
+        return burst
+
+    burst["embedding"]  = kept.mean(axis=0)
+    burst["embeddings"] = list(kept)
+    burst["used"]       = len(kept)
+    return burst
+
+# up to k of the burst's embeddings that differ most from the centroid and from each other
+# (farthest-point picking), stored next to the centroid as extra match templates
+def pick_templates(embeddings, centroid, k):
+    if k <= 0 or not embeddings:
+        return []
+    matrix  = np.asarray(embeddings, dtype=np.float32)
+    nearest = np.linalg.norm(matrix - centroid, axis=1)
+    picked  = []
+    for _ in range(min(k, len(matrix))):
+        i = int(np.argmax(nearest))
+        picked.append(matrix[i])
+        nearest = np.minimum(nearest, np.linalg.norm(matrix - matrix[i], axis=1))
+        nearest[i] = -1.0
+    return picked
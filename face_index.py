@@ -0,0 +1,199 @@
+import threading
+
+import numpy as np
+
+
+# k-means inverted-file index over the rows of a FaceIndex — built locally with numpy, no extra dependency
+class IVFIndex:
+
+    def __init__(self, nlist, nprobe=8, iterations=10, sample=50000, seed=0):
+        self.nlist      = nlist
+        self.nprobe     = nprobe
+        self.iterations = iterations
+        self.sample     = sample
+        self.seed       = seed
+        self.centroids  = None
+        self.lists      = []
+        self.assign     = np.zeros(0, dtype=np.int32)
+
+    # runs a few rounds of Lloyd's k-means on a sample, then buckets every row under its nearest centroid
+    def train(self, matrix):
+        rng    = np.random.default_rng(self.seed)
+        sample = matrix if len(matrix) <= self.sample else matrix[rng.choice(len(matrix), self.sample, replace=False)]
+        nlist  = min(self.nlist, len(sample))
+        cents  = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            labels = _nearest(sample, cents)
+            sums   = np.zeros_like(cents)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            cents[filled] = sums[filled] / counts[filled, None]
+
+        self.nlist     = nlist
+        self.centroids = cents
+        self.assign    = _nearest(matrix, cents).astype(np.int32)
+        order          = np.argsort(self.assign, kind='stable')
+        bounds         = np.searchsorted(self.assign[order], np.arange(nlist + 1))
+        self.lists     = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(nlist)]
+
+    # files a newly appended row under its nearest centroid
+    def add(self, row, vector):
+        c = int(_nearest(vector[None, :], self.centroids)[0])
+        self.lists[c] = np.append(self.lists[c], row)
+        if row >= len(self.assign):
+            self.assign = np.resize(self.assign, max(row + 1, len(self.assign) * 2))
+        self.assign[row] = c
+
+    # mirrors FaceIndex's swap-remove: row disappears, and last (if different) gets renumbered to row
+    def remove(self, row, last):
+        c = self.assign[row]
+        self.lists[c] = self.lists[c][self.lists[c] != row]
+        if last != row:
+            lc = self.assign[last]
+            self.lists[lc] = np.where(self.lists[lc] == last, row, self.lists[lc])
+            self.assign[row] = lc
+
+    # row ids in the nprobe lists closest to the probe
+    def candidates(self, probe):
+        d2    = ((self.centroids - probe) ** 2).sum(axis=1)
+        probe = np.argpartition(d2, min(self.nprobe, len(d2)) - 1)[:self.nprobe]
+        return np.concatenate([self.lists[c] for c in probe])
+
+
+# nearest centroid for every row, in chunks so a 1M-row matrix doesn't build a giant distance table
+def _nearest(rows, cents, chunk=65536):
+    out     = np.empty(len(rows), dtype=np.int64)
+    c_norms = (cents ** 2).sum(axis=1)
+    for start in range(0, len(rows), chunk):
+        block = rows[start:start + chunk]
+        out[start:start + chunk] = np.argmin(c_norms[None, :] - 2 * block @ cents.T, axis=1)
+    return out
+
+
+# every enrolled embedding in one matrix for face-first (1:N) login — exact numpy search for small
+# tenants, switches to the IVF index once the user count passes ann_threshold
+class FaceIndex:
+
+    def __init__(self, dim=128, ann_threshold=50000, nprobe=8):
+        self.dim           = dim
+        self.ann_threshold = ann_threshold
+        self.nprobe        = nprobe
+        self.matrix        = np.zeros((0, dim), dtype=np.float32)
+        self.sq_norms      = np.zeros(0, dtype=np.float32)
+        self.emails        = []
+        self.rows          = {}
+        self.size          = 0
+        self.signature     = None
+        self.ivf           = None
+        self._trained_size = 0
+        self._lock         = threading.RLock()
+
+    # replaces the whole index from (email, embedding) pairs, e.g. straight off the users table
+    def rebuild(self, items, signature=None):
+        with self._lock:
+            emails, vectors = [], []
+            for email, embedding in items:
+                embedding = np.asarray(embedding, dtype=np.float32).ravel()
+                if embedding.shape[0] == self.dim:
+                    emails.append(email)
+                    vectors.append(embedding)
+            self.matrix    = np.vstack(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+            self.sq_norms  = (self.matrix ** 2).sum(axis=1)
+            self.emails    = emails
+            self.rows      = {email: i for i, email in enumerate(emails)}
+            self.size      = len(emails)
+            self.signature = signature
+            self.ivf       = None
+            self._maybe_train()
+
+    # grows the backing arrays geometrically so incremental adds stay amortised O(1)
+    def _reserve(self, n):
+        if n <= len(self.matrix):
+            return
+        cap      = max(n, len(self.matrix) * 2, 1024)
+        matrix   = np.zeros((cap, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(cap, dtype=np.float32)
+        matrix[:self.size]   = self.matrix[:self.size]
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        self.matrix, self.sq_norms = matrix, sq_norms
+
+    # (re)trains the IVF index when we cross ann_threshold or the size has drifted 2x from the last training
+    def _maybe_train(self):
+        if self.size < self.ann_threshold:
+            self.ivf = None
+            return
+        if self.ivf is not None and self._trained_size / 2 <= self.size <= self._trained_size * 2:
+            return
+        nlist    = int(np.clip(4 * np.sqrt(self.size), 16, 4096))
+        self.ivf = IVFIndex(nlist, nprobe=self.nprobe)
+        self.ivf.train(self.matrix[:self.size])
+        self._trained_size = self.size
+
+    # adds or replaces one user's embedding
+    def add(self, email, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        if embedding.shape[0] != self.dim:
+            return
+        with self._lock:
+            if email in self.rows:
+                self.remove(email)
+            row = self.size
+            self._reserve(row + 1)
+            self.matrix[row]   = embedding
+            self.sq_norms[row] = float(embedding @ embedding)
+            self.emails.append(email)
+            self.rows[email]   = row
+            self.size         += 1
+            if self.ivf is not None:
+                self.ivf.add(row, embedding)
+            self._maybe_train()
+
+    # removes one user by moving the last row into its slot
+    def remove(self, email):
+        with self._lock:
+            row = self.rows.pop(email, None)
+            if row is None:
+                return
+            last = self.size - 1
+            if self.ivf is not None:
+                self.ivf.remove(row, last)
+            if row != last:
+                moved              = self.emails[last]
+                self.matrix[row]   = self.matrix[last]
+                self.sq_norms[row] = self.sq_norms[last]
+                self.emails[row]   = moved
+                self.rows[moved]   = row
+            self.emails.pop()
+            self.size -= 1
+            self._maybe_train()
+
+    # k nearest users to the probe as [(email, euclidean distance)], closest first
+    def search(self, probe, k=1, exact=False):
+        probe = np.asarray(probe, dtype=np.float32).ravel()
+        with self._lock:
+            if self.size == 0:
+                return []
+            if self.ivf is not None and not exact:
+                rows = self.ivf.candidates(probe)
+                if len(rows) == 0:
+                    return []
+                d2 = self.sq_norms[rows] - 2 * (self.matrix[rows] @ probe) + float(probe @ probe)
+            else:
+                rows = None
+                d2   = self.sq_norms[:self.size] - 2 * (self.matrix[:self.size] @ probe) + float(probe @ probe)
+            k   = min(k, len(d2))
+            top = np.argpartition(d2, k - 1)[:k]
+            top = top[np.argsort(d2[top])]
+            ids = top if rows is None else rows[top]
+            return [(self.emails[r], float(np.sqrt(max(d, 0.0)))) for r, d in zip(ids, d2[top])]
+
+    # index size and mode for the stats endpoint
+    def stats(self):
+        return {
+            "size":   self.size,
+            "mode":   "ivf" if self.ivf is not None else "exact",
+            "nlist":  self.ivf.nlist if self.ivf is not None else None,
+            "nprobe": self.nprobe,
+        }
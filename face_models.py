@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from telemetry import log
+
+IMG_SIZE        = 224
+FACENET_MODEL   = "Facenet"
+ANTISPOOF_FILES = ['antispoof.keras', 'antispoof.h5']
+
+# how face_pipeline cuts the Facenet input out of the frame: "aligned" is an eye-aligned square with a
+# margin, "tight" the bare detector box, the way DeepFace's own opencv path did before face_pipeline.
+# Embeddings of the two crops of one face aren't interchangeable, so the crop is part of the model name
+# stored with every embedding (see embedding_format) — enrolments from before face_pipeline are "Facenet".
+# "tight" stays the default so those keep matching; "aligned" is opt-in until bench_crop_parity.py has
+# been run and recorded, since switching means every existing user re-enrols
+FACE_CROPS = ("aligned", "tight")
+FACE_CROP  = os.getenv('FACE_CROP', 'tight')
+
+def embedding_model_name(crop=FACE_CROP):
+    return FACENET_MODEL if crop == "tight" else f"{FACENET_MODEL}/{crop}"
+
+# ONNX exports written by onnx_export.py, per runtime — "tf" is the Keras/DeepFace path and the fallback
+ONNX_FILES = {
+    "onnx":      {"facenet": "facenet.onnx",      "antispoof": "antispoof.onnx"},
+    "onnx-int8": {"facenet": "facenet.int8.onnx", "antispoof": "antispoof.int8.onnx"},
+}
+
+
+# holds every model the face routes need so they're loaded once per process instead of once per request
+class ModelRegistry:
+
+    def __init__(self, base_dir):
+        self.base_dir         = base_dir
+        self.facenet          = None
+        self.face_cascade     = None
+        self.eye_cascade      = None
+        self.antispoof        = None
+        self.antispoof_source = None
+        self.loaded           = False
+        self.warmed           = False
+        self.error            = None
+        self.load_seconds     = None
+        self.warmup_seconds   = None
+        self.detectors_only   = False
+        self.runtime          = None
+        self._onnx_paths      = None
+        self._onnx_pid        = None
+        self._lock            = threading.Lock()
+
+    # loads Facenet, the OpenCV face/eye cascades and the anti-spoof model — safe to call more than once;
+    # detectors_only skips TF entirely for a web tier that sends inference to inference_service.py.
+    # runtime (INFERENCE_RUNTIME) is "tf", "onnx" or "onnx-int8"; the ONNX ones fall back to tf when
+    # onnxruntime or the exported files aren't there
+    def load(self, detectors_only=False, runtime=None):
+        runtime = runtime or os.getenv('INFERENCE_RUNTIME', 'tf')
+        with self._lock:
+            if self.loaded:
+                return
+            start = time.perf_counter()
+            try:
+                import cv2
+
+                self.face_cascade = cv2.CascadeClassifier(
+                    cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+                )
+                self.eye_cascade = cv2.CascadeClassifier(
+                    cv2.data.haarcascades + 'haarcascade_eye.xml'
+                )
+                self.detectors_only = detectors_only
+                if not detectors_only and not (runtime in ONNX_FILES and self._load_onnx(runtime)):
+                    from deepface import DeepFace
+                    self.facenet = DeepFace.build_model(FACENET_MODEL)
+                    self._load_antispoof()
+                    self.runtime = "tf"
+                self.loaded       = True
+                self.load_seconds = time.perf_counter() - start
+                log.info(f"✅ Models loaded in {self.load_seconds:.2f}s")
+            except Exception as e:
+                self.error = str(e)
+                log.error(f"✗ Model load failed: {e}")
+
+    # checks onnxruntime and the exported files are there and records their paths — False means fall back
+    # to TF. A missing anti-spoof export just means no spoof detection, same as the Keras path
+    def _load_onnx(self, runtime):
+        files = ONNX_FILES[runtime]
+        path  = os.path.join(self.base_dir, files["facenet"])
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            log.warning(f"⚠️  INFERENCE_RUNTIME={runtime} but onnxruntime isn't installed — using TensorFlow")
+            return False
+        if not os.path.exists(path):
+            log.warning(f"⚠️  {files['facenet']} not found (run onnx_export.py) — using TensorFlow")
+            return False
+
+        spoof_path = os.path.join(self.base_dir, files["antispoof"])
+        if os.path.exists(spoof_path):
+            self.antispoof_source = files["antispoof"]
+        else:
+            spoof_path = None
+            log.warning(f"⚠️  {files['antispoof']} not found — running WITHOUT spoof detection.")
+        self._onnx_paths = {"facenet": path, "antispoof": spoof_path}
+        self.runtime     = runtime
+        log.info(f"✅ Using ONNX Runtime ({runtime}) for {files['facenet']}"
+              + (f" and {files['antispoof']}" if spoof_path else ""))
+        return True
+
+    # ONNX Runtime sessions are opened per process on first use — like TF's, their thread pools don't
+    # survive a fork, so under gunicorn --preload they're only created in the workers
+    def _ensure_onnx(self):
+        if self._onnx_pid == os.getpid():
+            return
+        with self._lock:
+            if self._onnx_pid == os.getpid():
+                return
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            paths          = self._onnx_paths
+            self.facenet   = ort.InferenceSession(paths["facenet"], options, providers=['CPUExecutionProvider'])
+            self.antispoof = (ort.InferenceSession(paths["antispoof"], options, providers=['CPUExecutionProvider'])
+                              if paths["antispoof"] else None)
+            self._onnx_pid = os.getpid()
+
+    # tries each known anti-spoof filename in turn, leaves antispoof as None if none of them load
+    def _load_antispoof(self):
+        for fname in ANTISPOOF_FILES:
+            path = os.path.join(self.base_dir, fname)
+            if os.path.exists(path):
+                try:
+                    import keras
+                    self.antispoof        = keras.models.load_model(path)
+                    self.antispoof_source = fname
+                    log.info(f"✅ Anti-spoof model loaded from {fname}")
+                    return
+                except Exception as e:
+                    log.warning(f"⚠️  Failed to load {fname}: {e}")
+        log.warning("⚠️  No antispoof model found — running WITHOUT spoof detection.")
+
+    # pushes a blank frame through every model so TF builds its graphs before the first real scan
+    def warm_up(self):
+        if not self.loaded:
+            self.load()
+        if not self.loaded or self.warmed:
+            return
+        start = time.perf_counter()
+        try:
+            if not self.detectors_only:
+                h, w = self.facenet_input_size()
+                self.embed(np.zeros((1, h, w, 3), dtype=np.float32))
+                self.predict_spoof(np.zeros((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.float32))
+            self.face_cascade.detectMultiScale(np.zeros((IMG_SIZE, IMG_SIZE), dtype=np.uint8))
+            self.warmed         = True
+            self.warmup_seconds = time.perf_counter() - start
+            log.info(f"✅ Models warmed up in {self.warmup_seconds:.2f}s (pid {os.getpid()})")
+        except Exception as e:
+            self.error = str(e)
+            log.error(f"✗ Model warm-up failed: {e}")
+
+    # the keras model behind Facenet — newer DeepFace wraps it in a client object, older returns it directly
+    def _facenet_keras(self):
+        return getattr(self.facenet, 'model', self.facenet)
+
+    # runs an ONNX Runtime session on one NHWC float batch and returns its first output
+    @staticmethod
+    def _run_onnx(session, batch):
+        feed = {session.get_inputs()[0].name: np.ascontiguousarray(batch, dtype=np.float32)}
+        return session.run(None, feed)[0]
+
+    # (height, width) Facenet expects, 160x160 unless the loaded model says otherwise
+    def facenet_input_size(self):
+        if self.runtime in ONNX_FILES:
+            self._ensure_onnx()
+            shape = self.facenet.get_inputs()[0].shape
+            if len(shape) == 4 and isinstance(shape[1], int) and isinstance(shape[2], int):
+                return shape[1], shape[2]
+            return 160, 160
+        if self.facenet is None:
+            return 160, 160
+        shape = getattr(self._facenet_keras(), 'input_shape', None)
+        if shape and len(shape) == 4 and shape[1] and shape[2]:
+            return int(shape[1]), int(shape[2])
+        return 160, 160
+
+    # real-face probability for a (n, 224, 224, 3) float batch, or None when there's no spoof model
+    def predict_spoof(self, batch):
+        if self.runtime in ONNX_FILES:
+            self._ensure_onnx()
+        if self.antispoof is None:
+            return None
+        if self.runtime in ONNX_FILES:
+            out = self._run_onnx(self.antispoof, batch)
+        else:
+            out = self.antispoof.predict(batch, verbose=0)
+        return np.asarray(out, dtype=np.float32).reshape(len(batch), -1)[:, 0]
+
+    # Facenet embeddings for a (n, h, w, 3) float batch of aligned face crops in one forward pass
+    def embed(self, faces):
+        if self.runtime in ONNX_FILES:
+            self._ensure_onnx()
+            out = self._run_onnx(self.facenet, faces)
+        else:
+            out = self._facenet_keras().predict(faces, verbose=0)
+        return np.asarray(out, dtype=np.float32).reshape(len(faces), -1)
+
+    # ready means loaded + warmed, and if REQUIRE_ANTISPOOF is on, the spoof model has to be there too
+    def is_ready(self, require_antispoof=False):
+        if not (self.loaded and self.warmed):
+            return False
+        if require_antispoof and self.antispoof is None:
+            return False
+        return True
+
+    # summary used by the readiness endpoint
+    def status(self):
+        return {
+            "pid":            os.getpid(),
+            "loaded":         self.loaded,
+            "warmed":         self.warmed,
+            "antispoof":      self.antispoof_source,
+            "load_seconds":   self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "detectors_only": self.detectors_only,
+            "runtime":        self.runtime,
+            "error":          self.error,
+        }
+
+
+models = ModelRegistry(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,278 @@
+import json
+import math
+import os
+
+import cv2
+import numpy as np
+
+from face_models import models, FACE_CROP, IMG_SIZE
+from telemetry import log, span
+
+FACE_MARGIN     = 0.2   # extra context around the detected box, as a fraction of its size
+DETECT_MAX_SIDE = 640   # frames are downscaled to this before running the cascade
+MIN_FACE_RATIO  = 0.15  # smallest face we accept, relative to the shorter frame side
+
+UPLOAD_CHUNK    = 64 * 1024
+DECODE_MIN_SIDE = 480   # reduced decode never goes below this on the shorter side
+MIN_IMAGE_SIDE  = 64
+MAX_IMAGE_SIDE  = 8192
+MAX_PIXELS      = 40_000_000
+MAX_ASPECT      = 4.0
+CROP_MIN_SIDE   = 160   # a client-side face crop must keep at least this many pixels (Facenet's input)
+CROP_TOLERANCE  = 0.05  # allowed mismatch between the crop's aspect ratio and the box it claims to be
+QUALITY_SIDE    = 128   # the face box is scaled to this before the brightness / sharpness check
+THUMB_SIDE      = 32    # grayscale thumbnail of the aligned crop the frame cache compares on a hash hit
+
+# quality gate in front of the models (0 turns a bound off) — mean gray level of the face box, and the
+# variance of its Laplacian, which drops towards 0 as the face gets motion-blurred or out of focus
+MIN_BRIGHTNESS = float(os.getenv('FACE_MIN_BRIGHTNESS', 40))
+MAX_BRIGHTNESS = float(os.getenv('FACE_MAX_BRIGHTNESS', 220))
+MIN_SHARPNESS  = float(os.getenv('FACE_MIN_SHARPNESS', 10))
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED     = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)]
+
+
+# raised when an upload is too big, malformed or an implausible image — the message is safe to show the user
+class ImageRejected(ValueError):
+    pass
+
+# a face was found but the frame is too dark, too bright or too blurred to be worth running the models on
+class FrameUnusable(ImageRejected):
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+# reads an uploaded file in fixed-size chunks and gives up as soon as it passes max_bytes
+def read_upload(file, max_bytes):
+    buf = bytearray()
+    while True:
+        chunk = file.stream.read(UPLOAD_CHUNK)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > max_bytes:
+            raise ImageRejected("Image is too large.")
+    if not buf:
+        raise ImageRejected("No image provided.")
+    return buf
+
+# pulls (width, height) out of the JPEG SOF segment or the PNG IHDR without decoding any pixels
+def image_dimensions(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+    if data[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker == 0xDA:
+            return None
+        if marker in _SOF_MARKERS:
+            h = int.from_bytes(data[i + 5:i + 7], 'big')
+            w = int.from_bytes(data[i + 7:i + 9], 'big')
+            return w, h
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+# biggest IMREAD_REDUCED_* factor that still leaves DECODE_MIN_SIDE pixels on the shorter side
+def reduced_decode_flag(width, height):
+    for factor, flag in _REDUCED:
+        if min(width, height) // factor >= DECODE_MIN_SIDE:
+            return flag
+    return cv2.IMREAD_COLOR
+
+# checks the metadata a browser sends with a client-side face crop against the crop's own dimensions:
+#   {"box": [x, y, w, h] in camera pixels, "source": [width, height] of the camera frame, "detector": ...}
+# the box has to sit inside the frame, the image has to be that box (same aspect, never upscaled) and big
+# enough for the models — the server still runs its own detection on the crop, this only refuses junk early
+def check_crop(meta, dims):
+    try:
+        meta       = json.loads(meta) if isinstance(meta, (str, bytes)) else meta
+        x, y, w, h = (float(v) for v in meta["box"])
+        sw, sh     = (float(v) for v in meta["source"])
+    except (ValueError, TypeError, KeyError):
+        raise ImageRejected("Malformed crop metadata.")
+
+    if not (MIN_IMAGE_SIDE <= min(sw, sh) and max(sw, sh) <= MAX_IMAGE_SIDE):
+        raise ImageRejected("Crop metadata is out of range.")
+    if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > sw + 1 or y + h > sh + 1:
+        raise ImageRejected("Crop metadata is out of range.")
+
+    iw, ih = dims
+    if min(iw, ih) < CROP_MIN_SIDE:
+        raise ImageRejected("Face crop is too small.")
+    if iw > w + 1 or ih > h + 1 or abs(iw / ih - w / h) > CROP_TOLERANCE * (w / h):
+        raise ImageRejected("Face crop doesn't match its metadata.")
+    return meta
+
+# reads, sanity-checks and decodes an uploaded image at the smallest resolution the models can use;
+# crop is the metadata of a client-side face crop, checked before any pixels are decoded
+def decode_upload(file, max_bytes, crop=None):
+    data = read_upload(file, max_bytes)
+    dims = image_dimensions(data)
+    if dims is None:
+        raise ImageRejected("Unsupported image format — please upload a JPEG.")
+
+    w, h = dims
+    if min(w, h) < MIN_IMAGE_SIDE or max(w, h) > MAX_IMAGE_SIDE or w * h > MAX_PIXELS:
+        raise ImageRejected("Image dimensions are out of range.")
+    if max(w, h) / min(w, h) > MAX_ASPECT:
+        raise ImageRejected("Image aspect ratio is out of range.")
+    if crop is not None:
+        check_crop(crop, dims)
+
+    flag  = reduced_decode_flag(w, h) if data[:2] == b'\xff\xd8' else cv2.IMREAD_COLOR
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if frame is None:
+        raise ImageRejected("Failed to read image")
+    return frame
+
+
+# finds the largest face in a BGR frame with the Haar cascade, returns (x, y, w, h) in frame coords or None
+def detect_face(frame_bgr, gray=None):
+    if gray is None:
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    h, w  = gray.shape[:2]
+    scale = min(1.0, DETECT_MAX_SIDE / float(max(h, w)))
+    small = cv2.resize(gray, (int(w * scale), int(h * scale))) if scale < 1.0 else gray
+    small = cv2.equalizeHist(small)
+
+    min_side = max(24, int(min(small.shape[:2]) * MIN_FACE_RATIO))
+    faces    = models.face_cascade.detectMultiScale(small, scaleFactor=1.1, minNeighbors=5,
+                                                    minSize=(min_side, min_side))
+    if len(faces) == 0:
+        return None
+    x, y, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+    return (int(x / scale), int(y / scale), int(fw / scale), int(fh / scale))
+
+# angle (degrees) of the line between the two eyes inside a grayscale face crop, 0 if we can't find both
+def _eye_angle(gray_face):
+    if models.eye_cascade is None:
+        return 0.0
+    upper = gray_face[:gray_face.shape[0] // 2]
+    eyes  = models.eye_cascade.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=5)
+    if len(eyes) < 2:
+        return 0.0
+    eyes = sorted(sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2], key=lambda e: e[0])
+    (x1, y1, w1, h1), (x2, y2, w2, h2) = eyes
+    dx = (x2 + w2 / 2) - (x1 + w1 / 2)
+    dy = (y2 + h2 / 2) - (y1 + h1 / 2)
+    if dx <= 0:
+        return 0.0
+    return math.degrees(math.atan2(dy, dx))
+
+# cuts a square around the face (with margin), padding with edge pixels if it runs off the frame
+def _square_crop(frame_bgr, box):
+    x, y, w, h = box
+    side = int(max(w, h) * (1 + 2 * FACE_MARGIN))
+    cx   = x + w // 2
+    cy   = y + h // 2
+    x0, y0 = cx - side // 2, cy - side // 2
+    x1, y1 = x0 + side, y0 + side
+
+    fh, fw = frame_bgr.shape[:2]
+    pad    = max(0, -x0, -y0, x1 - fw, y1 - fh)
+    if pad:
+        frame_bgr = cv2.copyMakeBorder(frame_bgr, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        x0, y0, x1, y1 = x0 + pad, y0 + pad, x1 + pad, y1 + pad
+    return frame_bgr[y0:y1, x0:x1]
+
+# the bare detector box — the FACE_CROP=tight Facenet input
+def _tight_crop(frame_bgr, box):
+    x, y, w, h = box
+    return frame_bgr[max(0, y):y + h, max(0, x):x + w]
+
+def _rotate(img, angle):
+    if not angle:
+        return img
+    h, w = img.shape[:2]
+    rot  = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(img, rot, (w, h), borderMode=cv2.BORDER_REPLICATE)
+
+# mean brightness and Laplacian variance of the detected face, measured at a fixed size
+def face_quality(gray, box):
+    x, y, w, h = box
+    face       = cv2.resize(gray[max(0, y):y + h, max(0, x):x + w], (QUALITY_SIDE, QUALITY_SIDE),
+                            interpolation=cv2.INTER_AREA)
+    return float(face.mean()), float(cv2.Laplacian(face, cv2.CV_64F).var())
+
+# raises FrameUnusable when the face box fails the brightness / sharpness thresholds
+def check_quality(gray, box):
+    brightness, sharpness = face_quality(gray, box)
+    if MIN_BRIGHTNESS and brightness < MIN_BRIGHTNESS:
+        raise FrameUnusable("dark", "Too dark — please face a light source and try again.")
+    if MAX_BRIGHTNESS and brightness > MAX_BRIGHTNESS:
+        raise FrameUnusable("bright", "Too much glare — please move away from the light and try again.")
+    if MIN_SHARPNESS and sharpness < MIN_SHARPNESS:
+        raise FrameUnusable("blurry", "Image is blurry — please hold still and try again.")
+    return brightness, sharpness
+
+# 64-bit difference hash of a small grayscale image plus the thumbnail itself — the frame cache's key,
+# and what it compares on a hit so only near pixel-identical crops share a result
+def fingerprint(gray_crop):
+    small = cv2.resize(gray_crop, (9, 8), interpolation=cv2.INTER_AREA)
+    bits  = (small[:, 1:] > small[:, :-1]).ravel()
+    thumb = cv2.resize(gray_crop, (THUMB_SIDE, THUMB_SIDE), interpolation=cv2.INTER_AREA)
+    return int(np.packbits(bits).view('>u8')[0]), thumb
+
+# the one pass over the frame: detect, check it's usable, align on the eyes, crop, convert to RGB, and
+# size it for both models. None when there's no face, FrameUnusable when it fails the quality gate.
+# The spoof input is always the aligned square; crop picks the Facenet one (see FACE_CROP)
+def prepare_face(frame_bgr, crop=FACE_CROP):
+    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    box  = detect_face(frame_bgr, gray)
+    if box is None:
+        return None
+    check_quality(gray, box)
+
+    angle  = _eye_angle(_square_crop(gray, box))
+    square = _rotate(_square_crop(frame_bgr, box), angle)
+    rgb    = cv2.cvtColor(square, cv2.COLOR_BGR2RGB)
+    embed  = rgb if crop != "tight" else cv2.cvtColor(_rotate(_tight_crop(frame_bgr, box), angle), cv2.COLOR_BGR2RGB)
+
+    h, w       = models.facenet_input_size()
+    key, thumb = fingerprint(cv2.cvtColor(square, cv2.COLOR_BGR2GRAY))
+    return {
+        "box":     box,
+        "angle":   angle,
+        "key":     key,
+        "thumb":   thumb,
+        "spoof":   cv2.resize(rgb, (IMG_SIZE, IMG_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0,
+        "facenet": cv2.resize(embed, (w, h), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0,
+    }
+
+# batch step for the micro-batcher: one anti-spoof call over every crop, then one Facenet call over the real ones
+def analyze_faces(faces):
+    results = [{"real": True, "score": None, "embedding": None} for _ in faces]
+
+    try:
+        with span("spoof"):
+            scores = models.predict_spoof(np.stack([face["spoof"] for face in faces]))
+    except Exception as e:
+        log.warning(f"  Anti-spoof error: {e} — allowing through")
+        scores = None
+    if scores is not None:
+        for result, prob in zip(results, scores):
+            result["score"] = float(prob)
+            result["real"]  = bool(prob > 0.5)
+            log.debug(f"  Anti-spoof score: {prob:.4f} → {'REAL ✅' if result['real'] else 'SPOOF ❌'}")
+
+    real = [i for i, result in enumerate(results) if result["real"]]
+    if real:
+        with span("embed"):
+            embeddings = models.embed(np.stack([faces[i]["facenet"] for i in real]))
+        for i, embedding in zip(real, embeddings):
+            results[i]["embedding"] = embedding
+    return results
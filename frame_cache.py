@@ -0,0 +1,80 @@
+import collections
+import threading
+import time
+
+import numpy as np
+
+
+# per-process short-TTL cache of model results for face crops the client already sent — the login page
+# and the extension resubmit near-identical frames after a failed scan, and those skip both models.
+# Keyed by the crop's difference hash; a hash hit only counts when the stored thumbnail is within
+# max_diff mean gray levels of the new one, so a different face (or a photo of this one) that happens
+# to share the hash never gets another frame's spoof verdict
+class FrameResultCache:
+
+    def __init__(self, capacity=1024, ttl=30, max_diff=2.0):
+        self.capacity  = max(1, int(capacity))
+        self.ttl       = ttl
+        self.max_diff  = max_diff
+        self.entries   = collections.OrderedDict()  # key -> [(thumb, result, stored_at)]
+        self.size      = 0
+        self._lock     = threading.Lock()
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def _matches(self, thumb, other):
+        return float(np.abs(thumb.astype(np.int16) - other.astype(np.int16)).mean()) <= self.max_diff
+
+    # a copy of the cached result for this prepared face, or None
+    def get(self, face):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.entries.get(face["key"])
+            if bucket:
+                for thumb, result, stored_at in bucket:
+                    if now - stored_at < self.ttl and self._matches(face["thumb"], thumb):
+                        self.entries.move_to_end(face["key"])
+                        self.hits += 1
+                        return _copy(result)
+            self.misses += 1
+        return None
+
+    # remembers the models' result for a prepared face, evicting the least recently used hashes
+    def put(self, face, result):
+        now = time.monotonic()
+        with self._lock:
+            old        = self.entries.pop(face["key"], [])
+            bucket     = [entry for entry in old
+                          if now - entry[2] < self.ttl and not self._matches(face["thumb"], entry[0])]
+            bucket.append((face["thumb"], _copy(result), now))
+            self.entries[face["key"]] = bucket
+            self.size += len(bucket) - len(old)
+            while self.size > self.capacity:
+                _, evicted = self.entries.popitem(last=False)
+                self.size      -= len(evicted)
+                self.evictions += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    # hit / miss counters for the stats endpoint
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size":      self.size,
+            "capacity":  self.capacity,
+            "ttl":       self.ttl,
+            "hits":      self.hits,
+            "misses":    self.misses,
+            "evictions": self.evictions,
+            "hit_rate":  (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+def _copy(result):
+    embedding = result.get("embedding")
+    return {**result, "embedding": None if embedding is None else np.array(embedding, copy=True)}
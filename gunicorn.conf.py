@@ -0,0 +1,49 @@
+import os
+
+# app.py loads the models at import — with preload_app the master does that once and the
+# workers inherit the weights copy-on-write instead of each loading their own copy
+preload_app  = True
+bind         = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers      = int(os.getenv('GUNICORN_WORKERS', 2))
+timeout      = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# gthread (default), sync, or uvicorn.workers.UvicornWorker to serve asgi:application. A sync worker
+# only ever has one request in flight, so the inference micro-batcher has nothing to group and
+# admission control nothing to queue — keep several threads (or ASGI) when those matter
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads      = int(os.getenv('GUNICORN_THREADS', 4))
+
+# how many requests one worker can have in flight, for app.py's admission-control defaults — the thread
+# count for gthread, the face-route pool for ASGI, 1 for sync
+if 'uvicorn' in worker_class.lower():
+    os.environ.setdefault('REALID_WORKER_THREADS', os.getenv('ASGI_INFERENCE_THREADS', str(os.cpu_count() or 2)))
+elif worker_class == 'gthread' or threads > 1:
+    os.environ.setdefault('REALID_WORKER_THREADS', str(threads))
+else:
+    os.environ.setdefault('REALID_WORKER_THREADS', '1')
+
+# TF's thread pools don't survive fork, so the master only loads weights and each worker warms up after forking
+os.environ['REALID_DEFER_WARMUP'] = '1'
+
+
+# runs the warm-up inference in each worker right after fork, before it accepts requests — only if the
+# master preloaded models (MODEL_PRELOAD); lazy and slim workers load on their first face request or never
+def post_fork(server, worker):
+    from face_models import models
+    if models.loaded:
+        models.warm_up()
+
+
+# closes the worker's SQLite connections (one per thread) on the way out
+def worker_exit(server, worker):
+    from db import close_db
+    close_db()
+
+
+# METRICS_DIR keeps a snapshot per worker pid, dead ones included so counters never go backwards —
+# clear the previous run's files when the master starts so a restart begins from zero
+def on_starting(server):
+    metrics_dir = os.getenv('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
@@ -0,0 +1,158 @@
+import collections
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+# one frame waiting for its result — the request thread blocks on done until the batch worker fills it in
+class _Job:
+    __slots__ = ('item', 'done', 'result', 'error', 'enqueued_at')
+
+    def __init__(self, item):
+        self.item        = item
+        self.done        = threading.Event()
+        self.result      = None
+        self.error       = None
+        self.enqueued_at = time.perf_counter()
+
+
+# runs queued requests through run_batch as one call. A request that finds nothing else queued runs
+# straight away — under a sync worker that's every request — and only when requests are already piling
+# up does the batch stay open for up to the window to pick up more. Each queue entry is one submission
+# (a single frame, or the frames of one burst), so a burst is never split across batches
+class MicroBatcher:
+
+    def __init__(self, run_batch, window_ms=10, max_batch=8, name="inference"):
+        self.run_batch = run_batch
+        self.window    = window_ms / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.name      = name
+        self._queue    = queue.Queue()
+        self._carry    = None  # a submission that didn't fit in the last batch, first in the next one
+        self._thread   = None
+        self._lock     = threading.Lock()
+
+        self.batches     = 0
+        self.items       = 0
+        self.errors      = 0
+        self.batch_sizes = collections.Counter()
+        self._waits      = collections.deque(maxlen=1000)
+        self._run_times  = collections.deque(maxlen=1000)
+
+    # starts the worker thread lazily so forked gunicorn workers each get their own
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    # queues one item and blocks until its batch has run, re-raising whatever the batch raised
+    def submit(self, item, timeout=None):
+        self._ensure_started()
+        job = _Job(item)
+        self._queue.put([job])
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"{self.name} batch did not finish within {timeout}s")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    # queues several items back to back (the frames of one burst) so they ride in the same batch,
+    # then blocks until all of them are done
+    def submit_many(self, items, timeout=None):
+        self._ensure_started()
+        jobs = [_Job(item) for item in items]
+        if jobs:
+            self._queue.put(jobs)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for job in jobs:
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not job.done.wait(remaining):
+                raise TimeoutError(f"{self.name} batch did not finish within {timeout}s")
+        for job in jobs:
+            if job.error is not None:
+                raise job.error
+        return [job.result for job in jobs]
+
+    # blocks for the first submission, takes whatever else is already queued, and waits out the window
+    # for more only when there was something else queued — a lone request never waits
+    def _collect(self):
+        # always a copy: the submitter's own list is what submit_many waits on, and jobs grows below
+        if self._carry is not None:
+            jobs, self._carry = list(self._carry), None
+        else:
+            jobs = list(self._queue.get())
+        busy     = False
+        deadline = None
+        while len(jobs) < self.max_batch:
+            try:
+                if not busy:
+                    more = self._queue.get_nowait()
+                else:
+                    if deadline is None:
+                        deadline = time.perf_counter() + self.window
+                    remaining = deadline - time.perf_counter()
+                    more      = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            busy = True
+            if len(jobs) + len(more) > self.max_batch:
+                self._carry = more
+                break
+            jobs.extend(more)
+        return jobs
+
+    # worker thread body — every job in a batch gets set, even when run_batch blows up
+    def _loop(self):
+        while True:
+            jobs    = self._collect()
+            started = time.perf_counter()
+            for job in jobs:
+                self._waits.append(started - job.enqueued_at)
+            try:
+                results = self.run_batch([job.item for job in jobs])
+                for job, result in zip(jobs, results):
+                    job.result = result
+            except Exception as e:
+                self.errors += 1
+                for job in jobs:
+                    job.error = e
+            finally:
+                self._run_times.append(time.perf_counter() - started)
+                self.batches += 1
+                self.items   += len(jobs)
+                self.batch_sizes[len(jobs)] += 1
+                for job in jobs:
+                    job.done.set()
+
+    # batch size and queue wait numbers for the stats endpoint
+    def stats(self):
+        waits = np.array(self._waits, dtype=np.float64) * 1000
+        runs  = np.array(self._run_times, dtype=np.float64) * 1000
+        return {
+            "window_ms":      self.window * 1000,
+            "max_batch":      self.max_batch,
+            "batches":        self.batches,
+            "items":          self.items,
+            "errors":         self.errors,
+            "queue_depth":    self._queue.qsize(),
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+            "batch_sizes":    {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            "queue_wait_ms":  _percentiles(waits),
+            "batch_run_ms":   _percentiles(runs),
+        }
+
+
+# p50 / p95 / max of a window of timings, already in ms
+def _percentiles(values):
+    if values.size == 0:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
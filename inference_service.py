@@ -0,0 +1,331 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import telemetry
+from telemetry import log
+
+# Local inference service: a fixed pool of processes that each hold Facenet + the anti-spoof model and
+# answer the web tier over a Unix socket.
+#
+#   python inference_service.py --processes 2
+#   INFERENCE_BACKEND=remote gunicorn -c gunicorn.conf.py app:app
+#
+# The web workers keep only the OpenCV cascades. They detect and crop faces themselves, write the
+# float32 face tensors into a shared-memory block they own, and send only the block name and shapes
+# over the socket. A model process maps numpy views straight onto that block, so no pixels are
+# pickled or copied through the socket. Each model process batches concurrent requests with the same
+# MicroBatcher the in-process backend uses.
+
+DEFAULT_SOCKET = os.getenv('INFERENCE_SOCKET', '/tmp/realid-inference.sock')
+
+_FRAME = struct.Struct('>II')
+
+
+# one length-prefixed message: JSON header + optional raw payload
+def send_message(sock, header, payload=b''):
+    head = json.dumps(header).encode()
+    sock.sendall(_FRAME.pack(len(head), len(payload)) + head + payload)
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        read = sock.recv_into(view[got:], n - got)
+        if not read:
+            raise ConnectionError("inference socket closed")
+        got += read
+    return bytes(buf)
+
+def recv_message(sock):
+    head_len, payload_len = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header  = json.loads(_recv_exact(sock, head_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else b''
+    return header, payload
+
+# opens a block the client created without adopting it — otherwise this process's resource tracker
+# would unlink the client's block when we exit
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ---- server side (model processes) ----
+
+# answers one web-tier connection until it closes; the client's shared-memory block stays mapped
+# between requests and is swapped only when the client grows it
+def _serve_connection(conn, models, batcher, timeout):
+    attached = {}
+    try:
+        while True:
+            try:
+                header, _ = recv_message(conn)
+            except ConnectionError:
+                return
+            if header.get("op") == "status":
+                status = models.status()
+                status["ready"] = models.is_ready()
+                send_message(conn, status)
+                continue
+
+            try:
+                shm = attached.get(header["shm"])
+                if shm is None:
+                    _close_all(attached)
+                    shm = attached[header["shm"]] = _attach(header["shm"])
+                n        = header["n"]
+                spoof    = np.ndarray((n, *header["spoof"]), dtype=np.float32, buffer=shm.buf)
+                facenet  = np.ndarray((n, *header["facenet"]), dtype=np.float32, buffer=shm.buf,
+                                      offset=spoof.nbytes)
+                faces    = [{"spoof": spoof[i], "facenet": facenet[i]} for i in range(n)]
+                # every request goes through this process's one batcher, so concurrent connections share
+                # model calls and never run the models side by side; a burst stays in one batch
+                results  = batcher.submit_many(faces, timeout=timeout)
+                del spoof, facenet, faces
+            except Exception as e:
+                send_message(conn, {"error": str(e)})
+                continue
+
+            embeddings = [r["embedding"] for r in results if r["embedding"] is not None]
+            payload    = np.asarray(embeddings, dtype=np.float32).tobytes() if embeddings else b''
+            send_message(conn, {
+                "results": [{"real": r["real"], "score": r["score"], "embedding": r["embedding"] is not None}
+                            for r in results],
+                "dim":     int(embeddings[0].shape[-1]) if embeddings else 0,
+            }, payload)
+    finally:
+        conn.close()
+        _close_all(attached)
+
+# unmaps blocks this process attached to; a view still alive from a failed request keeps one mapped
+def _close_all(attached):
+    for shm in attached.values():
+        try:
+            shm.close()
+        except BufferError:
+            pass
+    attached.clear()
+
+# body of one model process: loads + warms its own models after the fork, then accepts connections
+# on the shared listening socket, one thread per connection
+def _model_process(listener, window_ms, max_batch, timeout):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    from face_models import models
+    from face_pipeline import analyze_faces
+    from inference_batcher import MicroBatcher
+
+    models.load()
+    models.warm_up()
+    batcher = MicroBatcher(analyze_faces, window_ms=window_ms, max_batch=max_batch, name="service")
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(target=_serve_connection, args=(conn, models, batcher, timeout), daemon=True).start()
+
+
+# binds the socket, forks the model processes and restarts any that die until SIGTERM / Ctrl-C
+def serve(path=DEFAULT_SOCKET, processes=2, window_ms=10, max_batch=8, timeout=30):
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o660)
+    listener.listen(256)
+
+    ctx  = multiprocessing.get_context('fork')
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    def spawn():
+        p = ctx.Process(target=_model_process, args=(listener, window_ms, max_batch, timeout), daemon=True)
+        p.start()
+        return p
+
+    workers = [spawn() for _ in range(processes)]
+    log.info(f"✓ Inference service on {path} with {processes} model processes")
+    try:
+        while not stop.wait(1.0):
+            for i, p in enumerate(workers):
+                if not p.is_alive():
+                    log.warning(f"⚠️  Model process {p.pid} exited ({p.exitcode}) — restarting")
+                    workers[i] = spawn()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in workers:
+            p.terminate()
+        for p in workers:
+            p.join(5)
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# ---- client side (web tier) ----
+
+# per-thread connection + shared-memory block owned by this process; grown (re-created) when a larger
+# batch comes along, unlinked when the process exits
+class _Channel:
+
+    def __init__(self, path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.shm  = None
+
+    # a block of at least nbytes (1 MB minimum, enough for a single face)
+    def buffer(self, nbytes):
+        if self.shm is None or self.shm.size < nbytes:
+            self.release_shm()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1 << 20))
+        return self.shm
+
+    def release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        self.sock.close()
+        self.release_shm()
+
+
+# drop-in replacement for analyze_faces that runs the models in the inference service
+class InferenceClient:
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=30):
+        self.path       = path
+        self.timeout    = timeout
+        self._local     = threading.local()
+        self._channels  = []
+        self._lock      = threading.Lock()
+        self.requests   = 0
+        self.errors     = 0
+        self.reconnects = 0
+
+    # this thread's connection, opened on first use
+    def _channel(self):
+        channel = getattr(self._local, 'channel', None)
+        if channel is None:
+            channel = self._local.channel = _Channel(self.path, self.timeout)
+            with self._lock:
+                self._channels.append(channel)
+        return channel
+
+    # closes this thread's connection after an error so the next call starts clean
+    def _drop_channel(self):
+        channel = getattr(self._local, 'channel', None)
+        if channel is not None:
+            channel.close()
+            self._local.channel = None
+            with self._lock:
+                self._channels.remove(channel)
+
+    # one round trip, reconnecting once if the service was restarted under us
+    def _call(self, build):
+        for attempt in range(2):
+            try:
+                channel = self._channel()
+                header, payload = build(channel)
+                send_message(channel.sock, header, payload)
+                return recv_message(channel.sock)
+            except socket.timeout:
+                # the service is slow, not gone — resending would only queue the same work twice
+                self._drop_channel()
+                raise
+            except (ConnectionError, BrokenPipeError, FileNotFoundError, socket.timeout):
+                self._drop_channel()
+                if attempt:
+                    raise
+                self.reconnects += 1
+
+    # same contract as face_pipeline.analyze_faces: [{real, score, embedding}] per prepared face
+    def analyze(self, faces):
+        self.requests += 1
+        n             = len(faces)
+        spoof_shape   = (n, *faces[0]["spoof"].shape)
+        facenet_shape = (n, *faces[0]["facenet"].shape)
+        spoof_bytes   = int(np.prod(spoof_shape)) * 4
+
+        # the crops are written straight into the shared block — it is the only copy the service reads
+        def build(channel):
+            shm     = channel.buffer(spoof_bytes + int(np.prod(facenet_shape)) * 4)
+            spoof   = np.ndarray(spoof_shape, dtype=np.float32, buffer=shm.buf)
+            facenet = np.ndarray(facenet_shape, dtype=np.float32, buffer=shm.buf, offset=spoof_bytes)
+            for i, face in enumerate(faces):
+                spoof[i]   = face["spoof"]
+                facenet[i] = face["facenet"]
+            del spoof, facenet
+            return {"shm": shm.name, "n": n,
+                    "spoof": list(spoof_shape[1:]), "facenet": list(facenet_shape[1:])}, b''
+
+        try:
+            header, payload = self._call(build)
+        except Exception:
+            self.errors += 1
+            raise
+        if "error" in header:
+            self.errors += 1
+            raise RuntimeError(f"inference service: {header['error']}")
+
+        embeddings = np.frombuffer(payload, dtype=np.float32).reshape(-1, header["dim"] or 1)
+        results, row = [], 0
+        for r in header["results"]:
+            embedding = None
+            if r["embedding"]:
+                embedding, row = embeddings[row].copy(), row + 1
+            results.append({"real": r["real"], "score": r["score"], "embedding": embedding})
+        return results
+
+    # the status of whichever model process answers this thread's connection, or None if unreachable
+    def status(self):
+        try:
+            header, _ = self._call(lambda channel: ({"op": "status"}, b''))
+            return header
+        except Exception as e:
+            return {"ready": False, "error": str(e)}
+
+    # connection and error counters for /inference/stats
+    def stats(self):
+        return {
+            "socket":      self.path,
+            "connections": len(self._channels),
+            "requests":    self.requests,
+            "errors":      self.errors,
+            "reconnects":  self.reconnects,
+        }
+
+    # closes every connection and unlinks every shared-memory block this process created
+    def close(self):
+        with self._lock:
+            channels, self._channels = self._channels, []
+        for channel in channels:
+            channel.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket',          default=DEFAULT_SOCKET)
+    parser.add_argument('--processes',       type=int, default=int(os.getenv('INFERENCE_PROCESSES', 2)))
+    parser.add_argument('--batch-window-ms', type=float, default=float(os.getenv('INFERENCE_BATCH_WINDOW_MS', 10)))
+    parser.add_argument('--max-batch',       type=int, default=int(os.getenv('INFERENCE_MAX_BATCH', 8)))
+    parser.add_argument('--timeout',         type=float, default=float(os.getenv('INFERENCE_TIMEOUT', 30)))
+    args = parser.parse_args()
+    telemetry.setup_logging(os.getenv('LOG_LEVEL', 'INFO'))
+    serve(args.socket, args.processes, args.batch_window_ms, args.max_batch, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import queue
+import secrets
+import smtplib
+import threading
+import time
+
+from telemetry import log, registry, span
+
+
+# raised by send_raw() when the outbound queue is full — the caller should fail fast instead of blocking
+class MailQueueFull(Exception):
+    pass
+
+
+# background OTP mail delivery: handlers enqueue and return, worker threads hold a persistent SMTP
+# connection each, reconnect when the server drops it, and retry transient failures with backoff
+class MailDispatcher:
+
+    def __init__(self, host, port, use_tls=True, use_ssl=False, username=None, password=None,
+                 status_store=None, workers=1, queue_size=200, max_retries=3, backoff=1.0,
+                 timeout=10, idle_timeout=60, status_ttl=3600):
+        self.host         = host
+        self.port         = port
+        self.use_tls      = use_tls
+        self.use_ssl      = use_ssl
+        self.username     = username
+        self.password     = password
+        self.status_store = status_store
+        self.workers      = max(1, int(workers))
+        self.max_retries  = max_retries
+        self.backoff      = backoff
+        self.timeout      = timeout
+        self.idle_timeout = idle_timeout
+        self.status_ttl   = status_ttl
+        self._queue       = queue.Queue(maxsize=queue_size)
+        self._threads     = []
+        self._lock        = threading.Lock()
+
+        self.sent    = 0
+        self.failed  = 0
+        self.retries = 0
+
+    # starts the worker threads lazily so each forked gunicorn worker gets its own (and its own sockets)
+    def _ensure_started(self):
+        if self._threads and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._loop, name=f"mailer-{len(self._threads)}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    # queues an already-serialised message; returns an id for status()
+    def send_raw(self, sender, recipients, data):
+        self._ensure_started()
+        job_id = secrets.token_urlsafe(12)
+        job    = {"id": job_id, "sender": sender, "recipients": list(recipients),
+                  "data": data, "queued_at": time.time()}
+        self._set_status(job, "queued")
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._set_status(job, "failed", error="queue full")
+            raise MailQueueFull("Mail queue is full")
+        return job_id
+
+    # delivery state for a job id: queued / sending / sent / failed, plus attempts and last error
+    def status(self, job_id):
+        if self.status_store is None:
+            return None
+        return self.status_store.get(f"mail:{job_id}")
+
+    # writes the job's state to the shared store so any worker can answer a status lookup
+    def _set_status(self, job, state, attempts=0, error=None):
+        if self.status_store is not None:
+            self.status_store.set(f"mail:{job['id']}",
+                                  {"state": state, "attempts": attempts, "error": error,
+                                   "recipients": job["recipients"]},
+                                  self.status_ttl)
+
+    # opens + authenticates a fresh SMTP connection
+    def _connect(self):
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    # hangs up politely, or just drops the socket if the server already went away
+    @staticmethod
+    def _close(conn):
+        if conn is None:
+            return
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # one worker: keeps its connection open between messages and hangs up after idle_timeout of quiet.
+    # A None job is close() telling it to stop; nothing a single message does can end the thread
+    def _loop(self):
+        conn = None
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close(conn)
+                conn = None
+                continue
+            if job is None:
+                self._close(conn)
+                self._queue.task_done()
+                return
+            try:
+                conn = self._deliver(job, conn)
+            except Exception as e:
+                log.error(f"✗ Mail worker error: {e}")
+                self._close(conn)
+                conn = None
+            finally:
+                self._queue.task_done()
+
+    # tries a job up to max_retries + 1 times; 5xx replies are permanent and aren't retried
+    def _deliver(self, job, conn):
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            self._set_status(job, "sending", attempt)
+            reused = conn is not None
+            try:
+                with span("smtp_send"):
+                    if conn is None:
+                        conn = self._connect()
+                    conn.sendmail(job["sender"], job["recipients"], job["data"])
+                self.sent += 1
+                self._set_status(job, "sent", attempt)
+                waited = time.time() - job['queued_at']
+                registry.observe("realid_mail_delivery_seconds", waited)
+                registry.inc("realid_mail_total", result="sent")
+                log.info(f"✓ Mail delivered to {', '.join(job['recipients'])} ({waited:.2f}s after queueing)")
+                return conn
+            except smtplib.SMTPRecipientsRefused as e:
+                error = str(e)
+                break
+            except smtplib.SMTPResponseException as e:
+                error = f"{e.smtp_code} {e.smtp_error!r}"
+                self._close(conn)
+                conn = None
+                if e.smtp_code >= 500:
+                    break
+            except (smtplib.SMTPException, OSError) as e:
+                error = str(e)
+                self._close(conn)
+                conn = None
+                # the server quietly closed our idle connection — reconnect straight away, no backoff
+                if reused and isinstance(e, smtplib.SMTPServerDisconnected):
+                    continue
+            if attempt <= self.max_retries:
+                self.retries += 1
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+
+        self.failed += 1
+        self._set_status(job, "failed", attempt, error)
+        registry.inc("realid_mail_total", result="failed")
+        log.warning(f"✗ Mail to {', '.join(job['recipients'])} failed: {error}")
+        return conn
+
+    # lets the workers deliver what's still queued for up to `timeout` seconds, then stops them — the
+    # threads are daemons, so without this a worker restart drops queued OTP mail. Returns how many
+    # messages were left undelivered
+    def close(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and any(t.is_alive() for t in self._threads):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+            left = self._queue.unfinished_tasks
+        threads = [t for t in self._threads if t.is_alive()]
+        for _ in threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        if left:
+            log.warning(f"⚠️  Mail dispatcher closed with {left} message(s) undelivered")
+        return left
+
+    # queue depth and delivery counters
+    def stats(self):
+        return {
+            "queued":  self._queue.qsize(),
+            "sent":    self.sent,
+            "failed":  self.failed,
+            "retries": self.retries,
+            "workers": len([t for t in self._threads if t.is_alive()]),
+        }
@@ -0,0 +1,258 @@
+import sqlite3
+import sys
+
+import telemetry
+from db import get_db, DB_PATH
+from domains import registrable_domain, split_service
+from telemetry import log
+
+
+# v1 — the original schema from init_db.py, IF NOT EXISTS so databases created by it are adopted as-is
+def _v1_base_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            face_embedding BLOB
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS passwords (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            service TEXT NOT NULL,
+            secret TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+# v2 — vault and extension lookups filter on email and sort by created_at
+def _v2_password_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_email ON passwords(email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_email_created ON passwords(email, created_at)")
+
+# v3 — normalized domain (eTLD+1) and username columns so the extension lookup is an indexed equality
+# instead of LIKE '%domain%', backfilled from the packed "service|username" strings
+def _v3_password_domain(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(passwords)")}
+    if 'domain' not in columns:
+        conn.execute("ALTER TABLE passwords ADD COLUMN domain TEXT")
+    if 'username' not in columns:
+        conn.execute("ALTER TABLE passwords ADD COLUMN username TEXT")
+
+    rows    = conn.execute("SELECT id, service FROM passwords WHERE domain IS NULL").fetchall()
+    updates = []
+    for password_id, combined in rows:
+        service, username = split_service(combined)
+        updates.append((registrable_domain(service), username, password_id))
+    conn.executemany("UPDATE passwords SET domain = ?, username = ? WHERE id = ?", updates)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_passwords_email_domain ON passwords(email, domain, created_at)")
+
+# v4 — shared TTL store for OTPs and attempt counters, so every gunicorn worker sees the same codes
+def _v4_ephemeral(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ephemeral (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ephemeral_expires ON ephemeral(expires_at)")
+
+# v5 — extra per-user face templates picked from the enrolment burst, next to the centroid in users
+def _v5_face_templates(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS face_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_face_templates_email ON face_templates(email)")
+
+# v6 — vault sync: every insert/update/delete on passwords lands in a change log (its seq is the client's
+# cursor), and where SQLite was built with FTS5, service + username get a full-text index; both are kept
+# in step by triggers so no write path in the app has to remember them. Without FTS5 the version is still
+# bumped; migrate retries the index on every later run (see _fts_index)
+def _v6_vault_sync(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS password_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            password_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_password_changes_email_seq ON password_changes(email, seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_password_changes_changed ON password_changes(changed_at)")
+    for event, row, op in (("INSERT", "new", "upsert"), ("UPDATE", "new", "upsert"), ("DELETE", "old", "delete")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS passwords_log_{event.lower()} AFTER {event} ON passwords BEGIN
+                INSERT INTO password_changes (email, password_id, op) VALUES ({row}.email, {row}.id, '{op}');
+            END
+        """)
+
+    _fts_index(conn)
+
+# the passwords_fts index and its sync triggers, filled from the rows already there — False, with a warning,
+# when this SQLite build has no FTS5. Safe to re-run: migrate calls it again at every start while the
+# index is missing, so a database first migrated without FTS5 gets it once SQLite is upgraded
+def _fts_index(conn):
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts
+            USING fts5(service, username, content='passwords', content_rowid='id', prefix='2 3')
+        """)
+    except sqlite3.OperationalError as e:
+        log.warning(f"⚠️  No FTS5 in this SQLite build ({e}) — vault search falls back to LIKE")
+        return False
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_insert AFTER INSERT ON passwords BEGIN
+            INSERT INTO passwords_fts (rowid, service, username) VALUES (new.id, new.service, new.username);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_delete AFTER DELETE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, service, username)
+            VALUES ('delete', old.id, old.service, old.username);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_update AFTER UPDATE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, service, username)
+            VALUES ('delete', old.id, old.service, old.username);
+            INSERT INTO passwords_fts (rowid, service, username) VALUES (new.id, new.service, new.username);
+        END
+    """)
+    conn.execute("INSERT INTO passwords_fts (passwords_fts) VALUES ('rebuild')")
+    return True
+
+# v7 — per account, the highest change-log seq pruning has dropped, so sync can tell a cursor the log no
+# longer covers from one that just predates the account's next change. Accounts that already have data
+# are seeded from where an earlier prune left the log, since which of them it touched wasn't recorded
+def _v7_change_log_boundary(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS password_changes_pruned (
+            email TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO password_changes_pruned (email, seq)
+        SELECT email, (SELECT COALESCE((SELECT MIN(seq) - 1 FROM password_changes),
+                                       (SELECT seq FROM sqlite_sequence WHERE name = 'password_changes'), 0))
+        FROM (SELECT email FROM passwords UNION SELECT email FROM password_changes)
+    """)
+
+
+# (version, name, step) — append only, never renumber or edit a shipped step
+MIGRATIONS = [
+    (1, "base schema",         _v1_base_schema),
+    (2, "passwords indexes",   _v2_password_indexes),
+    (3, "passwords domain",    _v3_password_domain),
+    (4, "ephemeral store",     _v4_ephemeral),
+    (5, "face templates",      _v5_face_templates),
+    (6, "vault sync",          _v6_vault_sync),
+    (7, "change-log boundary", _v7_change_log_boundary),
+]
+
+# write statements app.py runs verbatim, kept here so the plan check below covers the real SQL
+UPDATE_PASSWORD_SQL = "UPDATE passwords SET service = ?, secret = ?, domain = ?, username = ? WHERE id = ? AND email = ?"
+
+# the queries the routes run on every request — each must be answered from an index, never a full scan
+HOT_QUERIES = [
+    ("check_email",       "SELECT 1 FROM users WHERE email = ?", ("x",)),
+    ("stored_embedding",  "SELECT face_embedding FROM users WHERE email = ?", ("x",)),
+    ("embedding_version", "SELECT id FROM users WHERE email = ?", ("x",)),
+    ("vault_page",        """SELECT id, service, username, secret, domain FROM passwords
+                             WHERE email = ? AND id > ? ORDER BY id LIMIT ?""", ("x", 0, 50)),
+    ("vault_count",       "SELECT COUNT(*) FROM passwords WHERE email = ?", ("x",)),
+    ("vault_changes",     """SELECT seq, password_id, op FROM password_changes
+                             WHERE email = ? AND seq > ? ORDER BY seq LIMIT ?""", ("x", 0, 500)),
+    ("vault_pruned",      "SELECT seq FROM password_changes_pruned WHERE email = ?", ("x",)),
+    ("vault_user_name",   "SELECT name FROM users WHERE email = ?", ("x",)),
+    ("update_password",   UPDATE_PASSWORD_SQL, ("s", "x", "x.com", None, 1, "x")),
+    ("delete_password",   "DELETE FROM passwords WHERE id = ? AND email = ?", (1, "x")),
+    ("delete_account",    "DELETE FROM passwords WHERE email = ?", ("x",)),
+    ("face_templates",    "SELECT embedding FROM face_templates WHERE email = ?", ("x",)),
+    ("otp_redeem",        "DELETE FROM ephemeral WHERE key = ? AND value = ? AND expires_at > ?", ("k", "v", 0)),
+    ("extension_lookup",  """SELECT id, service, username, secret FROM passwords
+                             WHERE email = ? AND domain IN (?)
+                             ORDER BY created_at DESC""", ("x", "x.com")),
+]
+
+
+# schema version is tracked in SQLite's own user_version header field
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# applies every pending step, each in its own transaction together with the user_version bump,
+# so a crash mid-way leaves the DB at the last fully applied version and re-running is always safe
+def migrate(conn=None):
+    conn    = conn or get_db()
+    version = current_version(conn)
+    applied = []
+    for target, name, step in MIGRATIONS:
+        if target <= version:
+            continue
+        # explicit BEGIN — sqlite3 doesn't open a transaction on its own for DDL
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(target)
+        log.info(f"✓ Migration {target} applied: {name}")
+
+    # v6 ran on an earlier start without FTS5 — try the index again (freshly applied v6 already did)
+    if version >= 6 and not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'passwords_fts'").fetchone():
+        conn.execute("BEGIN")
+        try:
+            created = _fts_index(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if created:
+            log.info("✓ Vault full-text index created (FTS5 was missing when migration 6 ran)")
+    return applied
+
+# runs EXPLAIN QUERY PLAN on every hot query and returns the ones that full-scan a table or sort in a temp b-tree
+def check_query_plans(conn=None):
+    conn     = conn or get_db()
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall():
+            detail = row[-1]
+            if (detail.startswith("SCAN") and "USING" not in detail) or "TEMP B-TREE" in detail:
+                problems.append((name, detail))
+    return problems
+
+
+# python migrations.py          — bring the DB up to date
+# python migrations.py --check  — also fail (exit 1) if a hot query lost its index
+def main(argv=None):
+    argv    = sys.argv[1:] if argv is None else argv
+    telemetry.setup_logging(background=False)
+    conn    = get_db()
+    applied = migrate(conn)
+    log.info(f"✓ {DB_PATH} at schema version {current_version(conn)} ({len(applied)} applied)")
+
+    if '--check' in argv:
+        problems = check_query_plans(conn)
+        for name, detail in problems:
+            log.error(f"✗ {name}: {detail}")
+        if problems:
+            return 1
+        log.info(f"✓ All {len(HOT_QUERIES)} hot queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+from face_models import ANTISPOOF_FILES, FACENET_MODEL, ONNX_FILES
+
+# Exports Facenet and the anti-spoof model to ONNX for INFERENCE_RUNTIME=onnx / onnx-int8.
+#
+#   pip install tf2onnx onnxruntime
+#   python onnx_export.py                                  # facenet.onnx + antispoof.onnx
+#   python onnx_export.py --int8                           # + dynamically quantized *.int8.onnx
+#   python onnx_export.py --int8 --calibration faces/      # static INT8, calibrated on real photos
+#
+# The exports keep the Keras NHWC float32 inputs, so the same prepared crops feed either runtime.
+# Check accuracy and speed with benchmarks/bench_onnx.py before switching a deployment over.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# Keras -> ONNX with a fixed HxW and a dynamic batch dimension
+def export_keras(model, path, opset):
+    import tensorflow as tf
+    import tf2onnx
+
+    _, h, w, c = model.input_shape
+    spec = (tf.TensorSpec((None, h, w, c), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path)
+    print(f"✓ Wrote {os.path.relpath(path, BASE_DIR)} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+# prepared crops from a folder of face photos, in the layout each model expects
+def calibration_batches(folder, key, limit):
+    import cv2
+    from face_pipeline import prepare_face
+
+    batches = []
+    for path in sorted(glob.glob(os.path.join(folder, '*')))[:limit]:
+        frame = cv2.imread(path)
+        face  = prepare_face(frame) if frame is not None else None
+        if face is not None:
+            batches.append(face[key][None])
+    print(f"  {len(batches)} calibration faces from {folder}")
+    return batches
+
+# INT8 weights — static (QDQ, per-channel) when calibration crops are given, dynamic otherwise
+def quantize(src, dst, batches=None):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if not batches:
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+    else:
+        class Reader(CalibrationDataReader):
+            def __init__(self):
+                self.items = iter([{"input": b.astype(np.float32)} for b in batches])
+
+            def get_next(self):
+                return next(self.items, None)
+
+        quantize_static(src, dst, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+    print(f"✓ Wrote {os.path.relpath(dst, BASE_DIR)} ({os.path.getsize(dst) / 1e6:.1f} MB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--int8',        action='store_true', help="also write the INT8 quantized variants")
+    parser.add_argument('--calibration', help="folder of face photos for static INT8 calibration")
+    parser.add_argument('--calibration-limit', type=int, default=200)
+    parser.add_argument('--opset',       type=int, default=13)
+    args = parser.parse_args(argv)
+
+    from deepface import DeepFace
+    import keras
+
+    fp32, int8 = ONNX_FILES["onnx"], ONNX_FILES["onnx-int8"]
+    facenet    = DeepFace.build_model(FACENET_MODEL)
+    exports    = [("facenet", getattr(facenet, 'model', facenet))]
+    for fname in ANTISPOOF_FILES:
+        if os.path.exists(os.path.join(BASE_DIR, fname)):
+            exports.append(("antispoof", keras.models.load_model(os.path.join(BASE_DIR, fname))))
+            break
+    else:
+        print("⚠️  No anti-spoof model found — exporting Facenet only")
+
+    for key, model in exports:
+        src = os.path.join(BASE_DIR, fp32[key])
+        export_keras(model, src, args.opset)
+        if args.int8:
+            batches = None
+            if args.calibration:
+                batches = calibration_batches(args.calibration, "facenet" if key == "facenet" else "spoof",
+                                              args.calibration_limit)
+            quantize(src, os.path.join(BASE_DIR, int8[key]), batches)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
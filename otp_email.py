@@ -0,0 +1,140 @@
+import email.charset
+import email.header
+import email.policy
+import email.utils
+import functools
+import textwrap
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# subject, heading, intro line and accent colour for each OTP purpose
+PURPOSES = {
+    "login": ("Your REAL ID OTP", "Login Verification",
+              "Use this code to access your vault:", "#4f8cff"),
+    "registration": ("Your REAL ID Registration OTP", "Registration Verification",
+                     "Use this code to complete your registration:", "#4f8cff"),
+    "deletion": ("REAL ID — Account Deletion Verification", "⚠️ Account Deletion Request",
+                 "Use this code to permanently delete your REAL ID account and all saved passwords. "
+                 "If you did NOT request this, ignore this email — your account remains safe.", "#ff4040"),
+}
+
+# stands in for the code while a template is compiled — plain alphanumerics so neither quoted-printable
+# nor html escaping touches it
+_SLOT = "OTPSLOT9f2c4e"
+
+
+# the full HTML document — only called when a template is compiled, never per send
+def _html(otp, title, message, accent, ttl_minutes):
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    </head>
+    <body style="margin:0;padding:0;background-color:#050810;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',sans-serif;">
+        <table width="100%" cellpadding="0" cellspacing="0" style="background-color:#050810;padding:40px 20px;">
+            <tr><td align="center">
+                <table width="600" cellpadding="0" cellspacing="0" style="background:linear-gradient(135deg,#0d1530 0%,#080d1a 100%);border-radius:20px;border:1px solid rgba(79,140,255,0.2);overflow:hidden;box-shadow:0 20px 60px rgba(0,0,0,0.6);">
+                    <tr><td style="background:linear-gradient(135deg,#1a3aff,{accent});padding:40px;text-align:center;">
+                        <h1 style="margin:0;color:#fff;font-size:32px;font-weight:800;letter-spacing:4px;font-family:'Courier New',monospace;">REAL ID</h1>
+                        <p style="margin:8px 0 0;color:rgba(255,255,255,0.7);font-size:12px;letter-spacing:3px;text-transform:uppercase;">Biometric Password Vault</p>
+                    </td></tr>
+                    <tr><td style="padding:50px 40px;">
+                        <h2 style="color:{accent};margin:0 0 20px 0;font-size:22px;font-weight:700;">{title}</h2>
+                        <p style="color:rgba(255,255,255,0.75);font-size:15px;line-height:1.7;margin:0 0 30px 0;">{message}</p>
+                        <table width="100%" cellpadding="0" cellspacing="0"><tr>
+                            <td align="center" style="padding:30px;background:rgba(79,140,255,0.08);border:2px solid rgba(79,140,255,0.25);border-radius:15px;">
+                                <p style="margin:0 0 10px 0;color:rgba(255,255,255,0.5);font-size:12px;text-transform:uppercase;letter-spacing:2px;">Your OTP Code</p>
+                                <p style="margin:0;color:{accent};font-size:48px;font-weight:800;letter-spacing:12px;font-family:'Courier New',monospace;">{otp}</p>
+                            </td>
+                        </tr></table>
+                        <table width="100%" cellpadding="0" cellspacing="0" style="margin-top:28px;"><tr>
+                            <td style="padding:18px 20px;background:rgba(255,60,60,0.07);border:1px solid rgba(255,60,60,0.2);border-radius:10px;">
+                                <p style="margin:0;color:#ff8080;font-size:13px;line-height:1.65;">
+                                    <strong>⚠️ Security Notice:</strong><br>
+                                    This code expires in <strong>{ttl_minutes} minutes</strong>. Never share it with anyone. REAL ID will never ask for your OTP via call or chat.
+                                </p>
+                            </td>
+                        </tr></table>
+                        <p style="color:rgba(255,255,255,0.4);font-size:13px;margin:28px 0 0 0;line-height:1.65;">
+                            If you didn't request this code, please ignore this email.
+                        </p>
+                    </td></tr>
+                    <tr><td style="padding:28px 40px;background:rgba(0,0,0,0.35);border-top:1px solid rgba(255,255,255,0.07);">
+                        <p style="margin:0;color:rgba(255,255,255,0.4);font-size:11px;text-align:center;line-height:1.7;">
+                            © 2024 REAL ID — Biometric Password Manager<br>
+                            Secured with advanced face recognition technology
+                        </p>
+                    </td></tr>
+                </table>
+            </td></tr>
+        </table>
+    </body>
+    </html>
+    """
+
+
+# plain-text alternative for clients that don't render HTML (and for spam filters that like having one)
+def _text(otp, title, message, ttl_minutes):
+    return (f"REAL ID — {title}\n\n"
+            f"{message}\n\n"
+            f"    {otp}\n\n"
+            f"This code expires in {ttl_minutes} minutes. Never share it with anyone. "
+            f"REAL ID will never ask for your OTP via call or chat.\n\n"
+            f"If you didn't request this code, please ignore this email.\n")
+
+
+# builds the html and text bodies once per (purpose, ttl) with a placeholder for the code and splits
+# them around it, so each send is just two concatenations
+@functools.lru_cache(maxsize=None)
+def compile_template(purpose, ttl_minutes=10):
+    subject, title, message, accent = PURPOSES.get(purpose, PURPOSES["registration"])
+    html = textwrap.dedent(_html(_SLOT, title, message, accent, ttl_minutes)).strip()
+    text = _text(_SLOT, title, message, ttl_minutes)
+    return subject, tuple(html.split(_SLOT)), tuple(text.split(_SLOT))
+
+# the whole multipart/alternative MIME body, serialised once and split around the code: the html part
+# is made pure ASCII (character references) so it goes out 7bit, the text part is quoted-printable,
+# and the slot survives both untouched — a send then never touches the email package's generator
+@functools.lru_cache(maxsize=None)
+def compile_mime(purpose, ttl_minutes=10):
+    subject, html, text = compile_template(purpose, ttl_minutes)
+    html = _SLOT.join(html).encode('ascii', 'xmlcharrefreplace').decode('ascii')
+    text_charset = email.charset.Charset('utf-8')
+    text_charset.body_encoding = email.charset.QP
+
+    body = MIMEMultipart('alternative')
+    body.attach(MIMEText(_SLOT.join(text), 'plain', text_charset))
+    body.attach(MIMEText(html, 'html', 'us-ascii'))
+    parts = tuple(body.as_bytes(policy=email.policy.SMTP).split(_SLOT.encode()))
+    if len(parts) != 3:
+        raise RuntimeError(f"OTP slot was mangled while compiling the {purpose} email")
+    return email.header.Header(subject, 'utf-8').encode().encode('ascii'), parts
+
+# ASCII header value, refusing CR/LF so an address can never smuggle in extra headers
+def _header(value):
+    if '\r' in value or '\n' in value:
+        raise ValueError("Invalid characters in mail header")
+    return value.encode('ascii') if value.isascii() else email.header.Header(value, 'utf-8').encode().encode('ascii')
+
+# (subject, html, text) for an OTP — unknown purposes fall back to the registration wording as before
+def render_otp_email(otp, purpose="login", ttl_minutes=10):
+    subject, html, text = compile_template(purpose, ttl_minutes)
+    return subject, otp.join(html), otp.join(text)
+
+# the finished RFC 5322 bytes for an OTP email — per-send work is a handful of headers plus joining
+# the code into the precompiled body
+def otp_mime(otp, purpose, sender, recipient, ttl_minutes=10):
+    if not otp.isdigit():
+        raise ValueError("OTP must be digits")
+    subject, parts = compile_mime(purpose, ttl_minutes)
+    domain  = sender.rsplit('@', 1)[-1] or 'localhost'
+    headers = b"".join([
+        b"Subject: ", subject, b"\r\n",
+        b"From: ", _header(sender), b"\r\n",
+        b"To: ", _header(recipient), b"\r\n",
+        b"Date: ", email.utils.formatdate(localtime=True).encode('ascii'), b"\r\n",
+        b"Message-ID: ", email.utils.make_msgid(domain=_header(domain).decode('ascii')).encode('ascii'), b"\r\n",
+    ])
+    return headers + otp.encode('ascii').join(parts)
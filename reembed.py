@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import embedding_format
+import telemetry
+from db import DB_PATH, get_db
+from face_models import embedding_model_name
+from migrations import migrate
+
+# Rewrites stored face embeddings (users + face_templates) into the current storage format, a small
+# batch at a time, so it can run next to the live app.
+#
+#   python reembed.py --dry-run                                   # count what would change
+#   python reembed.py                                             # legacy / other-dtype rows -> EMBEDDING_DTYPE
+#   python reembed.py --from-model VGG-Face --transform map.npy   # map another model's vectors across
+#
+# Embeddings can't be recomputed without the enrolment photos, which aren't kept — so rows made by
+# another model are left alone (those users re-enrol after their next OTP login) unless a linear map is
+# given: an (old dim x new dim) .npy, e.g. a least-squares fit over faces run through both models.
+# Every write is compare-and-set on the old blob, so a user re-enrolling meanwhile always wins.
+# Restart the app after a --transform run so each worker's face index picks the mapped users up.
+
+TABLES = (("users", "face_embedding"), ("face_templates", "embedding"))
+
+
+# the blob this row should hold, or None when it's already right (or can't be brought over)
+def target_blob(blob, metric, model, dtype, transform=None, from_model=None):
+    stored = embedding_format.decode(blob)
+    vector = stored.vector
+    if stored.model != model:
+        if transform is None or stored.model != from_model or vector.shape[0] != transform.shape[0]:
+            return None
+        vector = vector @ transform
+    elif stored.version == embedding_format.VERSION and stored.dtype == dtype and stored.normalized == metric.cosine:
+        return None
+    return embedding_format.encode(metric.prepare(vector), model, dtype=dtype, normalized=metric.cosine)
+
+# walks one table in id order, batch rows per transaction, and returns (rewritten, stale, lost) counts —
+# lost are rows that changed under us between the read and the write
+def reembed_table(conn, table, column, batch, pause, dry_run, **target):
+    last_id, rewritten, stale, lost = 0, 0, 0, 0
+    while True:
+        rows = conn.execute(f"SELECT id, {column} FROM {table} WHERE id > ? AND {column} IS NOT NULL "
+                            f"ORDER BY id LIMIT ?", (last_id, batch)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for row_id, blob in rows:
+            new = target_blob(blob, **target)
+            if new is not None:
+                updates.append((new, row_id, blob))
+            elif embedding_format.decode(blob).model != target["model"]:
+                stale += 1
+        if updates and not dry_run:
+            with conn:
+                for new, row_id, blob in updates:
+                    cur   = conn.execute(f"UPDATE {table} SET {column} = ? WHERE id = ? AND {column} = ?",
+                                         (new, row_id, blob))
+                    lost += 1 - cur.rowcount
+        rewritten += len(updates)
+        if pause:
+            time.sleep(pause)
+    return rewritten - lost, stale, lost
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--metric',     default=os.getenv('FACE_METRIC', 'cosine'), choices=("cosine", "euclidean"))
+    parser.add_argument('--model',      default=os.getenv('EMBEDDING_MODEL', embedding_model_name()),
+                        help="model the app runs now (EMBEDDING_MODEL)")
+    parser.add_argument('--dtype',      default=os.getenv('EMBEDDING_DTYPE', 'float32'),
+                        choices=sorted(embedding_format.DTYPES))
+    parser.add_argument('--from-model', help="model whose rows --transform maps across")
+    parser.add_argument('--transform',  help=".npy linear map from --from-model vectors to --model vectors")
+    parser.add_argument('--batch',      type=int, default=500, help="rows per transaction")
+    parser.add_argument('--pause',      type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument('--dry-run',    action='store_true')
+    args = parser.parse_args(argv)
+
+    if bool(args.transform) != bool(args.from_model):
+        parser.error("--transform and --from-model go together")
+    transform = np.load(args.transform).astype(np.float32) if args.transform else None
+
+    telemetry.setup_logging(background=False)
+    conn   = get_db()
+    migrate(conn)
+    target = dict(metric=embedding_format.Metric(args.metric), model=args.model, dtype=args.dtype,
+                  transform=transform, from_model=args.from_model)
+    for table, column in TABLES:
+        rewritten, stale, lost = reembed_table(conn, table, column, args.batch, args.pause, args.dry_run, **target)
+        verb = "would rewrite" if args.dry_run else "rewrote"
+        print(f"✓ {table}: {verb} {rewritten} embeddings, {stale} from another model left for re-enrolment"
+              + (f", {lost} changed meanwhile and skipped" if lost else ""))
+    print(f"✓ {DB_PATH} embeddings now {args.dtype}, {args.metric}, model {args.model}"
+          + (" (dry run)" if args.dry_run else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import collections
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+# In-process metrics (histograms + counters) with a Prometheus text exposition, timing spans around the
+# pipeline stages, non-blocking logging, and an on-demand sampling profiler. No extra dependency.
+#
+# Under gunicorn every worker has its own numbers. Set METRICS_DIR and each process also flushes a
+# snapshot there every few seconds; /metrics then sums the snapshots of every worker (dead ones included,
+# so counters never go backwards), the way prometheus_client's multiprocess mode does.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FLUSH_INTERVAL = 5.0
+
+log = logging.getLogger("realid")
+
+
+# cumulative-bucket latency histogram, one per (metric, labels)
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum       += value
+        self.count     += 1
+
+
+# every metric of this process, plus the optional METRICS_DIR snapshot it shares with its siblings
+class Registry:
+
+    def __init__(self):
+        self.histograms  = {}
+        self.counters    = collections.Counter()
+        self.gauges      = {}
+        self.help        = {}
+        self.metrics_dir = None
+        self._lock       = threading.Lock()
+        self._flusher    = None
+
+    # records one duration (seconds) under a histogram metric
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+        self._ensure_flusher()
+
+    # bumps a counter metric
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += amount
+        self._ensure_flusher()
+
+    # a value read at scrape time (queue depths, cache sizes) — per process, never merged
+    def gauge(self, name, fn, help_text=""):
+        self.gauges[name] = fn
+        if help_text:
+            self.help[name] = help_text
+
+    def describe(self, name, help_text):
+        self.help[name] = help_text
+
+    # this process's histograms + counters as plain JSON-able data
+    def snapshot(self):
+        with self._lock:
+            return {
+                "histograms": [[name, list(labels), hist.counts[:], hist.sum, hist.count]
+                               for (name, labels), hist in self.histograms.items()],
+                "counters":   [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            }
+
+    # starts the per-process snapshot writer (lazily, so forked workers each get their own)
+    def _ensure_flusher(self):
+        if not self.metrics_dir:
+            return
+        flusher = self._flusher
+        if flusher is not None and flusher[0] == os.getpid() and flusher[1].is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or self._flusher[0] != os.getpid() or not self._flusher[1].is_alive():
+                thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                self._flusher = (os.getpid(), thread)
+                thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    # writes this process's snapshot atomically to METRICS_DIR/<pid>.json
+    def flush(self):
+        if not self.metrics_dir:
+            return
+        path = os.path.join(self.metrics_dir, f"{os.getpid()}.json")
+        tmp  = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    # snapshots of every process that ever wrote to METRICS_DIR (just this one without it)
+    def _snapshots(self):
+        if not self.metrics_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for name in os.listdir(self.metrics_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.metrics_dir, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    # Prometheus text format (0.0.4): merged histograms and counters, then this process's gauges
+    def render(self):
+        histograms, counters = {}, collections.Counter()
+        for snap in self._snapshots():
+            for name, labels, counts, total, count in snap["histograms"]:
+                key    = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+            for name, labels, value in snap["counters"]:
+                counters[(name, tuple(tuple(pair) for pair in labels))] += value
+
+        lines, typed = [], set()
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+registry.describe("realid_stage_seconds", "Time spent in one stage of a request (decode, inference, db_lookup, compare, smtp_send, ...)")
+registry.describe("realid_request_seconds", "HTTP request latency by endpoint")
+registry.describe("realid_sqlite_seconds", "SQLite statement latency by statement type")
+registry.describe("realid_mail_delivery_seconds", "Time from queueing an OTP mail to the SMTP server accepting it")
+registry.describe("realid_mail_total", "OTP mails delivered or given up on")
+registry.describe("realid_frame_cache_total", "Face crops answered from the frame result cache (hit) or sent to the models (miss)")
+registry.describe("realid_frame_unusable_total", "Frames with a face that failed the brightness / sharpness gate, by reason")
+registry.describe("realid_face_rejected_total", "Face requests answered 429 by admission control, by reason")
+
+_trace = threading.local()
+
+
+# ---- spans ----
+
+# times a block into realid_stage_seconds{stage=...} (or into `metric` with the given labels), and into
+# the current request's trace if one is open
+class span:
+    __slots__ = ("stage", "metric", "labels", "start")
+
+    def __init__(self, stage, metric="realid_stage_seconds", **labels):
+        self.stage  = stage
+        self.metric = metric
+        self.labels = labels or {"stage": stage}
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        registry.observe(self.metric, elapsed, **self.labels)
+        spans = getattr(_trace, "spans", None)
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+        return False
+
+# opens a per-thread trace that spans on this thread append to (one per HTTP request)
+def start_trace():
+    _trace.spans = []
+
+# closes the trace and returns its [(stage, seconds)]
+def finish_trace():
+    spans, _trace.spans = getattr(_trace, "spans", None) or [], None
+    return spans
+
+# Server-Timing header value for a finished trace (stages repeated in a request are summed)
+def server_timing(spans):
+    totals = collections.OrderedDict()
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ", ".join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
+
+
+# ---- logging ----
+
+# QueueHandler whose writer thread is (re)started in whichever process logs, so a handler installed in
+# the gunicorn master before the fork still drains in every worker. The request thread only enqueues
+class _AsyncHandler(logging.handlers.QueueHandler):
+
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target   = target
+        self.listener = None
+        self.pid      = None
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            self.queue    = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.target)
+            self.listener.start()
+            self.pid      = os.getpid()
+        super().enqueue(record)
+
+# routes the "realid" logger through the async handler at the given level (DEBUG adds per-frame numbers).
+# Command-line tools pass background=False so nothing is still queued when they exit
+def setup_logging(level="INFO", background=True):
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    log.handlers[:] = [_AsyncHandler(target) if background else target]
+    log.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    log.propagate = False
+
+
+# ---- sampling profiler ----
+
+# samples one thread's Python stack every interval seconds while a request runs; stop() returns
+# collapsed stacks ("outer;inner;leaf" -> samples), the input format of flamegraph.pl / speedscope
+class StackSampler:
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval  = interval
+        self.samples   = collections.Counter()
+        self._stop     = threading.Event()
+        self._thread   = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+# writes collapsed stacks to directory/<time>-<label>.folded and returns the path
+def write_profile(samples, directory, label):
+    os.makedirs(directory, exist_ok=True)
+    safe = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "root"
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{safe}.folded")
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# the app reads its config from the environment at import time, so everything it needs is set before
+# any test module imports it: a throwaway database, dummy mail credentials, no model preloading (the
+# face models are stubbed per test), no frame cache, whose keys the stubbed faces don't carry, and
+# no per-IP / per-user face rate limits, which every test client would share
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="realid-tests-")
+os.environ.update(
+    DATABASE_PATH=os.path.join(_tmp, "database.db"),
+    MAIL_USERNAME="tests@example.com",
+    MAIL_PASSWORD="unused",
+    SECRET_KEY="tests",
+    MODEL_PRELOAD="False",
+    FRAME_CACHE_SIZE="0",
+    PROFILE_TOKEN="profile-token",
+    FACE_IP_RATE="0",
+    FACE_USER_RATE="0",
+)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+# a unit vector along axis i — orthogonal vectors sit at cosine distance 1, far past any match threshold
+def unit(i, dim=128):
+    import numpy as np
+    vector    = np.zeros(dim, dtype=np.float32)
+    vector[i] = 1.0
+    return vector
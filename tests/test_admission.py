@@ -0,0 +1,65 @@
+import threading
+import time
+
+import pytest
+
+from admission import ConcurrencyLimiter, RateLimiter, Rejected
+
+
+def test_full_limiter_rejects_at_once():
+    limiter = ConcurrencyLimiter(1, queue_size=0)
+    started = limiter.acquire()
+    with pytest.raises(Rejected) as exc:
+        limiter.acquire()
+    assert exc.value.reason == "queue_full"
+    assert exc.value.retry_after >= 1
+    limiter.release(started)
+    limiter.release(limiter.acquire())
+    assert limiter.stats()["rejected"] == {"queue_full": 1}
+
+def test_queued_request_times_out():
+    limiter = ConcurrencyLimiter(1, queue_size=1, queue_timeout=0.05)
+    limiter.acquire()
+    with pytest.raises(Rejected) as exc:
+        limiter.acquire()
+    assert exc.value.reason == "queue_timeout"
+    assert limiter.waiting == 0
+
+def test_queued_request_gets_the_released_slot():
+    limiter = ConcurrencyLimiter(1, queue_size=1, queue_timeout=5.0)
+    started = limiter.acquire()
+    admitted = []
+    waiter  = threading.Thread(target=lambda: admitted.append(limiter.acquire()))
+    waiter.start()
+    while limiter.waiting == 0:
+        time.sleep(0.001)
+    limiter.release(started)
+    waiter.join(timeout=5)
+    assert admitted and limiter.running == 1
+
+def test_latency_target_shrinks_the_limit():
+    limiter = ConcurrencyLimiter(8, latency_target=0.001)
+    started = limiter.acquire()
+    time.sleep(0.01)
+    limiter.release(started)
+    assert limiter.limit < 8
+
+def test_rate_limiter_spends_the_burst_per_key():
+    limiter = RateLimiter(rate=0.01, burst=2)
+    limiter.hit("a")
+    limiter.hit("a")
+    with pytest.raises(Rejected) as exc:
+        limiter.hit("a")
+    assert exc.value.reason == "rate_limited"
+    limiter.hit("b")
+
+def test_rate_limiter_off_at_zero_rate():
+    limiter = RateLimiter(rate=0, burst=1)
+    for _ in range(10):
+        limiter.hit("a")
+
+def test_rate_limiter_forgets_least_recent_keys():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    for key in "abc":
+        limiter.hit(key)
+    assert limiter.stats()["tracked_keys"] == 2
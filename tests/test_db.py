@@ -0,0 +1,28 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+def test_close_db_closes_every_threads_connection(app_module):
+    opened = []
+    def worker():
+        opened.append(db.get_db())
+        db.query_one("SELECT 1")
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    main = db.get_db()
+
+    db.close_db()
+    for conn in opened + [main]:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    # the pool picks up again with fresh connections
+    assert db.get_db() is not main
+    assert db.query_one("SELECT 1") == (1,)
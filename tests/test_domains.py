@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from domains import lookup_keys, registrable_domain, split_service
+
+
+@pytest.mark.parametrize("value, domain", [
+    ("github.com", "github.com"),
+    ("https://Gist.GitHub.com/user/x?y#z", "github.com"),
+    ("user@mail.example.org:8443/path", "example.org"),
+    ("https://accounts.google.co.uk/login", "google.co.uk"),
+    ("www.bbc.co.uk", "bbc.co.uk"),
+    ("GitHub", "github"),
+    ("192.168.0.1", "192.168.0.1"),
+    ("", ""),
+])
+def test_registrable_domain(value, domain):
+    assert registrable_domain(value) == domain
+
+def test_split_service():
+    assert split_service("github.com|alice") == ("github.com", "alice")
+    assert split_service("github.com|a|b") == ("github.com", "a|b")
+    assert split_service("github.com") == ("github.com", None)
+    assert split_service(None) == (None, None)
+
+def test_lookup_keys_are_only_the_registrable_domain():
+    assert lookup_keys("https://gist.github.com/") == ["github.com"]
+    assert lookup_keys("") == []
+
+# an entry saved under a bare name must not be offered to another site whose first label matches
+@pytest.mark.parametrize("host", ["github.evil", "github.co", "paypal.co", "https://github.attacker.net"])
+def test_lookup_keys_never_reach_a_bare_label(host):
+    assert not set(lookup_keys(host)) & {"github", "paypal"}
+
+
+@pytest.fixture
+def vault(app_module, client):
+    for service in ("github", "paypal", "github.com|alice"):
+        app_module.execute("INSERT INTO passwords (email, service, secret, domain) VALUES ('autofill@x', ?, 's', ?)",
+                           (service, registrable_domain(split_service(service)[0])))
+    with client.session_transaction() as session:
+        session['email']       = 'autofill@x'
+        session['verified_at'] = time.time()
+    return client
+
+def test_extension_lookup_matches_the_registrable_domain(vault):
+    response = vault.post('/extension/get_credentials', json={"domain": "gist.github.com", "all": True})
+    assert response.status_code == 200
+    assert [c["domain"] for c in response.get_json()["credentials"]] == ["github.com"]
+
+@pytest.mark.parametrize("domain", ["github.evil", "paypal.co"])
+def test_extension_lookup_does_not_leak_across_domains(vault, domain):
+    assert vault.post('/extension/get_credentials', json={"domain": domain, "all": True}).status_code == 404
@@ -0,0 +1,39 @@
+import numpy as np
+
+from conftest import unit
+from embedding_cache import EmbeddingCache
+
+
+def test_versioned_hits_and_misses():
+    cache, loads = EmbeddingCache(capacity=2, dim=3), []
+    def loader(email):
+        loads.append(email)
+        return np.full(3, len(loads), dtype=np.float32)
+    assert cache.get("a", loader, 1)[0] == 1
+    assert cache.get("a", loader, 1)[0] == 1
+    assert cache.get("a", loader, 2)[0] == 2
+    assert loads == ["a", "a"]
+    assert cache.stats()["hits"] == 1
+
+def test_least_recently_used_row_is_evicted():
+    cache = EmbeddingCache(capacity=2, dim=3)
+    for email in "abc":
+        cache.put(email, np.ones(3))
+    assert list(cache.index) == ["b", "c"]
+    assert cache.stats()["evictions"] == 1
+
+# another worker re-enrols the user (delete + insert, no invalidate() here): the cached face must not match
+def test_embedding_cache_notices_reenrolment_elsewhere(app_module):
+    app_module.execute("INSERT INTO users (email, name, face_embedding) VALUES ('cache@x', 'n', ?)",
+                       (app_module.encode_embedding(unit(5)),))
+    assert app_module.match_face("cache@x", unit(5))
+
+    with app_module.transaction() as conn:
+        conn.execute("DELETE FROM users WHERE email = 'cache@x'")
+        conn.execute("INSERT INTO users (email, name, face_embedding) VALUES ('cache@x', 'n', ?)",
+                     (app_module.encode_embedding(unit(6)),))
+    assert not app_module.match_face("cache@x", unit(5))
+    assert app_module.match_face("cache@x", unit(6))
+
+    app_module.execute("DELETE FROM users WHERE email = 'cache@x'")
+    assert app_module.match_face("cache@x", unit(6)) is None
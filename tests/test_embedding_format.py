@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+import embedding_format
+from embedding_format import EmbeddingFormatError, Metric
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 0.0), ("float16", 1e-3), ("int8", 1e-2)])
+def test_round_trip(dtype, tolerance):
+    vector = embedding_format.l2_normalize(np.random.default_rng(0).normal(size=128))
+    stored = embedding_format.decode(embedding_format.encode(vector, "Facenet/aligned", dtype=dtype, normalized=True))
+    assert stored.model == "Facenet/aligned"
+    assert stored.dtype == dtype
+    assert stored.dim == 128
+    assert stored.normalized
+    assert stored.version == embedding_format.VERSION
+    assert np.abs(stored.vector - vector).max() <= tolerance
+
+def test_legacy_blob_decodes_as_float32_facenet():
+    vector = np.arange(128, dtype=np.float32)
+    stored = embedding_format.decode(vector.tobytes())
+    assert stored.model == embedding_format.LEGACY_MODEL
+    assert stored.version == 0
+    assert not stored.normalized
+    assert np.array_equal(stored.vector, vector)
+
+def test_garbage_blob_is_rejected():
+    with pytest.raises(EmbeddingFormatError):
+        embedding_format.decode(b"\x01\x02\x03")
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(EmbeddingFormatError):
+        embedding_format.encode(np.ones(128), "Facenet", dtype="float64")
+
+def test_unknown_metric_is_rejected():
+    with pytest.raises(EmbeddingFormatError):
+        Metric("manhattan")
+
+def test_cosine_units_round_trip_through_l2():
+    metric = Metric("cosine")
+    for distance in (0.0, 0.4, 1.0, 2.0):
+        assert metric.from_l2(metric.to_l2(distance)) == pytest.approx(distance)
+
+def test_cosine_distance():
+    metric = Metric("cosine")
+    a, b   = np.eye(128, dtype=np.float32)[:2]
+    assert metric.distance(a, 3 * a) == pytest.approx(0.0, abs=1e-6)
+    assert metric.distance(a, b) == pytest.approx(1.0)
+    assert metric.distance(a, -a) == pytest.approx(2.0)
+
+def test_euclidean_distance_is_raw():
+    metric = Metric("euclidean")
+    assert metric.distance(np.zeros(128), np.full(128, 0.5)) == pytest.approx(np.sqrt(128 * 0.25))
+    assert metric.to_l2(10.0) == 10.0
+
+def test_range_check_catches_euclidean_values_under_cosine():
+    assert Metric("cosine").in_range(0.4)
+    assert not Metric("cosine").in_range(10.0)
+    assert not Metric("cosine").in_range(-0.1)
+    assert Metric("euclidean").in_range(10.0)
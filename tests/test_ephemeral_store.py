@@ -0,0 +1,100 @@
+import pytest
+
+import ephemeral_store
+from ephemeral_store import create_store
+
+
+# stands in for the time module so expiry can be stepped instead of slept through — MemoryStore reads
+# monotonic(), SQLiteStore time(), and both follow the same clock here
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(ephemeral_store, "time", fake)
+    return fake
+
+
+# the SQLite backend needs the ephemeral table, which importing the app migrates into the test database
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, app_module, clock):
+    backend = create_store(request.param)
+    yield backend
+    for key in ("otp", "attempts", "attempts:otp", "other"):
+        backend.delete(key)
+
+
+def test_set_get_delete(store):
+    store.set("otp", "123456", 60)
+    assert store.get("otp") == "123456"
+    store.delete("otp")
+    assert store.get("otp") is None
+
+def test_otp_redeems_only_once(store):
+    store.set("otp", "123456", 60)
+    assert store.pop_if_match("otp", "654321") is False
+    assert store.pop_if_match("otp", "123456") is True
+    assert store.pop_if_match("otp", "123456") is False
+    assert store.get("otp") is None
+
+def test_expired_keys_fail(store, clock):
+    store.set("otp", "123456", 60)
+    clock.now += 61
+    assert store.get("otp") is None
+    assert store.pop_if_match("otp", "123456") is False
+
+def test_incr_counts_and_restarts_after_ttl(store, clock):
+    assert [store.incr("attempts", 60) for _ in range(3)] == [1, 2, 3]
+    clock.now += 30
+    assert store.incr("attempts", 60) == 4   # the window runs from the first increment, not the last
+    clock.now += 31
+    assert store.incr("attempts", 60) == 1
+
+def test_set_replaces_value_and_ttl(store, clock):
+    store.set("other", "a", 10)
+    clock.now += 5
+    store.set("other", "b", 60)
+    clock.now += 10
+    assert store.get("other") == "b"
+
+def test_memory_store_evicts_least_recent():
+    store = create_store("memory", max_entries=2)
+    store.set("a", 1, 60)
+    store.set("b", 2, 60)
+    store.set("c", 3, 60)
+    assert store.get("a") is None
+    assert (store.get("b"), store.get("c")) == (2, 3)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_store("redis")
+
+
+# redeem_otp on top of each backend: wrong guesses count up to OTP_MAX_ATTEMPTS, then the code is burned
+def test_otp_lockout(store, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "otp_store", store)
+    limit = app_module.app.config['OTP_MAX_ATTEMPTS']
+    otp   = app_module.issue_otp("otp")
+    wrong = "000000" if otp != "000000" else "111111"
+
+    assert [app_module.redeem_otp("otp", wrong) for _ in range(limit - 1)] == ["invalid"] * (limit - 1)
+    assert app_module.redeem_otp("otp", wrong) == "locked"
+    assert app_module.redeem_otp("otp", otp) == "missing"
+
+def test_correct_otp_clears_attempts(store, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "otp_store", store)
+    otp   = app_module.issue_otp("otp")
+    wrong = "000000" if otp != "000000" else "111111"
+    assert app_module.redeem_otp("otp", wrong) == "invalid"
+    assert app_module.redeem_otp("otp", otp) == "ok"
+    assert store.get("attempts:otp") is None
+    assert app_module.redeem_otp("otp", otp) == "missing"
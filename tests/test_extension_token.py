@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from itsdangerous.timed import TimestampSigner
+
+
+@pytest.fixture
+def token_at(app_module, monkeypatch):
+    # a token as issue_extension_token would have signed it `age` seconds ago
+    def issue(email, age, verified_age=None):
+        issued = int(time.time() - age)
+        with monkeypatch.context() as patch:
+            patch.setattr(TimestampSigner, "get_timestamp", lambda self: issued)
+            return app_module.issue_extension_token(email, time.time() - (age if verified_age is None else verified_age))
+    return issue
+
+def check(app_module, token):
+    headers = {"Authorization": f"Bearer {token}"} if token is not None else {}
+    with app_module.app.test_request_context(headers=headers):
+        return app_module.check_extension_token()
+
+def test_no_bearer_falls_back_to_the_session(app_module):
+    assert check(app_module, None) is None
+
+def test_fresh_token_is_not_renewed(app_module, token_at):
+    assert check(app_module, token_at("ext@x", 10)) == ("ext@x", None)
+
+def test_token_past_half_its_ttl_is_renewed(app_module, token_at):
+    ttl            = app_module.app.config['EXTENSION_TOKEN_TTL']
+    email, renewed = check(app_module, token_at("ext@x", ttl * 0.75))
+    assert email == "ext@x" and renewed
+    # the renewal keeps the original verification time, so it can't slide forever
+    claims = app_module.extension_tokens.loads(renewed)
+    assert time.time() - claims["v"] == pytest.approx(ttl * 0.75, abs=5)
+
+def test_renewal_stops_at_max_age(app_module, token_at):
+    ttl     = app_module.app.config['EXTENSION_TOKEN_TTL']
+    max_age = app_module.app.config['EXTENSION_TOKEN_MAX_AGE']
+    assert check(app_module, token_at("ext@x", ttl * 0.75, verified_age=max_age + 1)) == ("ext@x", None)
+
+def test_expired_or_forged_tokens_are_refused(app_module, token_at):
+    ttl = app_module.app.config['EXTENSION_TOKEN_TTL']
+    assert check(app_module, token_at("ext@x", ttl + 10)) == (None, None)
+    assert check(app_module, token_at("ext@x", 10) + "x") == (None, None)
+
+def test_vault_api_hands_back_the_renewed_token(app_module, client, token_at):
+    ttl      = app_module.app.config['EXTENSION_TOKEN_TTL']
+    response = client.get('/api/vault', headers={"Authorization": f"Bearer {token_at('ext@x', ttl * 0.75)}"})
+    assert response.status_code == 200
+    assert response.get_json()["token"]
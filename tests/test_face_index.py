@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import embedding_format
+from conftest import unit
+from face_index import FaceIndex
+
+
+def test_search_add_replace_remove():
+    index = FaceIndex(dim=4)
+    index.add("a", [1, 0, 0, 0])
+    index.add("b", [0, 1, 0, 0])
+    index.add("c", [0, 0, 1, 0])
+    assert index.search([0.9, 0.1, 0, 0], k=2)[0][0] == "a"
+
+    index.add("a", [0, 0, 0, 1])
+    assert index.size == 3
+    assert index.search([0, 0, 0, 1])[0] == ("a", pytest.approx(0.0))
+
+    index.remove("b")
+    assert sorted(index.rows) == ["a", "c"]
+    assert [email for email, _ in index.search([0, 1, 0, 0], k=5)] != ["b"]
+    assert index.emails[index.rows["c"]] == "c"
+
+def test_rebuild_skips_vectors_of_the_wrong_size():
+    index = FaceIndex(dim=4)
+    index.rebuild([("a", [1, 0, 0, 0]), ("b", [1, 0, 0])], signature=(2, 2))
+    assert list(index.rows) == ["a"]
+    assert index.signature == (2, 2)
+
+def test_ivf_mode_finds_an_enrolled_face():
+    rng     = np.random.default_rng(0)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    index   = FaceIndex(dim=16, ann_threshold=100, nprobe=4)
+    index.rebuild((f"u{i}", v) for i, v in enumerate(vectors))
+    assert index.stats()["mode"] == "ivf"
+    assert index.search(vectors[123])[0][0] == "u123"
+    index.remove("u123")
+    assert index.search(vectors[123], exact=True)[0][0] != "u123"
+
+
+# two gunicorn workers, each with its own index, sharing the users table
+@pytest.fixture
+def workers(app_module, monkeypatch):
+    def use(worker):
+        monkeypatch.setattr(app_module, "face_index", worker[0])
+        monkeypatch.setattr(app_module, "face_index_skipped", worker[1])
+    return use, (FaceIndex(), set()), (FaceIndex(), set())
+
+def enrol(app_module, email, vector):
+    app_module.execute("INSERT INTO users (email, name, face_embedding) VALUES (?, 'n', ?)",
+                       (email, app_module.encode_embedding(vector)))
+
+def test_sync_picks_up_other_workers_enrolments_and_deletions(app_module, workers):
+    use, w1, w2 = workers
+    for worker in (w1, w2):
+        use(worker)
+        app_module.sync_face_index()
+
+    # worker 2 enrols sync-2 and indexes it locally; worker 1 then does the same for sync-1
+    use(w2)
+    enrol(app_module, "sync-2@x", unit(2))
+    app_module.face_index.add("sync-2@x", unit(2))
+    use(w1)
+    enrol(app_module, "sync-1@x", unit(1))
+    app_module.face_index.add("sync-1@x", unit(1))
+    app_module.sync_face_index()
+    assert {"sync-1@x", "sync-2@x"} <= set(app_module.face_index.rows)
+
+    app_module.execute("DELETE FROM users WHERE email = 'sync-2@x'")
+    use(w2)
+    app_module.sync_face_index()
+    assert "sync-2@x" not in app_module.face_index.rows
+    assert "sync-1@x" in app_module.face_index.rows
+
+def test_sync_skips_other_models_without_rescanning(app_module, workers, monkeypatch):
+    use, w1, _ = workers
+    use(w1)
+    app_module.execute("INSERT INTO users (email, name, face_embedding) VALUES ('arcface@x', 'n', ?)",
+                       (embedding_format.encode(unit(3), "ArcFace"),))
+    app_module.sync_face_index()
+    assert "arcface@x" in app_module.face_index_skipped
+    assert "arcface@x" not in app_module.face_index.rows
+
+    scans = []
+    query_all = app_module.query_all
+    monkeypatch.setattr(app_module, "query_all", lambda sql, *a: (scans.append(sql), query_all(sql, *a))[1])
+    enrol(app_module, "after-arcface@x", unit(4))
+    app_module.sync_face_index()
+    assert "after-arcface@x" in app_module.face_index.rows
+    assert not [sql for sql in scans if sql.startswith("SELECT email FROM")]
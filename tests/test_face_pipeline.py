@@ -0,0 +1,198 @@
+import io
+import json
+import types
+
+import cv2
+import numpy as np
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import face_pipeline
+from face_pipeline import (FrameUnusable, ImageRejected, check_crop, decode_upload, image_dimensions, prepare_face,
+                           read_upload, reduced_decode_flag)
+
+
+def encoded(width, height, ext=".jpg"):
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3)).astype(np.uint8)
+    return cv2.imencode(ext, frame)[1].tobytes()
+
+def upload(data):
+    return FileStorage(io.BytesIO(data), "frame.jpg")
+
+# a stream that counts how much has been pulled out of it
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.consumed += len(chunk)
+        return chunk
+
+
+def test_read_upload_returns_the_bytes():
+    data = encoded(100, 80)
+    assert bytes(read_upload(upload(data), len(data))) == data
+
+def test_read_upload_stops_as_soon_as_it_is_over_the_limit():
+    stream = CountingStream(b"x" * (10 * face_pipeline.UPLOAD_CHUNK))
+    with pytest.raises(ImageRejected, match="too large"):
+        read_upload(FileStorage(stream, "frame.jpg"), face_pipeline.UPLOAD_CHUNK)
+    assert stream.consumed == 2 * face_pipeline.UPLOAD_CHUNK
+
+def test_read_upload_rejects_an_empty_file():
+    with pytest.raises(ImageRejected, match="No image"):
+        read_upload(upload(b""), 1024)
+
+@pytest.mark.parametrize("ext", [".jpg", ".png"])
+def test_image_dimensions_from_headers(ext):
+    assert image_dimensions(encoded(320, 200, ext)) == (320, 200)
+
+@pytest.mark.parametrize("data", [b"", b"GIF89a" + b"\0" * 40, b"\xff\xd8" + b"\0" * 40, encoded(320, 200)[:100]])
+def test_image_dimensions_unknown_or_truncated(data):
+    assert image_dimensions(data) is None
+
+@pytest.mark.parametrize("size, flag", [
+    ((4000, 3000), cv2.IMREAD_REDUCED_COLOR_4),
+    ((3000, 4000), cv2.IMREAD_REDUCED_COLOR_4),
+    ((4000, 4000), cv2.IMREAD_REDUCED_COLOR_8),
+    ((1280, 960), cv2.IMREAD_REDUCED_COLOR_2),
+    ((640, 480), cv2.IMREAD_COLOR),
+    ((300, 200), cv2.IMREAD_COLOR),
+])
+def test_reduced_decode_flag_keeps_the_short_side_usable(size, flag):
+    assert reduced_decode_flag(*size) == flag
+
+def test_decode_upload_reduces_large_jpegs():
+    frame = decode_upload(upload(encoded(1280, 960)), 10 * 1024 * 1024)
+    assert frame.shape == (480, 640, 3)
+
+def test_decode_upload_decodes_png_at_full_size():
+    frame = decode_upload(upload(encoded(1280, 960, ".png")), 10 * 1024 * 1024)
+    assert frame.shape == (960, 1280, 3)
+
+def test_decode_upload_rejects_oversized_uploads():
+    data = encoded(640, 480)
+    with pytest.raises(ImageRejected, match="too large"):
+        decode_upload(upload(data), len(data) - 1)
+
+@pytest.mark.parametrize("data", [b"not an image at all", encoded(640, 480)[:100]])
+def test_decode_upload_rejects_unreadable_headers(data):
+    with pytest.raises(ImageRejected, match="Unsupported"):
+        decode_upload(upload(data), 1024 * 1024)
+
+# the header survives but the pixel data doesn't — only the decode itself can notice
+def test_decode_upload_rejects_truncated_pixels():
+    data = encoded(640, 480)
+    sof  = data.find(b"\xff\xc0")
+    with pytest.raises(ImageRejected, match="Failed to read"):
+        decode_upload(upload(data[:sof + 19]), 1024 * 1024)
+
+@pytest.mark.parametrize("size, message", [((32, 32), "dimensions"), ((1000, 200), "aspect")])
+def test_decode_upload_rejects_implausible_dimensions(size, message):
+    with pytest.raises(ImageRejected, match=message):
+        decode_upload(upload(encoded(*size)), 1024 * 1024)
+
+
+def crop_meta(box, source=(1280, 720)):
+    return json.dumps({"box": list(box), "source": list(source), "detector": "test"})
+
+def test_check_crop_accepts_a_matching_crop():
+    assert check_crop(crop_meta((400, 100, 300, 400)), (240, 320))["detector"] == "test"
+
+def test_check_crop_accepts_a_box_touching_the_frame_edge():
+    check_crop(crop_meta((980, 320, 300, 400)), (300, 400))
+
+@pytest.mark.parametrize("meta", ["not json", json.dumps({"box": [1, 2, 3]}), json.dumps({"source": [640, 480]})])
+def test_check_crop_rejects_malformed_metadata(meta):
+    with pytest.raises(ImageRejected, match="Malformed"):
+        check_crop(meta, (200, 200))
+
+@pytest.mark.parametrize("box, source", [
+    ((1100, 100, 300, 400), (1280, 720)),   # runs off the right edge
+    ((-10, 100, 300, 400), (1280, 720)),
+    ((0, 0, 0, 400), (1280, 720)),
+    ((0, 0, 40, 40), (48, 48)),             # implausibly small camera frame
+])
+def test_check_crop_rejects_boxes_outside_the_frame(box, source):
+    with pytest.raises(ImageRejected, match="out of range"):
+        check_crop(crop_meta(box, source), (200, 200))
+
+def test_check_crop_rejects_a_face_too_small_for_the_models():
+    with pytest.raises(ImageRejected, match="too small"):
+        check_crop(crop_meta((400, 100, 120, 160)), (120, 160))
+
+@pytest.mark.parametrize("dims", [(400, 400), (320, 420)])   # wrong aspect, upscaled past the box
+def test_check_crop_rejects_a_crop_that_is_not_its_box(dims):
+    with pytest.raises(ImageRejected, match="match"):
+        check_crop(crop_meta((400, 100, 300, 400)), dims)
+
+def test_decode_upload_checks_the_crop_before_decoding(monkeypatch):
+    monkeypatch.setattr(face_pipeline.cv2, "imdecode", lambda *a: pytest.fail("decoded a rejected crop"))
+    with pytest.raises(ImageRejected, match="too small"):
+        decode_upload(upload(encoded(120, 160)), 1024 * 1024, crop=crop_meta((400, 100, 120, 160)))
+
+
+# prepare_face with the detector pinned to a known box: no eye cascade, so no rotation, and Facenet's
+# default 160x160 input
+@pytest.fixture
+def detected(monkeypatch):
+    monkeypatch.setattr(face_pipeline, "models", types.SimpleNamespace(eye_cascade=None,
+                                                                       facenet_input_size=lambda: (160, 160)))
+    box = {}
+    monkeypatch.setattr(face_pipeline, "detect_face", lambda frame, gray=None: box.get("box"))
+    return box
+
+def textured(height=480, width=640, mean=128):
+    noise = np.random.default_rng(1).integers(-40, 40, (height, width, 1))
+    return np.clip(noise + mean, 0, 255).repeat(3, axis=2).astype(np.uint8)
+
+def test_prepare_face_without_a_face(detected):
+    assert prepare_face(textured()) is None
+
+def test_prepare_face_sizes_both_model_inputs(detected):
+    detected["box"] = (200, 100, 200, 240)
+    face = prepare_face(textured(), crop="tight")
+    assert face["spoof"].shape == (face_pipeline.IMG_SIZE, face_pipeline.IMG_SIZE, 3)
+    assert face["facenet"].shape == (160, 160, 3)
+    assert face["thumb"].shape == (face_pipeline.THUMB_SIDE, face_pipeline.THUMB_SIDE)
+
+# a face in the corner: the margin runs off the frame and is padded rather than shrinking the square
+@pytest.mark.parametrize("box", [(0, 0, 200, 200), (440, 280, 200, 200)])
+def test_prepare_face_pads_crops_at_the_frame_edge(detected, box):
+    detected["box"] = box
+    frame  = textured()
+    square = face_pipeline._square_crop(frame, box)
+    assert square.shape == (280, 280, 3)
+    assert prepare_face(frame)["spoof"].shape == (face_pipeline.IMG_SIZE, face_pipeline.IMG_SIZE, 3)
+
+@pytest.mark.parametrize("frame, reason", [
+    (textured(mean=15), "dark"),
+    (textured(mean=245), "bright"),
+    (np.full((480, 640, 3), 128, np.uint8), "blurry"),
+])
+def test_prepare_face_rejects_unusable_frames_with_a_reason(detected, frame, reason):
+    detected["box"] = (200, 100, 200, 240)
+    with pytest.raises(FrameUnusable) as rejected:
+        prepare_face(frame)
+    assert rejected.value.reason == reason
+    assert str(rejected.value)
+
+# the cascade works on a frame scaled to DETECT_MAX_SIDE and must not report faces under MIN_FACE_RATIO
+# of its shorter side; the box comes back in full-frame pixels
+def test_detect_face_min_size_and_scaling(monkeypatch):
+    calls = []
+    def detect(small, scaleFactor, minNeighbors, minSize):
+        calls.append((small.shape, minSize))
+        return [(10, 10, 80, 80), (100, 50, 120, 140)]
+    cascade = types.SimpleNamespace(detectMultiScale=detect)
+    monkeypatch.setattr(face_pipeline, "models", types.SimpleNamespace(face_cascade=cascade))
+
+    assert face_pipeline.detect_face(textured(960, 1280)) == (200, 100, 240, 280)
+    assert calls == [((480, 640), (72, 72))]
+
+def test_detect_face_none(monkeypatch):
+    cascade = types.SimpleNamespace(detectMultiScale=lambda small, **kwargs: ())
+    monkeypatch.setattr(face_pipeline, "models", types.SimpleNamespace(face_cascade=cascade))
+    assert face_pipeline.detect_face(textured()) is None
@@ -0,0 +1,93 @@
+import io
+import types
+
+import numpy as np
+import pytest
+
+from conftest import unit
+
+
+# a prepared face as face_pipeline hands it to analyze_faces; `shade` varies the spoof crop between frames
+def face(shade):
+    return {"spoof": np.full((8, 8, 3), shade, dtype=np.float32), "facenet": np.zeros((8, 8, 3), np.float32)}
+
+class ImageRejected(Exception):
+    pass
+
+class FrameUnusable(Exception):
+    pass
+
+# stands in for face_pipeline: each uploaded "image" is a shade byte (0 = no face in the frame)
+@pytest.fixture
+def pipeline(app_module, monkeypatch):
+    def decode_upload(file, max_bytes, crop=None):
+        return file.read()[0]
+    def prepare_face(frame):
+        return face(frame / 255.0) if frame else None
+    stub = types.SimpleNamespace(decode_upload=decode_upload, prepare_face=prepare_face,
+                                 ImageRejected=ImageRejected, FrameUnusable=FrameUnusable)
+    monkeypatch.setattr(app_module, "face_stack", lambda: stub)
+    return stub
+
+# stands in for the batched models: every frame real, embeddings close to unit(0)
+@pytest.fixture
+def models(app_module, monkeypatch):
+    calls = []
+    def submit_many(faces, timeout=None):
+        calls.append(len(faces))
+        return [{"real": True, "score": 0.9, "embedding": unit(0) + 0.01 * i} for i in range(len(faces))]
+    monkeypatch.setattr(app_module, "face_batcher", types.SimpleNamespace(submit_many=submit_many))
+    return calls
+
+def images(*shades):
+    return {"image": [(io.BytesIO(bytes([shade])), f"frame{i}.jpg") for i, shade in enumerate(shades)]}
+
+@pytest.fixture
+def enrolled(app_module, client):
+    app_module.execute("INSERT OR IGNORE INTO users (email, name, face_embedding) VALUES ('ext-face@x', 'n', ?)",
+                       (app_module.encode_embedding(unit(0)),))
+    with client.session_transaction() as session:
+        session['email'] = 'ext-face@x'
+    return 'ext-face@x'
+
+def test_extension_single_frame_verifies_with_default_config(app_module, client, pipeline, models, enrolled):
+    assert app_module.app.config['FACE_BURST_MIN_FRAMES'] == 1
+    response = client.post('/extension/verify_face', data=images(10), content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()["success"]
+    assert models == [1]
+
+def test_burst_left_with_one_face_is_refused_before_inference(client, pipeline, models, enrolled):
+    response = client.post('/extension/verify_face', data=images(10, 0, 0), content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert not response.get_json()["success"]
+    assert models == []
+
+def test_single_frame_refused_when_bursts_are_required(app_module, client, pipeline, models, enrolled, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'FACE_BURST_MIN_FRAMES', 2)
+    response = client.post('/extension/verify_face', data=images(10), content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert models == []
+
+def test_replayed_still_is_refused(client, pipeline, models, enrolled):
+    response = client.post('/extension/verify_face', data=images(10, 10, 10), content_type='multipart/form-data')
+    assert response.status_code == 401
+    assert "Spoof" in response.get_json()["error"]
+
+def test_live_burst_gives_a_unit_centroid(app_module, pipeline, models):
+    with app_module.app.test_request_context('/', method='POST', data=images(10, 20, 30)):
+        burst = app_module.analyze_faces([face(0.1), face(0.2), face(0.3)])
+    assert burst["reason"] is None
+    assert burst["used"] == 3
+    assert models == [3]
+    assert np.linalg.norm(burst["embedding"]) == pytest.approx(1.0, abs=1e-3)
+
+# enrolments from before the versioned format are bare float32 "Facenet" vectors, never normalized —
+# under the default crop and metric they have to keep matching without a re-enrolment
+def test_legacy_enrolment_still_matches_by_default(app_module):
+    assert app_module.app.config['EMBEDDING_MODEL'] == "Facenet"
+    app_module.execute("INSERT INTO users (email, name, face_embedding) VALUES ('legacy@x', 'n', ?)",
+                       ((unit(7) * 12.5).tobytes(),))
+    assert not app_module.face_needs_reenroll("legacy@x")
+    assert app_module.match_face("legacy@x", unit(7))
+    assert not app_module.match_face("legacy@x", unit(8))
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import frame_cache
+from face_pipeline import fingerprint
+from frame_cache import FrameResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(frame_cache, "time", fake)
+    return fake
+
+
+# a prepared face as the cache sees it: the fingerprint of a 96x96 gray crop whose pattern depends on seed
+def face(seed, shift=0):
+    rng  = np.random.default_rng(seed)
+    crop = np.clip(rng.integers(40, 200, (96, 96)) + shift, 0, 255).astype(np.uint8)
+    key, thumb = fingerprint(crop)
+    return {"key": key, "thumb": thumb}
+
+def verdict(is_real, i=0):
+    embedding = np.zeros(4, dtype=np.float32)
+    embedding[i] = 1.0
+    return {"is_real": is_real, "embedding": embedding if is_real else None}
+
+
+def test_near_duplicate_frame_hits(clock):
+    cache = FrameResultCache()
+    cache.put(face(1), verdict(True))
+    again = face(1, shift=1)   # the same crop one gray level brighter, as a resubmitted frame would be
+    assert again["key"] == face(1)["key"]
+    assert cache.get(again)["is_real"] is True
+    assert cache.stats()["hits"] == 1
+
+def test_different_frame_misses(clock):
+    cache = FrameResultCache()
+    cache.put(face(1), verdict(True))
+    assert cache.get(face(2)) is None
+    assert cache.stats()["misses"] == 1
+
+def test_hit_returns_a_copy(clock):
+    cache = FrameResultCache()
+    cache.put(face(1), verdict(True))
+    cache.get(face(1))["embedding"][:] = 7
+    assert cache.get(face(1))["embedding"][0] == 1.0
+
+def test_entries_expire_after_ttl(clock):
+    cache = FrameResultCache(ttl=30)
+    cache.put(face(1), verdict(True))
+    clock.now += 29
+    assert cache.get(face(1)) is not None
+    clock.now += 2
+    assert cache.get(face(1)) is None
+
+def test_capacity_evicts_least_recently_used(clock):
+    cache = FrameResultCache(capacity=2)
+    cache.put(face(1), verdict(True))
+    cache.put(face(2), verdict(True))
+    cache.get(face(1))
+    cache.put(face(3), verdict(True))
+    assert cache.get(face(2)) is None
+    assert cache.get(face(1)) is not None and cache.get(face(3)) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+# a uniformly brighter copy (a photo held up to the camera, say) keeps the difference hash but not the
+# thumbnail — it must get its own verdict, never the live frame's
+def test_spoof_verdict_is_never_served_for_a_different_frame(clock):
+    cache  = FrameResultCache()
+    live   = face(1)
+    replay = face(1, shift=20)
+    assert replay["key"] == live["key"]
+
+    cache.put(replay, verdict(False))
+    assert cache.get(live) is None
+    cache.put(live, verdict(True, i=1))
+    assert cache.get(replay)["is_real"] is False
+    assert cache.get(live)["is_real"] is True
+    assert cache.stats()["size"] == 2
+
+def test_put_replaces_a_matching_entry(clock):
+    cache = FrameResultCache()
+    cache.put(face(1), verdict(False))
+    cache.put(face(1, shift=1), verdict(True))
+    assert cache.stats()["size"] == 1
+    assert cache.get(face(1))["is_real"] is True
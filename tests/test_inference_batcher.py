@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from inference_batcher import MicroBatcher
+
+
+# a model function that doubles each item and records the size of every batch it's handed
+def recording(delay=0.0, fail=False):
+    batches = []
+    def run_batch(items):
+        batches.append(len(items))
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("model blew up")
+        return [item * 2 for item in items]
+    return run_batch, batches
+
+def together(*calls):
+    results = [None] * len(calls)
+    def run(i, call):
+        results[i] = call()
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_lone_request_does_not_wait_out_the_window():
+    run_batch, batches = recording()
+    batcher = MicroBatcher(run_batch, window_ms=2000, max_batch=8)
+    started = time.perf_counter()
+    assert batcher.submit(3, timeout=5) == 6
+    assert time.perf_counter() - started < 1.0
+    assert batches == [1]
+
+def test_requests_queued_behind_a_batch_share_the_next_one():
+    run_batch, batches = recording(delay=0.1)
+    batcher = MicroBatcher(run_batch, window_ms=50, max_batch=8)
+    results = together(*[lambda i=i: batcher.submit(i, timeout=5) for i in range(5)])
+    assert results == [0, 2, 4, 6, 8]
+    assert batches == [1, 4]
+
+def test_max_batch_is_respected():
+    run_batch, batches = recording(delay=0.1)
+    batcher = MicroBatcher(run_batch, window_ms=50, max_batch=3)
+    results = together(*[lambda i=i: batcher.submit(i, timeout=5) for i in range(7)])
+    assert results == [i * 2 for i in range(7)]
+    assert max(batches) <= 3
+    assert sum(batches) == 7
+
+def test_bursts_stay_whole_and_get_only_their_own_results():
+    run_batch, batches = recording(delay=0.1)
+    batcher = MicroBatcher(run_batch, window_ms=50, max_batch=8)
+    bursts  = [[10 * b + i for i in range(3)] for b in range(5)]
+    results = together(*[lambda burst=burst: batcher.submit_many(burst, timeout=5) for burst in bursts])
+    assert results == [[item * 2 for item in burst] for burst in bursts]
+    assert all(size % 3 == 0 and size <= 8 for size in batches)
+    assert batcher.stats()["items"] == 15
+
+def test_error_reaches_every_job_in_the_batch():
+    run_batch, batches = recording(delay=0.1, fail=True)
+    batcher = MicroBatcher(run_batch, window_ms=50, max_batch=8)
+    errors  = []
+    def call(item):
+        try:
+            batcher.submit_many([item, item], timeout=5)
+        except RuntimeError as e:
+            errors.append(str(e))
+    together(*[lambda i=i: call(i) for i in range(3)])
+    assert errors == ["model blew up"] * 3
+    assert batcher.stats()["errors"] == len(batches)
+
+def test_timeout_is_raised_to_the_caller():
+    run_batch, _ = recording(delay=0.5)
+    batcher = MicroBatcher(run_batch, window_ms=1, max_batch=8)
+    with pytest.raises(TimeoutError):
+        batcher.submit_many([1, 2], timeout=0.05)
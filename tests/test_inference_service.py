@@ -0,0 +1,85 @@
+import socket
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import inference_service
+from inference_batcher import MicroBatcher
+from inference_service import InferenceClient, _serve_connection
+
+
+class FakeModels:
+
+    def status(self):
+        return {"loaded": True}
+
+    def is_ready(self):
+        return True
+
+
+# a model process on a temporary socket whose "models" record every batch they're handed
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # client and "model process" share one process here, so attaching mustn't drop the client's own
+    # resource-tracker registration the way it does across processes
+    monkeypatch.setattr(inference_service, "_attach", lambda name: shared_memory.SharedMemory(name=name))
+    batches, running, overlapped = [], [0], []
+    def run_batch(faces):
+        running[0] += 1
+        overlapped.append(running[0] > 1)
+        batches.append(len(faces))
+        time.sleep(0.05)
+        running[0] -= 1
+        return [{"real": True, "score": 0.9, "embedding": face["facenet"].mean(axis=(0, 1))} for face in faces]
+
+    path     = str(tmp_path / "inference.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(16)
+    batcher  = MicroBatcher(run_batch, window_ms=20, max_batch=8, name="test-service")
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=_serve_connection, args=(conn, FakeModels(), batcher, 5), daemon=True).start()
+    threading.Thread(target=accept, daemon=True).start()
+    yield path, batches, overlapped
+    listener.close()
+
+def burst(value, n=3):
+    return [{"spoof": np.zeros((4, 4, 3), np.float32), "facenet": np.full((4, 4, 3), value + i, np.float32)}
+            for i in range(n)]
+
+def test_concurrent_bursts_share_batches_and_never_overlap(service):
+    path, batches, overlapped = service
+    client  = InferenceClient(path, timeout=5)
+    results = {}
+    def send(value):
+        results[value] = client.analyze(burst(value))
+    threads = [threading.Thread(target=send, args=(value,)) for value in (0, 10, 20, 30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    client.close()
+
+    assert sum(batches) == 12
+    assert all(size % 3 == 0 and size <= 8 for size in batches)
+    assert max(batches) > 3
+    assert not any(overlapped)
+    for value, faces in results.items():
+        assert [float(r["embedding"][0]) for r in faces] == [value, value + 1, value + 2]
+
+def test_single_face_goes_through_the_batcher(service):
+    path, batches, _ = service
+    client = InferenceClient(path, timeout=5)
+    assert client.analyze(burst(5, n=1))[0]["real"]
+    assert client.status()["ready"]
+    client.close()
+    assert batches == [1]
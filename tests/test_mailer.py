@@ -0,0 +1,103 @@
+import os
+import smtplib
+import sys
+import time
+
+import pytest
+
+from conftest import ROOT
+from ephemeral_store import MemoryStore
+from mailer import MailDispatcher, MailQueueFull
+from otp_email import otp_mime
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from load_suite import SmtpSink  # noqa: E402
+
+
+@pytest.fixture
+def sink():
+    server = SmtpSink()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def dispatcher(sink, **kwargs):
+    kwargs.setdefault("status_store", MemoryStore())
+    return MailDispatcher("127.0.0.1", sink.port, use_tls=False, username="sender@example.com", password="x",
+                          backoff=0.01, **kwargs)
+
+def otp_mail(mailer, rcpt, otp="123456"):
+    return mailer.send_raw("sender@example.com", [rcpt], otp_mime(otp, "login", "sender@example.com", rcpt))
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+def test_queued_otp_mail_is_delivered(sink):
+    mailer = dispatcher(sink)
+    job_id = otp_mail(mailer, "user@example.com", "654321")
+    assert sink.next_otp("user@example.com", timeout=5) == "654321"
+    assert wait_for(lambda: mailer.status(job_id)["state"] == "sent")
+    assert mailer.close() == 0
+    assert mailer.stats()["sent"] == 1
+
+def test_failed_send_is_retried_on_the_same_worker(sink):
+    mailer, attempts = dispatcher(sink, max_retries=2), []
+    connect = mailer._connect
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise smtplib.SMTPConnectError(421, "try again later")
+        return connect()
+    mailer._connect = flaky
+
+    job_id = otp_mail(mailer, "retry@example.com")
+    assert sink.next_otp("retry@example.com", timeout=5) == "123456"
+    assert wait_for(lambda: mailer.status(job_id)["state"] == "sent")
+    assert mailer.status(job_id)["attempts"] == 2
+    assert mailer.stats()["retries"] == 1
+    mailer.close()
+
+def test_permanent_failure_is_recorded_and_the_worker_lives_on(sink):
+    mailer = dispatcher(sink, max_retries=1)
+    connect = mailer._connect
+    mailer._connect = lambda: (_ for _ in ()).throw(OSError("connection refused"))
+    failed = otp_mail(mailer, "down@example.com")
+    assert wait_for(lambda: mailer.status(failed)["state"] == "failed")
+    assert "refused" in mailer.status(failed)["error"]
+
+    mailer._connect = connect
+    otp_mail(mailer, "later@example.com", "111222")
+    assert sink.next_otp("later@example.com", timeout=5) == "111222"
+    assert mailer.stats()["workers"] == 1
+    assert mailer.stats()["failed"] == 1
+    mailer.close()
+
+def test_a_crashing_job_does_not_kill_the_worker(sink):
+    mailer = dispatcher(sink)
+    thread_count = lambda: mailer.stats()["workers"]
+    mailer._deliver, deliver = (lambda job, conn: 1 / 0), mailer._deliver
+    otp_mail(mailer, "crash@example.com")
+    assert wait_for(lambda: mailer._queue.unfinished_tasks == 0)
+    mailer._deliver = deliver
+    otp_mail(mailer, "after@example.com", "333444")
+    assert sink.next_otp("after@example.com", timeout=5) == "333444"
+    assert thread_count() == 1
+    mailer.close()
+
+def test_close_drains_the_queue(sink):
+    mailer = dispatcher(sink, queue_size=50)
+    for i in range(20):
+        otp_mail(mailer, f"drain{i}@example.com")
+    assert mailer.close(timeout=10) == 0
+    assert sink.mails == 20
+    assert mailer.stats()["workers"] == 0
+
+def test_full_queue_fails_fast(sink):
+    mailer = dispatcher(sink, queue_size=1)
+    mailer._ensure_started = lambda: None  # no workers: nothing leaves the queue
+    otp_mail(mailer, "first@example.com")
+    with pytest.raises(MailQueueFull):
+        otp_mail(mailer, "second@example.com")
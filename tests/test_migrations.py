@@ -0,0 +1,70 @@
+import sqlite3
+
+import numpy as np
+
+from migrations import MIGRATIONS, HOT_QUERIES, UPDATE_PASSWORD_SQL, check_query_plans, current_version, migrate
+
+
+def test_fresh_database_reaches_latest_version(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fresh.db")
+    assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    assert current_version(conn) == MIGRATIONS[-1][0]
+    assert migrate(conn) == []
+
+def test_init_db_schema_is_adopted_with_its_data(tmp_path):
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, "
+                 "name TEXT NOT NULL, face_embedding BLOB)")
+    conn.execute("CREATE TABLE passwords (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL, "
+                 "service TEXT NOT NULL, secret TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO users (email, name, face_embedding) VALUES ('a@x', 'A', ?)",
+                 (np.ones(128, np.float32).tobytes(),))
+    conn.execute("INSERT INTO passwords (email, service, secret) VALUES ('a@x', 'github.com|alice', 's')")
+    conn.commit()
+
+    migrate(conn)
+    assert conn.execute("SELECT name FROM users WHERE email = 'a@x'").fetchone() == ("A",)
+    assert conn.execute("SELECT domain, username FROM passwords").fetchone() == ("github.com", "alice")
+
+def test_hot_queries_use_an_index(tmp_path):
+    conn = sqlite3.connect(tmp_path / "plans.db")
+    migrate(conn)
+    assert check_query_plans(conn) == []
+
+def test_update_password_hot_query_is_the_route_statement():
+    assert ("update_password", UPDATE_PASSWORD_SQL) in [(name, sql) for name, sql, _ in HOT_QUERIES]
+
+# a database pruned before v7 existed: every account with data starts from where the log was cut
+def test_change_log_boundary_is_seeded_from_an_earlier_prune(tmp_path):
+    conn = sqlite3.connect(tmp_path / "v6.db")
+    for version, _, step in MIGRATIONS:
+        if version <= 6:
+            step(conn)
+    conn.execute("PRAGMA user_version = 6")
+    for email in ("a@x", "a@x", "b@x"):
+        conn.execute("INSERT INTO passwords (email, service, secret) VALUES (?, 's', 's')", (email,))
+    conn.execute("DELETE FROM password_changes WHERE seq <= 2")
+    conn.commit()
+
+    assert migrate(conn) == [7]
+    assert dict(conn.execute("SELECT email, seq FROM password_changes_pruned").fetchall()) == {"a@x": 2, "b@x": 2}
+
+# a database first migrated on a SQLite without FTS5 gets its search index, with the rows it already
+# holds, the next time migrate runs on a build that has it
+def test_missing_fts_index_is_created_on_a_later_run(tmp_path, monkeypatch):
+    import migrations
+    conn = sqlite3.connect(tmp_path / "nofts.db")
+    with monkeypatch.context() as m:
+        m.setattr(migrations, "_fts_index", lambda conn: False)
+        migrate(conn)
+    assert current_version(conn) == MIGRATIONS[-1][0]
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'passwords_fts'").fetchone()
+    conn.execute("INSERT INTO passwords (email, service, secret, domain, username) "
+                 "VALUES ('a@x', 'github.com', 's', 'github.com', 'alice')")
+    conn.commit()
+
+    assert migrate(conn) == []
+    assert conn.execute("SELECT rowid FROM passwords_fts WHERE passwords_fts MATCH 'alice'").fetchall() == [(1,)]
+    conn.execute("INSERT INTO passwords (email, service, secret, domain, username) "
+                 "VALUES ('a@x', 'gitlab.com', 's', 'gitlab.com', 'bob')")
+    assert conn.execute("SELECT rowid FROM passwords_fts WHERE passwords_fts MATCH 'bob'").fetchall() == [(2,)]
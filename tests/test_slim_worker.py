@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+HEAVY = ['tensorflow', 'keras', 'deepface', 'cv2', 'onnxruntime']
+
+# generous: a slim import is well under a second, the face stack alone takes several
+MAX_IMPORT_SECONDS = 10
+
+_PROBE = ("import json, sys, time; started = time.perf_counter(); import app; "
+          "print(json.dumps({'seconds': time.perf_counter() - started, "
+          "'heavy': [m for m in %r if m in sys.modules]}))" % HEAVY)
+
+
+# a slim worker (INFERENCE_BACKEND=none) must boot without importing any of the face stack
+def test_slim_import_leaves_the_face_stack_out(tmp_path):
+    env = dict(os.environ, INFERENCE_BACKEND="none", DATABASE_PATH=str(tmp_path / "slim.db"),
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.pop('MODEL_PRELOAD', None)
+    proc = subprocess.run([sys.executable, '-c', _PROBE], cwd=tmp_path, env=env, capture_output=True, text=True,
+                          timeout=MAX_IMPORT_SECONDS * 3)
+    assert proc.returncode == 0, proc.stderr
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert result["heavy"] == []
+    assert result["seconds"] < MAX_IMPORT_SECONDS
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.mark.parametrize("header", ["wrong", "ü-not-ascii", "profile-token"])
+def test_profile_header_never_breaks_a_request(client, header):
+    assert client.get('/', headers={"X-Profile": header}).status_code == 200
+
+def test_requests_are_counted_in_metrics(client):
+    client.get('/healthz')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert "realid_mail_queue_depth" in body
+    assert 'endpoint="healthz"' in body
@@ -0,0 +1,66 @@
+import pytest
+
+import vault_sync
+from db import execute, get_db
+
+
+# importing the app migrates the test database, change log and triggers included
+@pytest.fixture(autouse=True)
+def migrated(app_module):
+    return app_module
+
+def add(email, service):
+    return execute("INSERT INTO passwords (email, service, secret) VALUES (?, ?, 's')", (email, service)).lastrowid
+
+# backdates an account's change-log entries so the next prune drops them
+def age(email, upto_seq):
+    with get_db() as conn:
+        conn.execute("UPDATE password_changes SET changed_at = datetime('now', '-40 days') WHERE email = ? AND seq <= ?",
+                     (email, upto_seq))
+
+def test_changes_since_a_cursor():
+    cursor = vault_sync.current_cursor()
+    first  = add("sync-a@x", "one.com")
+    second = add("sync-a@x", "two.com")
+    execute("UPDATE passwords SET secret = 't' WHERE id = ?", (first,))
+    execute("DELETE FROM passwords WHERE id = ?", (second,))
+
+    result = vault_sync.changes("sync-a@x", cursor)
+    assert not result["reset"]
+    assert [item["id"] for item in result["upserts"]] == [first]
+    assert result["deleted"] == [second]
+    assert result["cursor"] == vault_sync.current_cursor()
+    assert vault_sync.changes("sync-a@x", result["cursor"])["upserts"] == []
+
+def test_changes_page_through_the_log():
+    cursor = vault_sync.current_cursor()
+    ids    = [add("sync-page@x", f"s{i}.com") for i in range(5)]
+    seen   = []
+    while True:
+        result = vault_sync.changes("sync-page@x", cursor, limit=2)
+        seen  += [item["id"] for item in result["upserts"]]
+        cursor = result["cursor"]
+        if not result["more"]:
+            break
+    assert seen == ids
+
+def test_pruning_resets_only_the_pruned_account():
+    add("prune-a@x", "old.com")
+    pruned_seq = vault_sync.current_cursor()
+    add("prune-b@x", "kept.com")
+    add("prune-a@x", "new.com")
+    age("prune-a@x", pruned_seq)
+    assert vault_sync.prune_changes(30) == 1
+
+    assert vault_sync.changes("prune-a@x", 0)["reset"]
+    assert vault_sync.changes("prune-a@x", pruned_seq - 1)["reset"]
+    kept = vault_sync.changes("prune-a@x", pruned_seq)
+    assert not kept["reset"] and [item["service"] for item in kept["upserts"]] == ["new.com"]
+    assert not vault_sync.changes("prune-b@x", 0)["reset"]
+
+def test_cursor_does_not_go_back_after_pruning():
+    add("prune-c@x", "a.com")
+    cursor = vault_sync.current_cursor()
+    age("prune-c@x", cursor)
+    vault_sync.prune_changes(30)
+    assert vault_sync.current_cursor() >= cursor
@@ -0,0 +1,117 @@
+import re
+
+from db import transaction, query_all, query_one
+from domains import split_service
+
+# Read side of the JSON vault API. Pages are keyset-paginated on the row id (never OFFSET), search goes
+# through the passwords_fts index from migration 6 when the SQLite build has FTS5, and the change log
+# that migration's triggers fill gives clients a cursor to ask for deltas instead of re-reading the list.
+
+_COLUMNS = "p.id, p.service, p.username, p.secret, p.domain"
+_TOKEN   = re.compile(r'\w+', re.UNICODE)
+
+_fts = None
+
+
+# whether migration 6 could create the FTS5 table on this SQLite build — checked once per process
+def fts_available():
+    global _fts
+    if _fts is None:
+        _fts = query_one("SELECT 1 FROM sqlite_master WHERE name = 'passwords_fts'") is not None
+    return _fts
+
+# one passwords row as the API returns it, with the packed "service|username" split back apart
+def _item(row):
+    password_id, combined, username, secret, domain = row
+    service, packed_username = split_service(combined)
+    return {"id": password_id, "service": service, "username": username or packed_username or "",
+            "secret": secret, "domain": domain}
+
+# search text -> FTS5 query: every word must appear as a prefix of some word in service or username
+def _match_query(text):
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(text.lower()))
+
+# one page of a user's vault, oldest first, after the row id `after`; with a search query only matching
+# rows. Returns (items, next_after) — next_after is None on the last page
+def page(email, after=0, limit=50, query=None):
+    match = _match_query(query) if query else ""
+    if match and fts_available():
+        rows = query_all(f"""
+            SELECT {_COLUMNS} FROM passwords_fts f JOIN passwords p ON p.id = f.rowid
+            WHERE passwords_fts MATCH ? AND p.email = ? AND p.id > ?
+            ORDER BY p.id LIMIT ?
+        """, (match, email, after, limit + 1))
+    elif match:
+        like = "%" + query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = query_all(f"""
+            SELECT {_COLUMNS} FROM passwords p
+            WHERE p.email = ? AND p.id > ? AND (p.service LIKE ? ESCAPE '\\' OR p.username LIKE ? ESCAPE '\\')
+            ORDER BY p.id LIMIT ?
+        """, (email, after, like, like, limit + 1))
+    else:
+        rows = query_all(f"""
+            SELECT {_COLUMNS} FROM passwords p
+            WHERE p.email = ? AND p.id > ? ORDER BY p.id LIMIT ?
+        """, (email, after, limit + 1))
+
+    items = [_item(row) for row in rows[:limit]]
+    return items, (items[-1]["id"] if len(rows) > limit else None)
+
+# how many entries a user has, for the badge and stats card
+def count(email):
+    return query_one("SELECT COUNT(*) FROM passwords WHERE email = ?", (email,))[0]
+
+# the newest change-log position — a client that has just read a full listing is up to date as of here.
+# Read from sqlite_sequence so it never goes backwards, even once pruning has emptied the log
+def current_cursor():
+    return query_one("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'password_changes'), 0)")[0]
+
+# everything that changed in a user's vault after cursor `since`, at most `limit` log entries per call:
+# (upserts with their current row, deleted ids, new cursor, more). reset=True means pruning has dropped
+# some of this user's entries after `since` (0 included) and the client has to reload the listing instead
+def changes(email, since, limit=500):
+    # read up to a fixed head, so a write landing mid-call is picked up next time rather than skipped
+    head   = current_cursor()
+    pruned = query_one("SELECT seq FROM password_changes_pruned WHERE email = ?", (email,))
+    if pruned and since < pruned[0]:
+        return {"reset": True, "upserts": [], "deleted": [], "cursor": head, "more": False}
+
+    log = query_all("""
+        SELECT seq, password_id, op FROM password_changes
+        WHERE email = ? AND seq > ? AND seq <= ? ORDER BY seq LIMIT ?
+    """, (email, since, head, limit + 1))
+    more = len(log) > limit
+    log  = log[:limit]
+
+    # last entry per row wins; a row that's gone by now is a delete whatever the log says
+    latest = {}
+    for _, password_id, op in log:
+        latest[password_id] = op
+    upsert_ids = [i for i, op in latest.items() if op == "upsert"]
+    rows       = {}
+    if upsert_ids:
+        marks = ",".join("?" * len(upsert_ids))
+        rows  = {row[0]: row for row in query_all(
+            f"SELECT {_COLUMNS} FROM passwords p WHERE p.email = ? AND p.id IN ({marks})", (email, *upsert_ids))}
+
+    cursor = log[-1][0] if more else max(since, head)
+    return {
+        "reset":   False,
+        "upserts": [_item(rows[i]) for i in upsert_ids if i in rows],
+        "deleted": [i for i, op in latest.items() if op == "delete" or i not in rows],
+        "cursor":  cursor,
+        "more":    more,
+    }
+
+# drops change-log entries older than `days`, first moving each affected account's retention boundary up
+# to the newest entry of theirs being dropped — clients whose cursor is below it get reset=True and reload
+def prune_changes(days):
+    cutoff = f"-{int(days)} days"
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO password_changes_pruned (email, seq)
+            SELECT email, MAX(seq) FROM password_changes WHERE changed_at < datetime('now', ?) GROUP BY email
+            ON CONFLICT(email) DO UPDATE SET seq = MAX(seq, excluded.seq)
+        """, (cutoff,))
+        return conn.execute("DELETE FROM password_changes WHERE changed_at < datetime('now', ?)",
+                            (cutoff,)).rowcount